@@ -0,0 +1,373 @@
+import itertools
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Literal, Optional
+
+import numpy as np
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field, ValidationError
+
+from MaskingStage import LocalStage
+from RiskEngine import DEFAULT_DATA_PATH, RiskInputError, load_prices
+
+# Replays a trading playbook over local factor and price series. A playbook is
+# a list of "when these conditions hold, hold this position" rules; signals are
+# computed for the whole history at once and only entries and exits (for stops
+# and minimum holding periods) are walked one by one. Parameter variations of a
+# playbook are spread over a process pool.
+#
+# The L6 tactics task ends its playbook with a ```json block in this format,
+# which PlaybookBacktest picks up after the task:
+#
+#   {"rules": [{"name": "long duration on falling inflation",
+#               "when": [{"series": "CPI_YOY", "transform": "change", "window": 63, "op": "<", "threshold": 0}],
+#               "instrument": "UST10Y", "position": 0.5, "hold_days": 21, "stop_loss": 0.05}],
+#    "max_gross_leverage": 1.1, "cost_bps": 2}
+#
+#   python Backtester.py playbook.json data/prices --grid '{"rules.0.when.0.window": [21, 63, 126]}'
+
+TRADING_DAYS = 252
+
+
+class PlaybookError(ValueError):
+    pass
+
+
+class Condition(BaseModel):
+    """series transformed over window days, compared with threshold"""
+    series: str
+    transform: Literal["level", "change", "pct_change", "zscore"] = "level"
+    window: int = Field(20, ge=1)
+    op: Literal[">", ">=", "<", "<="]
+    threshold: float
+
+
+class Rule(BaseModel):
+    """Hold position (fraction of capital, negative for short) of instrument while every condition holds"""
+    name: str
+    when: List[Condition]
+    instrument: str
+    position: float
+    hold_days: int = Field(0, ge=0)
+    stop_loss: Optional[float] = Field(None, gt=0)
+
+
+class Playbook(BaseModel):
+    rules: List[Rule]
+    max_gross_leverage: float = Field(1.0, gt=0)
+    cost_bps: float = Field(1.0, ge=0)
+
+
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*\n(.*?)```", re.DOTALL)
+
+
+def extract_playbook(text):
+    """The last fenced JSON block of text that is a valid Playbook"""
+    errors = []
+    for block in reversed(_JSON_BLOCK_RE.findall(text or "")):
+        try:
+            data = json.loads(block)
+        except json.JSONDecodeError as e:
+            errors.append(f"invalid JSON: {e}")
+            continue
+        if isinstance(data, list):
+            data = {"rules": data}
+        try:
+            return Playbook.model_validate(data)
+        except ValidationError as e:
+            errors.append(str(e))
+    raise PlaybookError("No playbook rules block found" + (f" ({errors[0]})" if errors else ""))
+
+
+class Backtester:
+    """Backtests playbooks over one history of factor and instrument series"""
+
+    def __init__(self, history):
+        self.history = history
+        self.values = history.prices
+        self._features = {}
+
+    def column(self, name):
+        try:
+            return self.history.resolve(name)
+        except RiskInputError as e:
+            raise PlaybookError(str(e)) from None
+
+    def returns(self, instrument):
+        """Daily simple returns of an instrument; returns[t] is earned from t-1 to t"""
+        prices = self.values[:, self.column(instrument)]
+        if (prices <= 0).any():
+            raise PlaybookError(f"{instrument} has non-positive values and can't be traded as a price series")
+        returns = np.zeros_like(prices)
+        returns[1:] = prices[1:] / prices[:-1] - 1
+        return returns
+
+    def feature(self, condition):
+        """The transformed series of a condition, NaN until its window is filled"""
+        key = (condition.series.lower(), condition.transform, condition.window)
+        if key not in self._features:
+            x = self.values[:, self.column(condition.series)]
+            w = condition.window
+            out = np.full_like(x, np.nan)
+            if condition.transform == "level":
+                out = x.copy()
+            elif condition.transform == "change":
+                out[w:] = x[w:] - x[:-w]
+            elif condition.transform == "pct_change":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    out[w:] = x[w:] / x[:-w] - 1
+            elif len(x) >= w:
+                # z-score against the trailing window, from running sums
+                c1 = np.concatenate([[0.0], np.cumsum(x)])
+                c2 = np.concatenate([[0.0], np.cumsum(x * x)])
+                mean = (c1[w:] - c1[:-w]) / w
+                var = np.maximum((c2[w:] - c2[:-w]) / w - mean ** 2, 0)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    out[w - 1:] = (x[w - 1:] - mean) / np.sqrt(var)
+            self._features[key] = out
+        return self._features[key]
+
+    def signal(self, rule):
+        """Days on which the rule wants its position, before stops and execution lag"""
+        active = np.ones(len(self.values), dtype=bool)
+        for condition in rule.when:
+            x = self.feature(condition)
+            with np.errstate(invalid="ignore"):
+                if condition.op == ">":
+                    hit = x > condition.threshold
+                elif condition.op == ">=":
+                    hit = x >= condition.threshold
+                elif condition.op == "<":
+                    hit = x < condition.threshold
+                else:
+                    hit = x <= condition.threshold
+            active &= hit
+        if rule.hold_days:
+            # Stay in for at least hold_days after each entry
+            entries = active & ~np.concatenate([[False], active[:-1]])
+            index = np.arange(len(active))
+            last_entry = np.maximum.accumulate(np.where(entries, index, -1))
+            active |= (last_entry >= 0) & (index - last_entry < rule.hold_days)
+        return active
+
+    def _apply_stop(self, held, direction, returns, stop_loss):
+        """Exits each holding period once its loss from entry reaches stop_loss"""
+        held = held.copy()
+        starts = np.flatnonzero(held & ~np.concatenate([[False], held[:-1]]))
+        ends = np.flatnonzero(held & ~np.concatenate([held[1:], [False]])) + 1
+        for start, end in zip(starts, ends):
+            growth = np.cumprod(1 + direction * returns[start:end])
+            hit = np.flatnonzero(growth <= 1 - stop_loss)
+            if hit.size:
+                # The day the stop triggers still carries the loss; flat afterwards
+                held[start + hit[0] + 1:end] = False
+        return held
+
+    def run(self, playbook, equity_curve=False):
+        """Metrics of playbook over the history (and its daily equity when asked)"""
+        instruments = sorted({rule.instrument for rule in playbook.rules}, key=str.lower)
+        returns = np.column_stack([self.returns(name) for name in instruments])
+        weights = np.zeros_like(returns)
+        for rule in playbook.rules:
+            j = instruments.index(rule.instrument)
+            # Decided on the close of day t, held over day t + 1
+            held = np.concatenate([[False], self.signal(rule)[:-1]])
+            if rule.stop_loss:
+                held = self._apply_stop(held, np.sign(rule.position), returns[:, j], rule.stop_loss)
+            weights[:, j] += np.where(held, rule.position, 0.0)
+
+        gross = np.abs(weights).sum(axis=1)
+        over = gross > playbook.max_gross_leverage
+        weights[over] *= (playbook.max_gross_leverage / gross[over])[:, None]
+        turnover = np.abs(np.diff(weights, axis=0, prepend=0.0)).sum(axis=1)
+        daily = (weights * returns).sum(axis=1) - turnover * playbook.cost_bps / 1e4
+        return _metrics(self.history.dates, daily, weights, turnover, equity_curve)
+
+
+def _metrics(dates, daily, weights, turnover, equity_curve=False):
+    equity = np.cumprod(1 + daily)
+    years = max(len(daily) - 1, 1) / TRADING_DAYS
+    volatility = daily[1:].std(ddof=1) * np.sqrt(TRADING_DAYS) if len(daily) > 2 else 0.0
+    mean = daily[1:].mean() * TRADING_DAYS if len(daily) > 1 else 0.0
+    drawdown = 1 - equity / np.maximum.accumulate(np.maximum(equity, 1.0))
+    invested = np.abs(weights).sum(axis=1) > 0
+    entries = invested & ~np.concatenate([[False], invested[:-1]])
+    metrics = {
+        "start": str(dates[0]),
+        "end": str(dates[-1]),
+        "total_return": round(float(equity[-1] - 1), 6),
+        "cagr": round(float(equity[-1] ** (1 / years) - 1), 6) if equity[-1] > 0 else -1.0,
+        "volatility": round(float(volatility), 6),
+        "sharpe": round(float(mean / volatility), 3) if volatility > 0 else 0.0,
+        "max_drawdown": round(float(drawdown.max()), 6),
+        "exposure": round(float(invested.mean()), 4),
+        "trades": int(entries.sum()),
+        "turnover": round(float(turnover.sum()), 4),
+    }
+    if equity_curve:
+        metrics["equity"] = equity
+    return metrics
+
+
+# -- parameter variations -----------------------------------------------------
+
+def _set_path(data, path, value):
+    keys = path.split(".")
+    target = data
+    for key in keys[:-1]:
+        target = target[int(key)] if isinstance(target, list) else target[key]
+    last = keys[-1]
+    if isinstance(target, list):
+        target[int(last)] = value
+    else:
+        target[last] = value
+
+
+def variations(playbook, grid):
+    """(params, playbook) for every combination in grid, e.g.
+    {"rules.0.when.0.threshold": [0, 0.5], "max_gross_leverage": [1, 2]}"""
+    names = list(grid)
+    base = playbook.model_dump()
+    for values in itertools.product(*(grid[name] for name in names)):
+        data = json.loads(json.dumps(base))
+        params = dict(zip(names, values))
+        try:
+            for path, value in params.items():
+                _set_path(data, path, value)
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            raise PlaybookError(f"Invalid grid path: {e}") from None
+        yield params, Playbook.model_validate(data)
+
+
+def sensitivity_grid(playbook, scales=(0.5, 0.75, 1.25, 1.5)):
+    """One-at-a-time grid over every threshold and position, as separate grids"""
+    grids = []
+    for r, rule in enumerate(playbook.rules):
+        for c, condition in enumerate(rule.when):
+            t = condition.threshold
+            values = [t * s for s in scales] if t else [-0.5, -0.25, 0.25, 0.5]
+            grids.append({f"rules.{r}.when.{c}.threshold": values})
+        grids.append({f"rules.{r}.position": [rule.position * s for s in scales]})
+    return grids
+
+
+_worker = {}
+
+
+def _init_worker(data_path):
+    _worker["backtester"] = Backtester(load_prices(data_path, positive=False))
+
+
+def _run_variation(item):
+    params, playbook = item
+    try:
+        return dict(_worker["backtester"].run(playbook), params=params)
+    except PlaybookError as e:
+        return {"params": params, "error": str(e)}
+
+
+def run_grid(playbook, grids, data_path=DEFAULT_DATA_PATH, workers=None):
+    """Backtests every variation of playbook in grids (a grid or list of grids).
+
+    With workers > 1 the variations run on a process pool, each process
+    loading the history once. Results keep the order of the variations.
+    """
+    if isinstance(grids, dict):
+        grids = [grids]
+    items = [item for grid in grids for item in variations(playbook, grid)]
+    if workers and workers > 1 and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_path,)) as pool:
+            return list(pool.map(_run_variation, items, chunksize=max(1, len(items) // (workers * 4))))
+    _init_worker(data_path)
+    return [_run_variation(item) for item in items]
+
+
+def format_results(base, results=(), top=10):
+    lines = ["| variation | total return | CAGR | vol | Sharpe | max DD | trades |",
+             "|---|---|---|---|---|---|---|"]
+
+    def row(label, m):
+        if "error" in m:
+            return f"| {label} | error: {m['error']} | | | | | |"
+        return (f"| {label} | {m['total_return']:.2%} | {m['cagr']:.2%} | {m['volatility']:.2%} | "
+                f"{m['sharpe']:.2f} | {m['max_drawdown']:.2%} | {m['trades']} |")
+
+    lines.append(row("playbook as written", base))
+    ranked = sorted((r for r in results if "error" not in r), key=lambda r: r["sharpe"], reverse=True)
+    for r in ranked[:top]:
+        lines.append(row(", ".join(f"{k}={v:g}" if isinstance(v, (int, float)) else f"{k}={v}"
+                                   for k, v in r["params"].items()), r))
+    return "\n".join(lines)
+
+
+# -- crew integration ---------------------------------------------------------
+
+class PlaybookBacktest(LocalStage):
+    """Backtests the rules block of a playbook task's output, plus a sensitivity grid"""
+
+    def __init__(self, name, context, data_path=DEFAULT_DATA_PATH, workers=None, output_file=None):
+        super().__init__(name, context, output_file)
+        self.data_path = data_path
+        self.workers = workers
+
+    def run(self, context_outputs):
+        try:
+            playbook = extract_playbook(context_outputs[-1].raw)
+            base = Backtester(load_prices(self.data_path, positive=False)).run(playbook)
+            results = run_grid(playbook, sensitivity_grid(playbook), self.data_path, self.workers)
+        except (PlaybookError, RiskInputError, OSError) as e:
+            return f"# Playbook backtest\n\nNot run: {e}\n", None
+        return (f"# Playbook backtest\n\n{base['start']} to {base['end']}, "
+                f"{len(playbook.rules)} rules.\n\n{format_results(base, results)}\n"), None
+
+
+class BacktestTool(BaseTool):
+    name: str = "Backtest playbook"
+    description: str = (
+        "Backtests trading rules over local historical factor and price series and returns "
+        "return, volatility, Sharpe, max drawdown and trade counts. Pass JSON: "
+        "{\"playbook\": {\"rules\": [{\"name\": ..., \"when\": [{\"series\": ..., \"transform\": "
+        "\"level|change|pct_change|zscore\", \"window\": 20, \"op\": \">\", \"threshold\": 0}], "
+        "\"instrument\": ..., \"position\": 0.5, \"hold_days\": 0, \"stop_loss\": 0.05}], "
+        "\"max_gross_leverage\": 1, \"cost_bps\": 1}, \"grid\": {\"rules.0.when.0.threshold\": [0, 0.5]}}. "
+        "grid is optional and ranks every combination of the listed parameter values."
+    )
+    data_path: str = DEFAULT_DATA_PATH
+    workers: Optional[int] = None
+
+    def _run(self, request: str) -> str:
+        try:
+            payload = json.loads(request) if isinstance(request, str) else request
+            playbook = Playbook.model_validate(payload.get("playbook", payload))
+            base = Backtester(load_prices(self.data_path, positive=False)).run(playbook)
+            grid: Dict[str, list] = payload.get("grid") or {}
+            results = run_grid(playbook, grid, self.data_path, self.workers) if grid else []
+            return format_results(base, results)
+        except (json.JSONDecodeError, ValidationError, PlaybookError, RiskInputError, AttributeError) as e:
+            return f"Could not run the backtest: {e}"
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Backtest a playbook rules file over local series")
+    parser.add_argument("playbook", help="JSON playbook, or a markdown file ending in a ```json rules block")
+    parser.add_argument("data_path", nargs="?", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--grid", help="JSON object of parameter path -> values (default: sensitivity grid)")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.playbook, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        playbook = Playbook.model_validate_json(text)
+    except ValidationError:
+        playbook = extract_playbook(text)
+    start = time.perf_counter()
+    base = Backtester(load_prices(args.data_path, positive=False)).run(playbook)
+    grids = json.loads(args.grid) if args.grid else sensitivity_grid(playbook)
+    results = run_grid(playbook, grids, args.data_path, args.workers)
+    print(format_results(base, results, top=20))
+    print(f"\n{len(results) + 1} backtests in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,213 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from MockServers import MockServer
+
+# Offline benchmark of the crews' orchestration overhead. Each run executes a
+# crew script in a fresh worker process pointed at MockServers (OpenAI, Serper
+# and web pages), so the numbers don't depend on real model latency:
+#
+#   python Benchmark.py --crews L2 L6 --runs 3 --latency 0.05 --output bench.json
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CREWS = {
+    "L2": ["L2_research_and_write.py"],
+    "L3": ["L3_Customer_Support.py"],
+    "L4": ["L4_tools_customer_outreach.py"],
+    "L6": ["L6_Financial_Analyst.py"],
+    "L6b": ["L6b_Shopper.py"],
+}
+RESULT_MARKER = "BENCHMARK_RESULT "
+
+
+def run_worker(script_args, mock_url):
+    """Runs one crew script in this process with timing hooks installed"""
+    import resource
+    import runpy
+
+    import requests
+    from crewai import Task
+    from crewai.tools import BaseTool
+
+    task_times = []
+    tool_calls = {}
+
+    execute_sync = Task.execute_sync
+
+    def timed_execute_sync(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return execute_sync(self, *args, **kwargs)
+        finally:
+            task_times.append({
+                "agent": self.agent.role if self.agent else None,
+                "description": " ".join(self.description.split())[:80],
+                "seconds": time.perf_counter() - start,
+            })
+
+    Task.execute_sync = timed_execute_sync
+
+    tool_run = BaseTool.run
+
+    def counted_run(self, *args, **kwargs):
+        tool_calls[self.name] = tool_calls.get(self.name, 0) + 1
+        return tool_run(self, *args, **kwargs)
+
+    BaseTool.run = counted_run
+    try:
+        # Agents call tools through structured wrappers that skip BaseTool.run
+        from crewai.tools.structured_tool import CrewStructuredTool
+
+        tool_invoke = CrewStructuredTool.invoke
+
+        def counted_invoke(self, *args, **kwargs):
+            tool_calls[self.name] = tool_calls.get(self.name, 0) + 1
+            return tool_invoke(self, *args, **kwargs)
+
+        CrewStructuredTool.invoke = counted_invoke
+    except ImportError:
+        pass
+
+    # SerperDevTool always talks to google.serper.dev and some tools have fixed
+    # URLs; send every outside request made through requests to the mock instead
+    session_request = requests.Session.request
+
+    def redirected_request(self, method, url, *args, **kwargs):
+        if isinstance(url, str) and not url.startswith(mock_url):
+            if url.startswith("https://google.serper.dev"):
+                url = mock_url + url[len("https://google.serper.dev"):]
+            elif url.startswith("http"):
+                url = f"{mock_url}/page/external"
+        return session_request(self, method, url, *args, **kwargs)
+
+    requests.Session.request = redirected_request
+
+    script = os.path.join(REPO_DIR, script_args[0])
+    sys.argv = [script] + list(script_args[1:])
+    start = time.perf_counter()
+    error = None
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+    run_time = time.perf_counter() - start
+
+    result = {
+        "run_time": run_time,
+        "tasks": task_times,
+        "tool_calls": tool_calls,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "error": error,
+    }
+    sys.stdout.flush()
+    print(RESULT_MARKER + json.dumps(result), flush=True)
+
+
+def run_once(server, crew, env, verbose=False):
+    server.reset()
+    with tempfile.TemporaryDirectory(prefix=f"bench_{crew}_") as workdir:
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "Benchmark.py"), "--worker", server.url, *CREWS[crew]],
+            cwd=workdir, env=env, capture_output=True, text=True,
+        )
+        wall_time = time.perf_counter() - start
+
+    result = {"error": f"worker exited with {process.returncode} and no result"}
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+    if verbose or result.get("error"):
+        sys.stderr.write(process.stderr[-4000:])
+    result["wall_time"] = wall_time
+    result["startup_time"] = wall_time - result.get("run_time", wall_time)
+    result["server"] = dict(server.stats)
+    return result
+
+
+def summarize(runs):
+    walls = [r["wall_time"] for r in runs]
+    return {
+        "runs": len(runs),
+        "errors": sum(1 for r in runs if r.get("error")),
+        "wall_time_mean": statistics.mean(walls),
+        "wall_time_median": statistics.median(walls),
+        "wall_time_min": min(walls),
+        "wall_time_max": max(walls),
+        "startup_time_mean": statistics.mean(r["startup_time"] for r in runs),
+        "prompt_tokens_mean": statistics.mean(r["server"]["prompt_tokens"] for r in runs),
+        "completion_tokens_mean": statistics.mean(r["server"]["completion_tokens"] for r in runs),
+        "llm_requests_mean": statistics.mean(r["server"]["chat_requests"] for r in runs),
+        "tool_calls_mean": statistics.mean(sum(r.get("tool_calls", {}).values()) for r in runs),
+        "peak_rss_mb_max": max(r.get("peak_rss_mb", 0.0) for r in runs),
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the crews against a local mock of OpenAI/Serper")
+    parser.add_argument("--crews", nargs="+", default=list(CREWS), choices=list(CREWS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed seconds per LLM request")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--tool-calls", type=int, default=1, help="tool actions per task before answering")
+    parser.add_argument("--with-cache", action="store_true", help="leave the LLM response cache enabled")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the workers' stderr")
+    args = parser.parse_args()
+
+    server = MockServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                        completion_tokens=args.completion_tokens, tool_calls_per_task=args.tool_calls).start()
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "mock-key",
+        "OPENAI_API_BASE": f"{server.url}/v1",
+        "OPENAI_BASE_URL": f"{server.url}/v1",
+        "OPENAI_MODEL_NAME": "gpt-4o-mini",
+        "SERPER_API_KEY": "mock-key",
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    if not args.with_cache:
+        env["LLM_CACHE_DISABLE"] = "1"
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "verbose")},
+        "crews": {},
+    }
+    try:
+        for crew in args.crews:
+            runs = []
+            for i in range(args.runs):
+                result = run_once(server, crew, env, args.verbose)
+                runs.append(result)
+                status = result.get("error") or "ok"
+                sys.stderr.write(f"{crew} run {i + 1}/{args.runs}: {result['wall_time']:.2f}s {status}\n")
+            report["crews"][crew] = {"summary": summarize(runs), "runs": runs}
+    finally:
+        server.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[3:], sys.argv[2])
+    else:
+        main()
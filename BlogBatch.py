@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from RunCheckpoint import task_template
+from TaskCache import TaskOutputCache, cached_output
+
+# Batch runs of the L2 research-and-write crew: many topics at once, a fixed
+# number of crews in flight, one markdown file per topic and a report of what
+# each post cost. Content plans are cached on disk by normalized topic, so
+# "AI Agents" and "ai agents!" (in this batch or a later one) share a plan.
+#
+#   python BlogBatch.py topics.txt --workers 4 --output-dir posts --fanout
+
+DEFAULT_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", ".cache/plan_cache.sqlite")
+DEFAULT_TTL = float(os.getenv("PLAN_CACHE_TTL_HOURS", "24")) * 3600
+
+_ARTICLES = {"a", "an", "the"}
+
+
+def normalize_topic(topic):
+    """Case, punctuation, spacing and leading articles don't change the plan"""
+    words = re.sub(r"[^\w\s]+", " ", topic.lower()).split()
+    while len(words) > 1 and words[0] in _ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def _slug(text, limit=60):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:limit] or "post"
+
+
+class PlanCache(TaskOutputCache):
+    """Content plans keyed by plan prompt, model and normalized topic.
+
+    Keeps the table and key of the plan caches written before TaskOutputCache,
+    so existing .cache/plan_cache.sqlite files stay valid.
+    """
+
+    TABLE = "plans"
+    COLUMNS = ("key", "topic", "plan", "created")
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        super().__init__(path, ttl)
+
+    @staticmethod
+    def key(plan_task, topic):
+        # Templates, not the interpolated text, so the {topic} placeholder is still there
+        payload = json.dumps({
+            "description": task_template(plan_task, "description"),
+            "expected_output": task_template(plan_task, "expected_output"),
+            "model": getattr(plan_task.agent.llm, "model", None),
+            "topic": normalize_topic(topic),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _usage(token_usage):
+    return {name: getattr(token_usage, name, 0) or 0
+            for name in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+def write_post(topic, path, plans=None, fanout=False, draft=False, max_workers=None):
+    """Runs the L2 crew for one topic, writes the post to path and returns its summary"""
+    import L2_research_and_write as L2
+    from TaskScheduler import run_dag
+
+    # Own LLMs per crew, so token usage is per topic
+    crew = L2.build_crew(draft=draft, own_llms=True)
+    plan_task = crew.tasks[0]
+    inputs = {"topic": topic}
+    start = time.perf_counter()
+    if plans is None:
+        plan_output, cached = L2.run_plan(crew, inputs), False
+    else:
+        text, cached = plans.get(PlanCache.key(plan_task, topic), normalize_topic(topic),
+                                 lambda: L2.run_plan(crew, inputs).raw)
+        plan_output = cached_output(plan_task, text)
+    if fanout:
+        result = L2.kickoff_fanout(crew, inputs, max_workers, plan_output=plan_output)
+    else:
+        result = run_dag(crew, inputs=inputs, completed={0: plan_output})
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(result.raw)
+    os.replace(tmp, path)
+    return {"topic": topic, "path": path, "seconds": round(time.perf_counter() - start, 2),
+            "plan_cached": cached, **_usage(result.token_usage)}
+
+
+def run_batch(topics, output_dir="L2_posts", workers=4, plans=None, fanout=False, draft=False,
+              section_workers=None, on_done=None):
+    """Writes a post per topic with at most workers crews running at once.
+
+    plans is a PlanCache, or None to plan every topic afresh. Returns one
+    summary dict per topic, in input order; a failed topic has an "error"
+    instead of a path. on_done(summary) is called as each finishes.
+    """
+    paths = []
+    for topic in topics:
+        path = os.path.join(output_dir, _slug(topic) + ".md")
+        n = 2
+        while path in paths:
+            path = os.path.join(output_dir, f"{_slug(topic)}-{n}.md")
+            n += 1
+        paths.append(path)
+
+    def run(topic, path):
+        start = time.perf_counter()
+        try:
+            summary = write_post(topic, path, plans, fanout, draft, section_workers)
+        except Exception as e:
+            summary = {"topic": topic, "error": f"{type(e).__name__}: {e}",
+                       "seconds": round(time.perf_counter() - start, 2)}
+        if on_done:
+            on_done(summary)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, topic, path) for topic, path in zip(topics, paths)]
+        return [f.result() for f in futures]
+
+
+def batch_report(summaries, wall_time=None):
+    lines = [f"{'seconds':>8} {'prompt':>8} {'output':>8} {'total':>8}  plan    topic"]
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for s in summaries:
+        if "error" in s:
+            lines.append(f"{s['seconds']:8.1f} {'-':>8} {'-':>8} {'-':>8}  failed  {s['topic']}: {s['error']}")
+            continue
+        for name in totals:
+            totals[name] += s[name]
+        lines.append(f"{s['seconds']:8.1f} {s['prompt_tokens']:8d} {s['completion_tokens']:8d} "
+                     f"{s['total_tokens']:8d}  {'cached' if s['plan_cached'] else 'new':6}  {s['topic']}")
+    done = [s for s in summaries if "error" not in s]
+    lines.append(f"{len(done)}/{len(summaries)} posts, {totals['total_tokens']} tokens "
+                 f"({totals['prompt_tokens']} prompt, {totals['completion_tokens']} output), "
+                 f"{sum(s['plan_cached'] for s in done)} cached plans"
+                 + (f", {wall_time:.1f}s wall time" if wall_time is not None else ""))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a blog post per topic with the L2 crew")
+    parser.add_argument("topics", help="file with one topic per line ('-' for stdin)")
+    parser.add_argument("--output-dir", default="L2_posts")
+    parser.add_argument("--workers", type=int, default=4, help="topics in flight at once")
+    parser.add_argument("--fanout", action="store_true", help="write each post's sections concurrently")
+    parser.add_argument("--section-workers", type=int, default=None, help="concurrent sections per post (--fanout)")
+    parser.add_argument("--draft", action="store_true", help="skip the editor")
+    parser.add_argument("--no-plan-cache", action="store_true", help="plan every topic afresh")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.topics == "-" else open(args.topics, encoding="utf-8")
+    with source:
+        topics = [line.strip() for line in source if line.strip() and not line.startswith("#")]
+    plans = None if args.no_plan_cache else PlanCache()
+
+    start = time.perf_counter()
+    summaries = run_batch(topics, args.output_dir, args.workers, plans, args.fanout, args.draft,
+                          args.section_workers,
+                          on_done=lambda s: sys.stderr.write(f"done: {s['topic']} ({s['seconds']}s)\n"))
+    wall_time = time.perf_counter() - start
+    report = batch_report(summaries, wall_time)
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "batch_report.json"), "w", encoding="utf-8") as f:
+        json.dump({"wall_time": round(wall_time, 2), "posts": summaries}, f, indent=2)
+    print(report)
@@ -1,8 +1,172 @@
+import ast
+import json
+from functools import lru_cache, reduce
+
+import numpy as np
 from langchain_community.tools import tool
 
+# Expressions are parsed to an AST, checked against a whitelist and compiled once
+# (LRU cached). Evaluation only ever sees numbers, whitelisted NumPy functions and
+# the caller's variables, so LLM produced text can't reach builtins or attributes.
+
+_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPS = (ast.UAdd, ast.USub)
+
+_FUNCTIONS = {
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "ln": np.log,
+    "log10": np.log10,
+    "log2": np.log2,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "asin": np.arcsin,
+    "acos": np.arccos,
+    "atan": np.arctan,
+    "sinh": np.sinh,
+    "cosh": np.cosh,
+    "tanh": np.tanh,
+    "abs": np.abs,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "round": np.round,
+    "min": lambda *args: reduce(np.minimum, args),
+    "max": lambda *args: reduce(np.maximum, args),
+}
+_CONSTANTS = {"pi": np.pi, "e": np.e}
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+class _FloatConstants(ast.NodeTransformer):
+    # Integer literals become floats so huge powers overflow to inf instead of
+    # turning into arbitrarily large Python ints.
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+def _validate(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Load) + _BIN_OPS + _UNARY_OPS):
+            continue
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ExpressionError(f"Unsupported literal: {node.value!r}")
+        elif isinstance(node, ast.BinOp):
+            if not isinstance(node.op, _BIN_OPS):
+                raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, _UNARY_OPS):
+                raise ExpressionError(f"Unsupported operator: {type(node.op).__name__}")
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS:
+                raise ExpressionError("Only calls to math functions are allowed")
+            if node.keywords:
+                raise ExpressionError("Keyword arguments are not allowed")
+        elif isinstance(node, ast.Name):
+            if node.id.startswith("_"):
+                raise ExpressionError(f"Invalid name: {node.id}")
+        else:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+class CompiledExpression:
+    def __init__(self, source, code, variables):
+        self.source = source
+        self.code = code
+        self.variables = variables
+
+    def __call__(self, **bindings):
+        missing = [name for name in self.variables if name not in bindings]
+        if missing:
+            raise ExpressionError(f"Missing values for: {', '.join(missing)}")
+        namespace = dict(_FUNCTIONS)
+        namespace.update(_CONSTANTS)
+        namespace.update(bindings)
+        with np.errstate(all="ignore"):
+            return eval(self.code, {"__builtins__": {}}, namespace)
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression):
+    """Parses, validates and compiles an expression; results are LRU cached"""
+    text = expression.strip().rstrip("=").replace("^", "**").replace("×", "*").replace("÷", "/")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression: {expression!r}") from e
+    _validate(tree)
+    tree = ast.fix_missing_locations(_FloatConstants().visit(tree))
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    variables = tuple(sorted(names - set(_FUNCTIONS) - set(_CONSTANTS)))
+    return CompiledExpression(expression, compile(tree, "<expression>", "eval"), variables)
+
+
+def _to_python(value):
+    value = np.asarray(value)
+    if value.ndim:
+        return [_to_python(v) for v in value]
+    value = value.item()
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return int(value)
+    return value
+
+
+def evaluate(expression, **bindings):
+    """Evaluates a single expression with optional scalar variable values"""
+    return _to_python(compile_expression(expression)(**bindings))
+
+
+def evaluate_batch(expressions=None, expression=None, bindings=None):
+    """Evaluates many expressions, or one expression over many variable bindings.
+
+    bindings may be columns ({"a": [1, 2], "b": [3, 4]}) or rows
+    ([{"a": 1, "b": 3}, {"a": 2, "b": 4}]); either way the expression is
+    evaluated once over NumPy arrays.
+    """
+    if expressions is not None:
+        return [evaluate(e) for e in expressions]
+    if expression is None:
+        raise ExpressionError("Pass either expressions or expression with bindings")
+    if not bindings:
+        return [evaluate(expression)]
+    if isinstance(bindings, list):
+        columns = {name: [row[name] for row in bindings] for name in bindings[0]}
+    else:
+        columns = bindings
+    arrays = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+    size = max(array.size for array in arrays.values())
+    result = compile_expression(expression)(**arrays)
+    return _to_python(np.broadcast_to(result, (size,)))
+
+
 @tool("Calculate")
 def calculate(equation):
     """ Useful for solving math equations"""
 
-    return eval(equation)
+    try:
+        return evaluate(equation)
+    except (ExpressionError, ArithmeticError, TypeError, ValueError) as e:
+        return f"Could not evaluate {equation!r}: {e}"
+
+
+@tool("Calculate batch")
+def calculate_batch(request):
+    """Useful for solving many math equations in a single step. Pass JSON, either
+    a list of equations ["2 + 2", "sqrt(16)"] or one equation with a table of
+    variable values {"expression": "a * b + c", "bindings": {"a": [1, 2], "b": [3, 4], "c": [5, 6]}}.
+    Returns a JSON list of results."""
 
+    try:
+        payload = json.loads(request) if isinstance(request, str) else request
+        if isinstance(payload, list):
+            results = evaluate_batch(expressions=payload)
+        else:
+            results = evaluate_batch(expression=payload["expression"], bindings=payload.get("bindings"))
+        return json.dumps(results)
+    except (ExpressionError, ArithmeticError, TypeError, ValueError, KeyError) as e:
+        return f"Could not evaluate batch: {e}"
@@ -0,0 +1,202 @@
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any
+
+from crewai import Crew
+from crewai.utilities.formatter import aggregate_raw_outputs_from_task_outputs
+
+from SearchIndex import BM25Index
+
+# Caps the context handed to each task of a long sequential chain. By default
+# crewai gives every task the full text of every earlier output, so prompts
+# grow with the length of the chain. A ContextCompactor keeps those outputs
+# on disk and forwards the latest one plus only the sections of older ones
+# that are relevant to the next task, within a token budget.
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+\S")
+_RUN_DIR_RE = re.compile(r"^\d{8}-\d{6}-\d+$")
+DEFAULT_KEEP_RUNS = int(os.getenv("CONTEXT_ARCHIVE_KEEP_RUNS", "10"))
+
+
+def estimate_tokens(text):
+    """Rough token estimate, about four characters per token"""
+    return len(text) // 4 + 1 if text else 0
+
+
+def split_sections(text, max_words=200):
+    """Splits markdown into heading-led sections of at most about max_words"""
+    sections = []
+    current = []
+    words = 0
+    for block in re.split(r"\n\s*\n", text.strip()):
+        block = block.strip()
+        if not block:
+            continue
+        block_words = len(block.split())
+        if current and (_HEADING_RE.match(block) or words + block_words > max_words):
+            sections.append("\n\n".join(current))
+            current, words = [], 0
+        current.append(block)
+        words += block_words
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def _outline(text, limit=160):
+    """First heading or sentence of an output, to mention it when it is left out"""
+    for line in text.splitlines():
+        line = line.strip().lstrip("#").strip()
+        if line:
+            return line if len(line) <= limit else line[:limit - 3] + "..."
+    return ""
+
+
+def _slug(text, limit=40):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:limit] or "output"
+
+
+class ContextCompactor:
+    """Builds a task's context within budget_tokens.
+
+    The most recent output is passed in full when it fits (it is usually the
+    draft the next task works on); the remaining budget goes to the sections
+    of older outputs that best match the task's description and expected
+    output. Every output is archived under archive_dir and the context says
+    where, so nothing is lost, only not repeated in every prompt. Only the
+    archives of the last keep_runs runs are kept.
+    """
+
+    def __init__(self, budget_tokens=2000, archive_dir=".cache/context", section_words=200,
+                 keep_runs=DEFAULT_KEEP_RUNS):
+        self.budget_tokens = budget_tokens
+        self.archive_root = archive_dir
+        self.keep_runs = keep_runs
+        self.archive_dir = os.path.join(archive_dir, time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        self.section_words = section_words
+        self.stats = []
+        self._paths = {}
+        self._archived = []
+        self._lock = threading.Lock()
+
+    def archive(self, output):
+        """Writes an output's full text to disk once; returns its path"""
+        with self._lock:
+            path = self._paths.get(id(output))
+            if path is None:
+                if not os.path.isdir(self.archive_dir):
+                    os.makedirs(self.archive_dir)
+                    self._prune()
+                label = _output_label(output)
+                path = os.path.join(self.archive_dir, f"{len(self._paths):02d}-{_slug(label)}.md")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(output.raw or "")
+                self._paths[id(output)] = path
+                # Keep the output alive so its id is not reused by another one
+                self._archived.append(output)
+            return path
+
+    def _prune(self):
+        # Run directories are named by start time, so name order is age order
+        runs = sorted(name for name in os.listdir(self.archive_root)
+                      if _RUN_DIR_RE.match(name) and os.path.isdir(os.path.join(self.archive_root, name)))
+        current = os.path.basename(self.archive_dir)
+        old = [name for name in runs if name != current][:max(len(runs) - max(self.keep_runs, 1), 0)]
+        for name in old:
+            shutil.rmtree(os.path.join(self.archive_root, name), ignore_errors=True)
+
+    def build(self, task, outputs):
+        """Context string for task from the outputs it would normally receive"""
+        outputs = [o for o in outputs if o is not None and o.raw]
+        if not outputs:
+            return ""
+        full = aggregate_raw_outputs_from_task_outputs(outputs)
+        if estimate_tokens(full) <= self.budget_tokens:
+            self._record(task, full, full)
+            return full
+
+        paths = [self.archive(o) for o in outputs]
+        budget = self.budget_tokens
+        latest = outputs[-1]
+        included = {}
+        if estimate_tokens(latest.raw) <= budget * 0.75:
+            included[len(outputs) - 1] = None
+            budget -= estimate_tokens(latest.raw)
+            candidates = outputs[:-1]
+        else:
+            candidates = outputs
+
+        index = BM25Index()
+        for i, output in enumerate(candidates):
+            index.add_document(i, split_sections(output.raw, self.section_words))
+        query = f"{task.description} {task.expected_output}"
+        for _, passage in index.search(query, k=len(index)):
+            cost = estimate_tokens(passage["text"])
+            if cost > budget:
+                continue
+            included.setdefault(passage["doc"], []).append(passage)
+            budget -= cost
+
+        parts = []
+        omitted = []
+        for i, output in enumerate(outputs):
+            label = _output_label(output)
+            if i not in included:
+                omitted.append(f"- {label}: {_outline(output.raw)} (full text: {paths[i]})")
+                continue
+            passages = included[i]
+            if passages is None:
+                parts.append(f"### {label}\n\n{output.raw}")
+                continue
+            passages.sort(key=lambda p: p["position"])
+            body = []
+            for j, passage in enumerate(passages):
+                if j and passage["position"] != passages[j - 1]["position"] + 1:
+                    body.append("[...]")
+                body.append(passage["text"])
+            parts.append(f"### {label} (relevant excerpts; full text: {paths[i]})\n\n" + "\n\n".join(body))
+        if omitted:
+            parts.append("### Earlier outputs not repeated here\n\n" + "\n".join(omitted))
+        context = "\n\n----------\n\n".join(parts)
+        self._record(task, full, context)
+        return context
+
+    def _record(self, task, full, context):
+        from TaskScheduler import task_label
+
+        with self._lock:
+            self.stats.append({
+                "task": task_label(task),
+                "full_tokens": estimate_tokens(full),
+                "context_tokens": estimate_tokens(context),
+            })
+
+    def report(self):
+        lines = ["Context tokens per task (full -> passed):"]
+        for s in self.stats:
+            lines.append(f"  {s['full_tokens']:7d} -> {s['context_tokens']:6d}  {s['task']}")
+        return "\n".join(lines)
+
+
+def _output_label(output):
+    agent = getattr(output, "agent", "") or "?"
+    summary = getattr(output, "summary", None) or _outline(getattr(output, "description", "") or "", 60)
+    return f"{agent}: {summary}"
+
+
+class CompactingCrew(Crew):
+    """Crew whose sequential kickoff builds task context through a ContextCompactor"""
+
+    context_compactor: Any = None
+
+    def _get_context(self, task, task_outputs):
+        if self.context_compactor is None:
+            return super()._get_context(task, task_outputs)
+        if isinstance(task.context, list):
+            outputs = [t.output for t in task.context]
+        else:
+            outputs = task_outputs
+        return self.context_compactor.build(task, outputs)
@@ -0,0 +1,197 @@
+import atexit
+import builtins
+import importlib
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Optional, Type
+
+# Shared startup for the crew scripts: loads .env once, times imports, and
+# hands out tools that only import crewai_tools and build the real tool the
+# first time an agent calls them. Import this module before crewai so
+# CREW_IMPORT_REPORT=1 can attribute startup time to the packages that cost it:
+#
+#   CREW_IMPORT_REPORT=1 python L6b_Shopper.py --help
+#   python CrewBootstrap.py crewai crewai_tools langchain_openai   # -X importtime breakdown
+
+_import_times = defaultdict(float)
+_env_loaded = False
+_lock = threading.Lock()
+_shared = {}
+_started = time.perf_counter()
+
+
+def _install_import_timer():
+    """Attributes the time of each first import to its top-level package"""
+    original = builtins.__import__
+    state = threading.local()
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        top = name.partition(".")[0]
+        if level or getattr(state, "active", False) or top in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        state.active = True
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            state.active = False
+            _import_times[top] += time.perf_counter() - start
+
+    builtins.__import__ = timed_import
+    atexit.register(lambda: sys.stderr.write(import_report() + "\n"))
+
+
+if os.getenv("CREW_IMPORT_REPORT"):
+    _install_import_timer()
+
+
+def lazy_import(name):
+    """importlib.import_module that records how long a first import took"""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _import_times[name.partition(".")[0]] += time.perf_counter() - start
+    return module
+
+
+def import_report(limit=15):
+    total = time.perf_counter() - _started
+    lines = [f"Startup imports ({total:.2f}s since bootstrap):"]
+    for name, seconds in sorted(_import_times.items(), key=lambda item: item[1], reverse=True)[:limit]:
+        lines.append(f"  {seconds:7.3f}s  {name}")
+    return "\n".join(lines)
+
+
+def load_env(model=None):
+    """Loads .env once per process; model, when given, overrides OPENAI_MODEL_NAME"""
+    global _env_loaded
+    with _lock:
+        if not _env_loaded:
+            lazy_import("dotenv").load_dotenv()
+            _env_loaded = True
+    if model:
+        os.environ["OPENAI_MODEL_NAME"] = model
+
+
+def shared(key, factory):
+    """Process-wide instance of factory(), built on first request"""
+    with _lock:
+        if key not in _shared:
+            _shared[key] = factory()
+        return _shared[key]
+
+
+# -- lazily constructed tools -------------------------------------------------
+
+# Imported after the timer is installed so crewai's own cost shows in the report
+from crewai.tools import BaseTool  # noqa: E402
+from pydantic import BaseModel, Field, PrivateAttr  # noqa: E402
+
+
+class LazyTool(BaseTool):
+    """Stand-in with the real tool's name, description and arguments.
+
+    factory() (which does the heavy import) runs on the first call, and every
+    call is delegated to the tool it returns, within the shared rate limits
+    for rate_key if one is set.
+    """
+
+    factory: Callable[[], Any] = Field(exclude=True)
+    rate_key: Optional[str] = Field(default=None, exclude=True)
+    _tool: Any = PrivateAttr(default=None)
+    _tool_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def get(self):
+        with self._tool_lock:
+            if self._tool is None:
+                self._tool = self.factory()
+            return self._tool
+
+    def _run(self, **kwargs):
+        if self.rate_key:
+            from RateLimiter import shared_limiter
+
+            return shared_limiter().call(self.rate_key, self.get()._run, **kwargs)
+        return self.get()._run(**kwargs)
+
+
+class _NoArgs(BaseModel):
+    pass
+
+
+class _SearchArgs(BaseModel):
+    search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+
+class _ScrapeArgs(BaseModel):
+    website_url: str = Field(..., description="Mandatory website url to read the file")
+
+
+def _lazy(key, name, description, args_schema: Type[BaseModel], factory, rate_key=None):
+    return shared(key, lambda: LazyTool(name=name, description=description,
+                                        args_schema=args_schema, factory=factory, rate_key=rate_key))
+
+
+def search_tool():
+    load_env()
+    return _lazy("search", "Search the internet",
+                 "A tool that can be used to search the internet with a search_query.",
+                 _SearchArgs, lambda: lazy_import("crewai_tools").SerperDevTool(), rate_key="tool:search")
+
+
+def scrape_tool(website_url=None):
+    """Scraping through the shared ScrapeCache, optionally fixed to one page.
+
+    Only downloads that miss the cache count against the "tool:scrape" limits.
+    """
+    if website_url:
+        return _lazy(("scrape", website_url), "Read website content",
+                     f"A tool that can be used to read {website_url}'s content.", _NoArgs,
+                     lambda: lazy_import("ScrapeCache").CachedScrapeWebsiteTool(website_url=website_url))
+    return _lazy("scrape", "Read website content", "A tool that can be used to read a website content.",
+                 _ScrapeArgs, lambda: lazy_import("ScrapeCache").CachedScrapeWebsiteTool())
+
+
+def _importtime(modules):
+    """Cumulative -X importtime figures for importing each module in a fresh interpreter"""
+    import subprocess
+
+    rows = []
+    for module in modules:
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                 capture_output=True, text=True)
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            parts = [p.strip() for p in line[len("import time:"):].split("|")]
+            if parts[0].isdigit():
+                rows.append((int(parts[1]), module, parts[2]))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show which imports dominate crew startup")
+    parser.add_argument("modules", nargs="*", default=["crewai", "crewai_tools", "langchain_openai", "dotenv"])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = _importtime(args.modules)
+    for module in args.modules:
+        top_level = [r for r in rows if r[1] == module and r[2] == module]
+        if top_level:
+            print(f"{top_level[-1][0] / 1e6:7.3f}s  import {module}")
+    print("\nSlowest nested imports (cumulative):")
+    seen = set()
+    for cumulative, module, name in sorted(rows, reverse=True):
+        if name in seen or name in args.modules:
+            continue
+        seen.add(name)
+        print(f"  {cumulative / 1e6:7.3f}s  {name}  (via {module})")
+        if len(seen) >= args.top:
+            break
@@ -0,0 +1,499 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# Structured timing for crew runs. Once a Tracer is installed, every crew
+# kickoff (or TaskScheduler.run_dag), task, LLM call and tool call becomes a
+# span with its duration, token counts and cache-hit flag. Finished spans are
+# written to a JSONL or OTLP/JSON file by a background thread:
+#
+#   python L6_Financial_Analyst.py --trace l6_trace.jsonl
+#   python CrewTracing.py l6_trace.jsonl        # where did the time go?
+
+_local = threading.local()
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _new_id(nbytes):
+    return os.urandom(nbytes).hex()
+
+
+def _estimate_tokens(text):
+    """Rough token estimate, about four characters per token"""
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = json.dumps(text, default=str)
+    return max(1, len(text) // 4)
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+    def to_otlp(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(self.start * 1e9)),
+            "endTimeUnixNano": str(int((self.end or self.start) * 1e9)),
+            "attributes": [_otlp_attribute("span.kind", self.kind)]
+                          + [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status == "error" else 1},
+        }
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    if not isinstance(value, str):
+        value = json.dumps(value, default=str)
+    return {"key": key, "value": {"stringValue": value}}
+
+
+class TraceExporter(threading.Thread):
+    """Writes finished spans to a file from a background thread.
+
+    format is "jsonl" (one span per line) or "otlp" (one OTLP/JSON
+    ExportTraceServiceRequest per line, as written by the OpenTelemetry
+    collector's file exporter).
+    """
+
+    _STOP = object()
+
+    def __init__(self, path, format="jsonl", service_name="crews", flush_interval=0.5):
+        super().__init__(name="trace-exporter", daemon=True)
+        if format not in ("jsonl", "otlp"):
+            raise ValueError(f"Unknown trace format: {format}")
+        self.path = path
+        self.format = format
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self.exported = 0
+        self._queue = queue.Queue()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self.start()
+
+    def export(self, span):
+        self._queue.put(span)
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+        self._file.close()
+
+    def _write(self, spans):
+        if self.format == "jsonl":
+            for span in spans:
+                self._file.write(json.dumps(span.to_dict(), default=str) + "\n")
+        else:
+            request = {"resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "CrewTracing"}, "spans": [s.to_otlp() for s in spans]}],
+            }]}
+            self._file.write(json.dumps(request) + "\n")
+        self._file.flush()
+        self.exported += len(spans)
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self.join()
+
+
+class Tracer:
+    """Creates nested spans and hands finished ones to an exporter.
+
+    The parent of a new span is the innermost open span on the current thread.
+    Tasks that TaskScheduler runs on pool threads have no open span there, so
+    they attach to the span of the crew they belong to instead.
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self._crew_spans = {}
+        self._patches = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name, kind="internal", parent=None, **attributes):
+        stack = _stack()
+        if parent is None and stack:
+            parent = stack[-1]
+        span = Span(
+            name=name,
+            kind=kind,
+            trace_id=parent.trace_id if parent else _new_id(16),
+            span_id=_new_id(8),
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+        )
+        span.set(**attributes)
+        stack.append(span)
+        return span
+
+    def end_span(self, span, error=None, **attributes):
+        span.end = time.time()
+        span.set(**attributes)
+        if error is not None:
+            span.status = "error"
+            span.set(error=f"{type(error).__name__}: {error}")
+        stack = _stack()
+        if span in stack:
+            stack.remove(span)
+        self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name, kind="internal", parent=None, **attributes):
+        span = self.start_span(name, kind, parent, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        self.end_span(span)
+
+    @contextmanager
+    def crew_span(self, crew, **attributes):
+        with self._lock:
+            outer = self._crew_spans.get(id(crew))
+        if outer is not None:
+            # Already traced by an outer kickoff/run_dag of the same crew
+            yield outer
+            return
+        tasks = getattr(crew, "tasks", [])
+        agents = getattr(crew, "agents", [])
+        with self.span(f"crew {getattr(crew, 'name', None) or 'crew'}", "crew",
+                       tasks=len(tasks), agents=len(agents), **attributes) as span:
+            with self._lock:
+                self._crew_spans[id(crew)] = span
+            try:
+                yield span
+            finally:
+                with self._lock:
+                    self._crew_spans.pop(id(crew), None)
+
+    def parent_for_task(self, task):
+        if _stack():
+            return None
+        crew = getattr(getattr(task, "agent", None), "crew", None)
+        with self._lock:
+            return self._crew_spans.get(id(crew))
+
+    # -- instrumentation -------------------------------------------------
+
+    def _patch(self, owner, name, make_wrapper):
+        original = owner.__dict__.get(name)
+        if original is None:
+            return
+        setattr(owner, name, make_wrapper(original))
+        self._patches.append((owner, name, original))
+
+    def install(self):
+        """Wraps crewai (and langchain tool) entry points; undone by uninstall()"""
+        from crewai import Crew, LLM, Task
+        from crewai.tools import BaseTool
+
+        self._patch(Crew, "kickoff", self._wrap_kickoff)
+        self._patch(Task, "execute_sync", self._wrap_task)
+        self._patch(LLM, "call", self._wrap_llm)
+        if "LLMCache" in sys.modules:
+            self._patch(sys.modules["LLMCache"].CachedLLM, "call", self._wrap_llm)
+        self._patch(BaseTool, "run", self._wrap_tool)
+        try:
+            # Agents call tools through structured wrappers around BaseTool._run
+            from crewai.tools.structured_tool import CrewStructuredTool
+            self._patch(CrewStructuredTool, "invoke", self._wrap_tool)
+        except ImportError:
+            pass
+        try:
+            # Plain langchain tools such as CalculatorTool.calculate
+            from langchain_core.tools import BaseTool as LangchainTool
+            self._patch(LangchainTool, "run", self._wrap_tool)
+        except ImportError:
+            pass
+        return self
+
+    def uninstall(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches.clear()
+
+    def _wrap_kickoff(self, kickoff):
+        tracer = self
+
+        def traced_kickoff(crew, *args, **kwargs):
+            with tracer.crew_span(crew, mode="sequential"):
+                return kickoff(crew, *args, **kwargs)
+        return traced_kickoff
+
+    def _wrap_task(self, execute_sync):
+        tracer = self
+
+        def traced_execute_sync(task, *args, **kwargs):
+            from TaskScheduler import task_label
+
+            agent = kwargs.get("agent") or (args[0] if args else None) or task.agent
+            before = _token_snapshot(agent)
+            span = tracer.start_span(f"task {task_label(task)}", "task", parent=tracer.parent_for_task(task),
+                                     agent=getattr(agent, "role", None),
+                                     output_file=getattr(task, "output_file", None))
+            try:
+                output = execute_sync(task, *args, **kwargs)
+            except BaseException as e:
+                tracer.end_span(span, error=e)
+                raise
+            after = _token_snapshot(agent)
+            usage = {}
+            if before is not None and after is not None:
+                usage = {f"tokens.{k}": after[k] - before.get(k, 0) for k in after}
+            tracer.end_span(span, output_chars=len(getattr(output, "raw", "") or ""), **usage)
+            return output
+        return traced_execute_sync
+
+    def _wrap_llm(self, call):
+        tracer = self
+
+        def traced_call(llm, messages, *args, **kwargs):
+            # CachedLLM.call -> LLM.call would otherwise produce two spans
+            if getattr(_local, "in_llm", False):
+                return call(llm, messages, *args, **kwargs)
+            _local.in_llm = True
+            cache = sys.modules.get("LLMCache")
+            if cache:
+                cache.last_call_cached(reset=True)
+            before = dict(getattr(llm, "_token_usage", None) or {})
+            span = tracer.start_span(f"llm {getattr(llm, 'model', '?')}", "llm",
+                                     model=getattr(llm, "model", None),
+                                     stream=bool(getattr(llm, "stream", False)))
+            try:
+                response = call(llm, messages, *args, **kwargs)
+            except BaseException as e:
+                tracer.end_span(span, error=e)
+                raise
+            finally:
+                _local.in_llm = False
+            after = getattr(llm, "_token_usage", None) or {}
+            if after and after.get("total_tokens", 0) > before.get("total_tokens", 0):
+                usage = {f"tokens.{k}": v - before.get(k, 0) for k, v in after.items()
+                         if isinstance(v, int)}
+            else:
+                usage = {"tokens.prompt_tokens": _estimate_tokens(messages),
+                         "tokens.completion_tokens": _estimate_tokens(response),
+                         "tokens.estimated": True}
+            tracer.end_span(span, cache_hit=cache.last_call_cached() if cache else None, **usage)
+            return response
+        return traced_call
+
+    def _wrap_tool(self, run):
+        tracer = self
+
+        def traced_run(tool, *args, **kwargs):
+            if getattr(_local, "in_tool", False):
+                return run(tool, *args, **kwargs)
+            _local.in_tool = True
+            scrape = sys.modules.get("ScrapeCache")
+            if scrape:
+                scrape.last_fetch_cached(reset=True)
+            tool_input = args[0] if args else kwargs.get("input", kwargs or None)
+            span = tracer.start_span(f"tool {tool.name}", "tool", tool=tool.name,
+                                     input=str(tool_input)[:200])
+            try:
+                result = run(tool, *args, **kwargs)
+            except BaseException as e:
+                tracer.end_span(span, error=e)
+                raise
+            finally:
+                _local.in_tool = False
+            tracer.end_span(span, cache_hit=scrape.last_fetch_cached() if scrape else None,
+                            output_chars=len(str(result)))
+            return result
+        return traced_run
+
+    def close(self):
+        self.uninstall()
+        self.exporter.close()
+
+
+def _token_snapshot(agent):
+    """Cumulative token usage of an agent's LLM, or None when it isn't tracked"""
+    process = getattr(agent, "_token_process", None)
+    if process is not None:
+        summary = process.get_summary()
+        return {"prompt_tokens": summary.prompt_tokens, "completion_tokens": summary.completion_tokens,
+                "total_tokens": summary.total_tokens}
+    usage = getattr(getattr(agent, "llm", None), "_token_usage", None)
+    if isinstance(usage, dict):
+        return {k: v for k, v in usage.items() if isinstance(v, int)}
+    return None
+
+
+def current_tracer():
+    return _tracer
+
+
+def start_tracing(path, format=None):
+    """Installs a process-wide tracer writing to path (format from the extension by default)"""
+    global _tracer
+    if format is None:
+        format = "otlp" if path.endswith((".otlp", ".otlp.json", ".otlp.jsonl")) else "jsonl"
+    with _tracer_lock:
+        if _tracer is not None:
+            raise RuntimeError("Tracing is already active")
+        _tracer = Tracer(TraceExporter(path, format)).install()
+        return _tracer
+
+
+def stop_tracing():
+    global _tracer
+    with _tracer_lock:
+        tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+
+@contextmanager
+def tracing(path, format=None):
+    """Traces the enclosed block to path; does nothing when path is empty"""
+    if not path:
+        yield None
+        return
+    tracer = start_tracing(path, format)
+    try:
+        yield tracer
+    finally:
+        stop_tracing()
+
+
+@contextmanager
+def crew_span(crew, **attributes):
+    """Span around a whole crew run when tracing is active, otherwise a no-op"""
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    with tracer.crew_span(crew, **attributes) as span:
+        yield span
+
+
+def load_spans(path):
+    """Reads spans back from a JSONL or OTLP/JSON trace file as dicts"""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "resourceSpans" not in record:
+                spans.append(record)
+                continue
+            for resource in record["resourceSpans"]:
+                for scope in resource.get("scopeSpans", []):
+                    for s in scope.get("spans", []):
+                        attributes = {a["key"]: next(iter(a["value"].values())) for a in s.get("attributes", [])}
+                        start = int(s["startTimeUnixNano"]) / 1e9
+                        end = int(s["endTimeUnixNano"]) / 1e9
+                        spans.append({
+                            "name": s["name"], "kind": attributes.pop("span.kind", "internal"),
+                            "span_id": s["spanId"], "parent_id": s.get("parentSpanId") or None,
+                            "start": start, "end": end, "duration": end - start,
+                            "attributes": attributes,
+                        })
+    return spans
+
+
+def summarize(spans):
+    """Per-kind table of span names by total duration, longest first"""
+    groups = {}
+    for span in spans:
+        group = groups.setdefault((span["kind"], span["name"]), {"count": 0, "seconds": 0.0, "max": 0.0,
+                                                                  "tokens": 0, "cache_hits": 0})
+        attributes = span.get("attributes", {})
+        group["count"] += 1
+        group["seconds"] += span["duration"]
+        group["max"] = max(group["max"], span["duration"])
+        group["tokens"] += int(attributes.get("tokens.total_tokens", 0)) or (
+            int(attributes.get("tokens.prompt_tokens", 0)) + int(attributes.get("tokens.completion_tokens", 0)))
+        group["cache_hits"] += 1 if attributes.get("cache_hit") in (True, "true") else 0
+    lines = []
+    for kind in ("crew", "task", "llm", "tool"):
+        rows = sorted(((name, g) for (k, name), g in groups.items() if k == kind),
+                      key=lambda row: row[1]["seconds"], reverse=True)
+        if not rows:
+            continue
+        lines.append(f"{kind}s")
+        for name, g in rows:
+            lines.append(f"  {g['seconds']:8.1f}s  x{g['count']:<4} max {g['max']:6.1f}s  "
+                         f"{g['tokens']:>8} tok  {g['cache_hits']:>3} cached  {name}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize a trace file written with --trace")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    print(summarize(load_spans(args.path)))
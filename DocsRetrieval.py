@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+from crewai.tools import BaseTool
+from pydantic import PrivateAttr
+
+from SearchIndex import BM25Index, chunk_text
+
+# Retrieval over a fixed set of documentation pages. Pages are fetched through
+# the shared ScrapeCache, split into passages and indexed once; the tool then
+# returns only the passages that match the agent's query, each with its source
+# URL, instead of whole pages.
+
+
+class DocsIndex:
+    """BM25 index over the passages of a set of URLs, re-chunked only when a page changes"""
+
+    def __init__(self, urls, cache=None, max_words=100, overlap=20, refresh_interval=3600.0):
+        self.urls = list(urls)
+        if cache is None:
+            # ScrapeCache pulls in crewai_tools, so only import it when an index is built
+            from ScrapeCache import shared_scrape_cache
+            cache = shared_scrape_cache()
+        self.cache = cache
+        self.max_words = max_words
+        self.overlap = overlap
+        self.refresh_interval = refresh_interval
+        self.index = BM25Index()
+        self.errors = {}
+        self._digests = {}
+        self._refreshed = 0.0
+        self._lock = threading.Lock()
+
+    def _passages(self, url, text):
+        # Scraped text keeps one line per block; treat lines as paragraphs
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        return [(chunk, {"url": url, "passage": i})
+                for i, chunk in enumerate(chunk_text("\n\n".join(lines), self.max_words, self.overlap))]
+
+    def refresh(self, force=False):
+        """Fetches the pages (cached per ScrapeCache TTL); returns how many were re-indexed"""
+        with self._lock:
+            if not force and time.time() - self._refreshed < self.refresh_interval:
+                return 0
+            with ThreadPoolExecutor(max_workers=min(8, max(len(self.urls), 1))) as pool:
+                pages = list(pool.map(self._fetch, self.urls))
+            changed = 0
+            for url, text in zip(self.urls, pages):
+                if text is None:
+                    continue
+                digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+                if self._digests.get(url) == digest:
+                    continue
+                self.index.add_document(url, self._passages(url, text))
+                self._digests[url] = digest
+                changed += 1
+            self._refreshed = time.time()
+            return changed
+
+    def _fetch(self, url):
+        try:
+            text = self.cache.fetch(url)
+            self.errors.pop(url, None)
+            return text
+        except Exception as e:
+            # Keep serving the last indexed copy of the page
+            self.errors[url] = f"{type(e).__name__}: {e}"
+            return None
+
+    def search(self, query, k=4):
+        self.refresh()
+        with self._lock:
+            return self.index.search(query, k)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def shared_docs_index(urls):
+    """One index per set of URLs, shared by every tool (and crew) in the process"""
+    key = tuple(urls)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = DocsIndex(urls)
+        return _indexes[key]
+
+
+class DocsRetrievalTool(BaseTool):
+    name: str = "Search documentation"
+    description: str = ("Searches the reference documentation and returns the passages most "
+                        "relevant to the query, each with the URL it came from for citation.")
+    urls: List[str]
+    top_k: int = 4
+
+    _index: Any = PrivateAttr(default=None)
+
+    def _run(self, query: str) -> str:
+        if self._index is None:
+            self._index = shared_docs_index(self.urls)
+        results = self._index.search(query, self.top_k)
+        if not results:
+            return "No relevant documentation found."
+        return "\n\n".join(
+            f"[{i + 1}] Source: {p['meta']['url']} (passage {p['meta']['passage']}, score {score:.2f})\n{p['text']}"
+            for i, (score, p) in enumerate(results)
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prefetch and query the documentation index")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--query")
+    parser.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    index = DocsIndex(args.urls)
+    print(f"{index.refresh(force=True)} pages indexed, {len(index.index)} passages")
+    for url, error in index.errors.items():
+        print(f"  failed: {url}: {error}")
+    if args.query:
+        for score, passage in index.search(args.query, args.k):
+            print(f"\n[{passage['meta']['url']} #{passage['meta']['passage']}] {score:.2f}\n{passage['text']}")
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Any
+
+from crewai.tools import BaseTool
+from pydantic import PrivateAttr
+
+from SearchIndex import BM25Index, chunk_text
+
+# BM25 index over the ./instructions playbooks. The built index (postings and
+# passage lengths) and a manifest of (mtime, size, sha1) per file are persisted,
+# so startup loads the index as is, a refresh only re-reads files whose mtime or
+# size changed, and only those whose hash changed are re-indexed.
+
+DEFAULT_INDEX_DIR = ".cache"
+
+
+def _read_mapped(path, known_sha1=None):
+    """Returns (sha1, text) of a file read through mmap; text is None if the hash is known_sha1.
+
+    Hashing and decoding read the mapping directly, without copying the file into a bytes object.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            digest = hashlib.sha1(b"").hexdigest()
+            return digest, None if digest == known_sha1 else ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest = hashlib.sha1(mapped).hexdigest()
+            if digest == known_sha1:
+                return digest, None
+            return digest, str(mapped, "utf-8", errors="ignore")
+
+
+class InstructionIndex:
+    def __init__(self, directory="./instructions", index_path=None, max_words=150):
+        self.directory = directory
+        name = hashlib.sha1(os.path.abspath(directory).encode("utf-8")).hexdigest()[:12]
+        self.index_path = index_path or os.path.join(DEFAULT_INDEX_DIR, f"instructions_{name}.json")
+        self.max_words = max_words
+        self.manifest = {}
+        self.index = BM25Index()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.manifest = data.get("manifest", {})
+        self.index = BM25Index.from_dict(data.get("index", {}))
+
+    def _save(self):
+        if os.path.dirname(self.index_path):
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"manifest": self.manifest, "index": self.index.to_dict()}, f)
+        os.replace(tmp, self.index_path)
+
+    def _files(self):
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if not name.startswith("."):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, self.directory), path
+
+    def refresh(self):
+        """Re-indexes changed files and drops deleted ones; returns number of changes"""
+        with self._lock:
+            changes = 0
+            touched = False
+            seen = set()
+            for rel, path in self._files():
+                seen.add(rel)
+                stat = os.stat(path)
+                entry = self.manifest.get(rel)
+                if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    continue
+                digest, text = _read_mapped(path, entry and entry["sha1"])
+                if text is not None:
+                    passages = [(chunk, {"source": rel, "chunk": i})
+                                for i, chunk in enumerate(chunk_text(text, self.max_words))]
+                    self.index.add_document(rel, passages)
+                    changes += 1
+                self.manifest[rel] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": digest}
+                touched = True
+
+            for rel in set(self.manifest) - seen:
+                self.index.remove_document(rel)
+                del self.manifest[rel]
+                changes += 1
+
+            # Touched files with unchanged content only update the manifest
+            if changes or touched:
+                self._save()
+            return changes
+
+    def search(self, query, k=5):
+        with self._lock:
+            return self.index.search(query, k)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def shared_instruction_index(directory):
+    """One index per directory, shared by every tool (and thread) in the process"""
+    key = os.path.abspath(directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = InstructionIndex(directory)
+        return _indexes[key]
+
+
+class InstructionSearchTool(BaseTool):
+    name: str = "Search instructions"
+    description: str = ("Searches the instruction playbooks and returns only the most "
+                        "relevant passages, with the file each passage came from.")
+    directory: str = "./instructions"
+    top_k: int = 5
+    refresh_interval: float = 30.0
+
+    _index: Any = PrivateAttr(default=None)
+    _refreshed: float = PrivateAttr(default=0.0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def _run(self, query: str) -> str:
+        # Outreach batches call the same tool from several threads
+        with self._lock:
+            if self._index is None:
+                self._index = shared_instruction_index(self.directory)
+            if time.time() - self._refreshed > self.refresh_interval:
+                self._index.refresh()
+                self._refreshed = time.time()
+
+        results = self._index.search(query, self.top_k)
+        if not results:
+            return "No relevant instructions found."
+        return "\n\n".join(
+            f"[{p['meta']['source']} #{p['meta']['chunk']}] (score {score:.2f})\n{p['text']}"
+            for score, p in results
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the instruction index")
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--directory", default="./instructions")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index = InstructionIndex(args.directory)
+    print(f"{index.refresh()} files re-indexed, {len(index.index)} passages")
+    if args.query:
+        for score, passage in index.search(args.query, args.k):
+            print(f"\n[{passage['meta']['source']} #{passage['meta']['chunk']}] {score:.2f}\n{passage['text']}")
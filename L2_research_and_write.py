@@ -1,113 +1,346 @@
-import os
+from CrewBootstrap import load_env
+load_env()
+
+import re
+import sys
+import time
+
 from crewai import Agent, Task, Crew
-from instructor.cli.batch import results
-
-from dotenv import load_dotenv
-load_dotenv()
-
-
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["OPENAI_MODEL_NAME"] =  os.getenv("OPENAI_MODEL_NAME")
-planner = Agent(
-    role="Content Planner",
-    goal="Plan engaging and factually accurate content on {topic}",
-    backstory="You're working on planning a blog article "
-              "about the topic: {topic}."
-              "You collect information that helps the "
-              "audience learn something "
-              "and make informed decisions. "
-              "Your work is the basis for "
-              "the Content Writer to write an article on this topic.",
-    allow_delegation=False,
-	verbose=True
-)
-
-writer = Agent(
-    role="Content Writer",
-    goal="Write insightful and factually accurate "
-         "opinion piece about the topic: {topic}",
-    backstory="You're working on a writing "
-              "a new opinion piece about the topic: {topic}. "
-              "You base your writing on the work of "
-              "the Content Planner, who provides an outline "
-              "and relevant context about the topic. "
-              "You follow the main objectives and "
-              "direction of the outline, "
-              "as provide by the Content Planner. "
-              "You also provide objective and impartial insights "
-              "and back them up with information "
-              "provide by the Content Planner. "
-              "You acknowledge in your opinion piece "
-              "when your statements are opinions "
-              "as opposed to objective statements.",
-    allow_delegation=False,
-    verbose=True
-)
-
-editor = Agent(
-    role="Editor",
-    goal="Edit a given blog post to align with "
-         "the writing style of the organization. ",
-    backstory="You are an editor who receives a blog post "
-              "from the Content Writer. "
-              "Your goal is to review the blog post "
-              "to ensure that it follows journalistic best practices,"
-              "provides balanced viewpoints "
-              "when providing opinions or assertions, "
-              "and also avoids major controversial topics "
-              "or opinions when possible.",
-    allow_delegation=False,
-    verbose=True
-)
-plan = Task(
-    description=(
-        "1. Prioritize the latest trends, key players, "
-            "and noteworthy news on {topic}.\n"
-        "2. Identify the target audience, considering "
-            "their interests and pain points.\n"
-        "3. Develop a detailed content outline including "
-            "an introduction, key points, and a call to action.\n"
-        "4. Include SEO keywords and relevant data or sources."
-    ),
-    expected_output="A comprehensive content plan document "
-        "with an outline, audience analysis, "
-        "SEO keywords, and resources.",
-    agent=planner,
-)
-
-write = Task(
-    description=(
-        "1. Use the content plan to craft a compelling "
-            "blog post on {topic}.\n"
-        "2. Incorporate SEO keywords naturally.\n"
-		"3. Sections/Subtitles are properly named "
-            "in an engaging manner.\n"
-        "4. Ensure the post is structured with an "
-            "engaging introduction, insightful body, "
-            "and a summarizing conclusion.\n"
-        "5. Proofread for grammatical errors and "
-            "alignment with the brand's voice.\n"
-    ),
-    expected_output="A well-written blog post "
-        "in markdown format, ready for publication, "
-        "each section should have 2 or 3 paragraphs.",
-    agent=writer,
-)
-edit = Task(
-    description=("Proofread the given blog post for "
-                 "grammatical errors and "
-                 "alignment with the brand's voice."),
-    expected_output="A well-written blog post in markdown format, "
-                    "ready for publication, "
-                    "each section should have 2 or 3 paragraphs.",
-    agent=editor
-)
-crew = Crew(
-    agents=[planner, writer, editor],
-    tasks=[plan, write, edit],
-    verbose=True
-)
-
-result = crew.kickoff(inputs={"topic": "Artificial Intelligence"})
-
-print(result)
+
+import LLMStreaming
+from LLMCache import get_llm
+from MaskingStage import LocalStage
+from TaskScheduler import run_dag
+llm = get_llm()
+
+OUTPUT_PATH = "L2_blog.md"
+
+
+def build_crew(stream=False, draft=False, own_llms=False):
+    """Planner -> writer -> editor; draft=True stops after the writer.
+
+    With stream=True every agent gets its own streaming LLM, so each one's
+    tokens can be routed to a different sink. own_llms=True does the same
+    without streaming, so the crew's token usage is not shared with others.
+    """
+    verbose = not stream
+
+    def agent_llm():
+        return get_llm(stream=stream) if stream or own_llms else llm
+
+    planner = Agent(
+        role="Content Planner",
+        llm=agent_llm(),
+        goal="Plan engaging and factually accurate content on {topic}",
+        backstory="You're working on planning a blog article "
+                  "about the topic: {topic}."
+                  "You collect information that helps the "
+                  "audience learn something "
+                  "and make informed decisions. "
+                  "Your work is the basis for "
+                  "the Content Writer to write an article on this topic.",
+        allow_delegation=False,
+        verbose=verbose
+    )
+
+    writer = Agent(
+        role="Content Writer",
+        llm=agent_llm(),
+        goal="Write insightful and factually accurate "
+             "opinion piece about the topic: {topic}",
+        backstory="You're working on a writing "
+                  "a new opinion piece about the topic: {topic}. "
+                  "You base your writing on the work of "
+                  "the Content Planner, who provides an outline "
+                  "and relevant context about the topic. "
+                  "You follow the main objectives and "
+                  "direction of the outline, "
+                  "as provide by the Content Planner. "
+                  "You also provide objective and impartial insights "
+                  "and back them up with information "
+                  "provide by the Content Planner. "
+                  "You acknowledge in your opinion piece "
+                  "when your statements are opinions "
+                  "as opposed to objective statements.",
+        allow_delegation=False,
+        verbose=verbose
+    )
+
+    editor = Agent(
+        role="Editor",
+        llm=agent_llm(),
+        goal="Edit a given blog post to align with "
+             "the writing style of the organization. ",
+        backstory="You are an editor who receives a blog post "
+                  "from the Content Writer. "
+                  "Your goal is to review the blog post "
+                  "to ensure that it follows journalistic best practices,"
+                  "provides balanced viewpoints "
+                  "when providing opinions or assertions, "
+                  "and also avoids major controversial topics "
+                  "or opinions when possible.",
+        allow_delegation=False,
+        verbose=verbose
+    )
+
+    plan = Task(
+        description=(
+            "1. Prioritize the latest trends, key players, "
+                "and noteworthy news on {topic}.\n"
+            "2. Identify the target audience, considering "
+                "their interests and pain points.\n"
+            "3. Develop a detailed content outline including "
+                "an introduction, key points, and a call to action.\n"
+            "4. Include SEO keywords and relevant data or sources."
+        ),
+        expected_output="A comprehensive content plan document "
+            "with an outline, audience analysis, "
+            "SEO keywords, and resources.",
+        agent=planner,
+    )
+
+    write = Task(
+        description=(
+            "1. Use the content plan to craft a compelling "
+                "blog post on {topic}.\n"
+            "2. Incorporate SEO keywords naturally.\n"
+            "3. Sections/Subtitles are properly named "
+                "in an engaging manner.\n"
+            "4. Ensure the post is structured with an "
+                "engaging introduction, insightful body, "
+                "and a summarizing conclusion.\n"
+            "5. Proofread for grammatical errors and "
+                "alignment with the brand's voice.\n"
+        ),
+        expected_output="A well-written blog post "
+            "in markdown format, ready for publication, "
+            "each section should have 2 or 3 paragraphs.",
+        agent=writer,
+    )
+    edit = Task(
+        description=("Proofread the given blog post for "
+                     "grammatical errors and "
+                     "alignment with the brand's voice."),
+        expected_output="A well-written blog post in markdown format, "
+                        "ready for publication, "
+                        "each section should have 2 or 3 paragraphs.",
+        agent=editor
+    )
+
+    if draft:
+        return Crew(agents=[planner, writer], tasks=[plan, write], verbose=verbose)
+    return Crew(
+        agents=[planner, writer, editor],
+        tasks=[plan, write, edit],
+        verbose=verbose
+    )
+
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+)$")
+_ITEM_RE = re.compile(r"^(\s*)(?:[-*+]|\d+[.)]|[IVX]+\.)\s+(.+)$")
+
+
+def _braces(text):
+    # Braces would be taken for input placeholders when the task is interpolated
+    return text.replace("{", "(").replace("}", ")")
+
+
+def _clean_title(text):
+    return _braces(text.strip().strip("*_").strip().rstrip(":").strip("*_").strip())
+
+
+def outline_sections(plan_text, max_sections=8):
+    """(title, notes) for each top-level entry of the plan's outline.
+
+    The outline is the part of the plan under a heading or label mentioning
+    "outline"; its entries are the shallowest headings in it or, failing
+    that, the least indented list items. Returns [] when there is no outline.
+    """
+    lines = plan_text.splitlines()
+    start = level = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        heading = _HEADING_RE.match(stripped)
+        labelled = heading or stripped.startswith("**") or stripped.endswith(":") or _ITEM_RE.match(line)
+        if labelled and "outline" in stripped.lower() and len(stripped) < 80:
+            start, level = i + 1, len(heading.group(1)) if heading else None
+            marker_item = None if heading else _ITEM_RE.match(line)
+            break
+    if start is None:
+        return []
+
+    region = []
+    for line in lines[start:]:
+        heading = _HEADING_RE.match(line.strip())
+        if heading and level is not None and len(heading.group(1)) <= level:
+            break
+        item = _ITEM_RE.match(line)
+        if item and marker_item and len(item.group(1)) <= len(marker_item.group(1)):
+            break
+        region.append(line)
+
+    headings = [(i, len(m.group(1))) for i, m in ((i, _HEADING_RE.match(l.strip())) for i, l in enumerate(region)) if m]
+    items = [(i, len(m.group(1))) for i, m in ((i, _ITEM_RE.match(l)) for i, l in enumerate(region)) if m]
+    first_item = items[0][0] if items else len(region)
+    if headings and headings[0][0] < first_item:
+        depth = min(d for _, d in headings)
+        starts = [(i, _HEADING_RE.match(region[i].strip()).group(2)) for i, d in headings if d == depth]
+    elif items:
+        # A heading after the list (e.g. "## Audience Analysis") ends the outline
+        end = next((i for i, _ in headings if i > first_item), len(region))
+        region = region[:end]
+        indent = min(d for i, d in items if i < end)
+        starts = [(i, _ITEM_RE.match(region[i]).group(2)) for i, d in items if d == indent and i < end]
+    else:
+        return []
+
+    sections = []
+    for n, (i, title) in enumerate(starts):
+        stop = starts[n + 1][0] if n + 1 < len(starts) else len(region)
+        notes = "\n".join(line for line in region[i + 1:stop] if line.strip())
+        sections.append((_clean_title(title), _braces(notes)))
+    if len(sections) > max_sections:
+        # Group neighbouring entries rather than dropping any
+        size = -(-len(sections) // max_sections)
+        sections = [(" / ".join(t for t, _ in group), "\n".join(n for _, n in group if n))
+                    for group in (sections[k:k + size] for k in range(0, len(sections), size))]
+    return sections
+
+
+class JoinSections(LocalStage):
+    """Concatenates the sections in order; the merge step of a draft"""
+
+    def run(self, context_outputs):
+        return "\n\n".join(o.raw.strip() for o in context_outputs), None
+
+
+def fanout_crew(crew, plan_output, max_sections=8):
+    """Replaces the write task of a build_crew() crew with one writer task
+    per outline section and a merge step. Returns (crew, stages), or
+    (None, []) when the plan has fewer than two sections to fan out.
+    """
+    plan, write = crew.tasks[:2]
+    edit = crew.tasks[2] if len(crew.tasks) > 2 else None
+    sections = outline_sections(plan_output.raw, max_sections)
+    if len(sections) < 2:
+        return None, []
+
+    writers = []
+    section_tasks = []
+    for n, (title, notes) in enumerate(sections, 1):
+        # Each section gets its own copy of the writer so the copies can run concurrently
+        writer = write.agent.copy()
+        writers.append(writer)
+        section_tasks.append(Task(
+            description=(
+                f"Write section {n} of {len(sections)} of the blog post on {{topic}}: "
+                f"\"{title}\".\n"
+                + (f"Outline notes for this section:\n{notes}\n" if notes else "")
+                + "Follow the content plan and incorporate its SEO keywords naturally. "
+                "Write only this section, starting with an engaging '## ' subtitle; "
+                "the other sections are written separately and merged afterwards."
+            ),
+            expected_output="The section in markdown format, 2 or 3 paragraphs, "
+                            "starting with its '## ' subtitle.",
+            agent=writer,
+            context=[plan],
+        ))
+
+    if edit is None:
+        return Crew(agents=[plan.agent, *writers], tasks=[plan, *section_tasks],
+                    verbose=crew.verbose), [JoinSections("join sections", section_tasks)]
+    merge = Task(
+        description=("Merge the given sections, written separately, into one blog post "
+                     "on {topic}. Keep their order and substance, unify the voice, add "
+                     "transitions between sections, remove repetition, and proofread for "
+                     "grammatical errors and alignment with the brand's voice."),
+        expected_output=edit.expected_output,
+        agent=edit.agent,
+        context=section_tasks,
+    )
+    return Crew(agents=[plan.agent, *writers, edit.agent], tasks=[plan, *section_tasks, merge],
+                verbose=crew.verbose), []
+
+
+def run_plan(crew, inputs):
+    """Runs only the plan task of a build_crew() crew; returns its TaskOutput"""
+    plan = crew.tasks[0]
+    planning = Crew(agents=[plan.agent], tasks=[plan], verbose=crew.verbose)
+    return planning.kickoff(inputs=inputs).tasks_output[0]
+
+
+def kickoff_fanout(crew, inputs, max_workers=None, max_sections=8, plan_output=None):
+    """Runs the plan (unless plan_output is given), then writes every outline
+    section concurrently and merges them.
+
+    Falls back to the crew's own write (and edit) tasks when the plan has no
+    usable outline. Returns a TaskScheduler.DagResult.
+    """
+    if plan_output is None:
+        plan_output = run_plan(crew, inputs)
+    fanout, stages = fanout_crew(crew, plan_output, max_sections)
+    if fanout is None:
+        fanout = crew
+    # Without an editor the joined sections are the post
+    return run_dag(fanout, inputs=inputs, max_workers=max_workers, completed={0: plan_output}, stages=stages,
+                   result_stage=stages[-1] if stages else None)
+
+
+def kickoff_streaming(crew, inputs, path=OUTPUT_PATH, console=sys.stdout, run=None, echo=None):
+    """Kicks off a build_crew(stream=True) crew, echoing each task's answer as it
+    streams and writing the post to path while it is generated.
+
+    run() replaces crew.kickoff(inputs=inputs) (e.g. kickoff_fanout) and echo
+    lists the tasks whose agents' answers are shown, all by default; the last
+    of them streams into path. Returns the result and the seconds until the
+    first token of the post (None if it never streamed).
+    """
+    tasks = list(crew.tasks if echo is None else echo)
+    post = LLMStreaming.AnswerSink(path=path, console=console,
+                                   header=f"## {tasks[-1].agent.role}" if tasks else None)
+    sinks = [LLMStreaming.AnswerSink(console=console, header=f"## {task.agent.role}") for task in tasks[:-1]]
+    sinks.append(post)
+    for task, sink in zip(tasks, sinks):
+        LLMStreaming.add_sink(task.agent.llm, sink)
+    start = time.perf_counter()
+    result = None
+    try:
+        result = run() if run else crew.kickoff(inputs=inputs)
+    finally:
+        for task, sink in zip(tasks, sinks):
+            LLMStreaming.remove_sink(task.agent.llm, sink)
+        for sink in sinks[:-1]:
+            sink.finish()
+        post.finish(result.raw if result is not None else None)
+    return result, (post.first_answer_at - start if post.first_answer_at is not None else None)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plan, write and edit a blog post")
+    parser.add_argument("--topic", default="Artificial Intelligence")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream each task's answer to the console and the post to --output")
+    parser.add_argument("--draft", action="store_true", help="skip the editor")
+    parser.add_argument("--fanout", action="store_true",
+                        help="write the outline's sections concurrently, then merge them")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent section writers (--fanout)")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    inputs = {"topic": args.topic}
+    crew = build_crew(stream=args.stream, draft=args.draft)
+    run = (lambda: kickoff_fanout(crew, inputs, args.workers)) if args.fanout else None
+    if args.stream:
+        # Concurrent sections would interleave on the console, so fan-out only streams the merge
+        echo = ([] if args.draft else crew.tasks[-1:]) if args.fanout else None
+        result, first_token = kickoff_streaming(crew, inputs, args.output, run=run, echo=echo)
+        if first_token is not None:
+            print(f"\nFirst token of the post after {first_token:.1f}s")
+        print(f"Post written to {args.output}")
+    else:
+        result = run() if run else crew.kickoff(inputs=inputs)
+        print(result)
+    if args.fanout:
+        print(result.report())
@@ -2,26 +2,28 @@
 import warnings
 warnings.filterwarnings('ignore')
 
-from crewai import Agent, Task, Crew
-
-import os
-
-import os
-from dotenv import load_dotenv
-load_dotenv()
+from CrewBootstrap import load_env, scrape_tool as lazy_scrape_tool, search_tool as lazy_search_tool
+load_env(model='gpt-4o-mini')
 
-openai_api_key = os.getenv('OPENAI_API_KEY')
-os.environ["OPENAI_MODEL_NAME"] = 'gpt-4o-mini'
-os.environ["SERPER_API_KEY"] =os.getenv('SERPER_API_KEY')
+from crewai import Agent, Task, Crew
 
+# Built on first use; scraped pages are cached per TTL (see ScrapeCache.py)
+search_tool = lazy_search_tool()
+scrape_tool = lazy_scrape_tool()
 
-from crewai_tools import ScrapeWebsiteTool, SerperDevTool
+from LLMCache import get_llm
+from Backtester import BacktestTool, PlaybookBacktest
+from RiskEngine import RiskEngineTool
+llm = get_llm()
 
-search_tool = SerperDevTool()
-scrape_tool = ScrapeWebsiteTool()
+# VaR, CVaR and drawdown computed from local price history (RISK_DATA_PATH),
+# and backtests of playbook rules over the same series
+risk_engine_tool = RiskEngineTool()
+backtest_tool = BacktestTool()
 
 portfolio_manager_agent = Agent(
     role="Portfolio Manager",
+    llm=llm,
     goal="Based on a basic idea like {hypothesis} and those of {thought_leaders}, "
         " manage and develop a concrete hypothesis which is falsifiable and objective "
          " that brings together a set of financial factors like {financial_factors} "
@@ -41,6 +43,7 @@ portfolio_manager_agent = Agent(
 )
 strategist_analyst_agent = Agent(
     role="Strategist Analyst Agent",
+    llm=llm,
     goal="Flesh out the detailed trading strategies that will be implemented based on how of the  scenarios  provided by the "
         "Portfolio Manager play out: when X happens then do Y.",
     backstory="Equipped with a deep understanding of financial "
@@ -54,17 +57,19 @@ strategist_analyst_agent = Agent(
 
 trading_strategy_agent = Agent(
     role="Trading Strategy Agent",
+    llm=llm,
     goal="Create very specific the tactical trading playbook to follow in the future"
          "based on the hypothesis, strategies described in {tactical_strategies}, and instruments and mechanisms available.",
     backstory="This agent specializes in providing the playbook describing the timing, tactical steps, "
               "and logistical details of potential trades.",
     verbose=True,
     allow_delegation=False,
-    tools = [scrape_tool, search_tool]
+    tools = [backtest_tool, scrape_tool, search_tool]
 )
 
 team_editor_agent = Agent(
     role="Team Editor Agent",
+    llm=llm,
     goal="Responsible for ensuring the document follows the requirements outlines in the mental framework  {mental_framework}."
          "Ensure that no content is redundant and that the whole document is self consistent.",
     backstory="Professional editor and proofreader. You are aware of everybody's tasks and ensure that at the end of each review the document aligns with each steps requirements.",
@@ -73,6 +78,7 @@ team_editor_agent = Agent(
 )
 risk_management_agent = Agent(
     role="Risk Advisor",
+    llm=llm,
     goal="Evaluate and provide quantitative insights on the risks "
          "associated with potential trading activities: likelihood and VaR.",
     backstory="Armed with a deep understanding of risk assessment models "
@@ -80,7 +86,7 @@ risk_management_agent = Agent(
               "the risk outcomes (value at risk, drawdown, etc).",
     verbose=True,
     allow_delegation=False,
-    tools = [scrape_tool, search_tool]
+    tools = [risk_engine_tool, scrape_tool, search_tool]
 )
 
 # Task for Strategist Analyst Agent: Analyze Market Data
@@ -128,6 +134,9 @@ trading_tactics_development_task = Task(
     ),
     expected_output=(
         "Create a Detailed execution playbook coming from trading strategy and hypothesis. "
+        "End it with the playbook's rules as a ```json block in the Backtest playbook tool's format "
+        "(rules with conditions on the local factor series, instrument, position, hold_days, stop_loss), "
+        "checked with that tool so it runs."
     ),
     agent=trading_strategy_agent,
 )
@@ -152,6 +161,8 @@ risk_guardrails_task = Task(
         "risk, and the likelihood of occurrence and likelihood of outcome for each scenario."
         "Use the risk analysis frameworks in {risk_analysis_frameworks}."
         "Perform drawdawn calculations."
+        " Compute value at risk, CVaR and drawdown with the Risk engine tool, with one scenario"
+        " per portfolio implied by the strategies, and report its figures instead of estimating them."
     ),
     expected_output=(
         "A comprehensive risk analysis report detailing potential "
@@ -159,7 +170,7 @@ risk_guardrails_task = Task(
         "in markdown format."
     ),
     agent=risk_management_agent,
-    output_file="L6_final.md"
+    output_file="L6_risk.md"
 )
 
 wrap_up_task = Task(
@@ -179,10 +190,11 @@ wrap_up_task = Task(
 
 
 from crewai import Crew, Process
-from langchain_openai import ChatOpenAI
+from ContextCompaction import CompactingCrew, ContextCompactor
 
-# Define the crew with agents and tasks
-financial_trading_crew = Crew(
+# Define the crew with agents and tasks. The editor passes repeat, so each
+# task's context can be capped by a ContextCompactor (see --context-budget).
+financial_trading_crew = CompactingCrew(
 
     agents=[portfolio_manager_agent,
             strategist_analyst_agent,
@@ -200,8 +212,7 @@ financial_trading_crew = Crew(
             editor_task,
            wrap_up_task],
 
-    manager_llm=ChatOpenAI(model="gpt-4o-mini",
-                           temperature=0.7),
+    manager_llm=get_llm(temperature=0.7),
     process=Process.sequential,
     verbose=True
 )
@@ -222,16 +233,71 @@ macro_perspective_inputs = {
     'news_impact_consideration': True
 }
 
-### this execution will take some time to run
-result = financial_trading_crew.kickoff(inputs=macro_perspective_inputs)
-
-print(result)
-
-# Specify the filename
-filename = "L6_results.md"
-import json
-# Open the file in write mode ('w') and save the content
-with open(filename, 'w', encoding='utf-8') as f:
-    f.write(f"{result.tasks_output}")
-
-print(f"Successfully saved markdown content to {filename}")
\ No newline at end of file
+if __name__ == "__main__":
+    import argparse
+    import json
+    from CrewTracing import tracing
+    from RunCheckpoint import RunCheckpoint
+    from TaskScheduler import run_dag
+
+    parser = argparse.ArgumentParser(description="Macro hypothesis and trading playbook crew")
+    parser.add_argument("--dag", action="store_true",
+                        help="run independent tasks concurrently based on their context dependencies")
+    parser.add_argument("--workers", type=int, default=None, help="maximum concurrent tasks in --dag mode")
+    parser.add_argument("--trace", help="write crew/task/LLM/tool spans to this file (.jsonl, or .otlp.json)")
+    parser.add_argument("--context-budget", type=int, default=0,
+                        help="approximate tokens of earlier outputs passed to each task, e.g. 2000 "
+                             "(default 0 passes everything, as crewai does)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignore the checkpoint of an earlier run with the same inputs and tasks")
+    parser.add_argument("--backtest-workers", type=int, default=None,
+                        help="processes for the playbook's parameter variations")
+    args = parser.parse_args()
+
+    if args.dag:
+        # The risk report only needs the hypothesis and strategies, so with
+        # --dag it runs alongside the tactics playbook instead of after it.
+        # Sequential runs keep the full context of the earlier tasks.
+        risk_guardrails_task.context = [hypothesis_development_task, trading_strategy_development_task]
+
+    # Replays the playbook's rules block as soon as the tactics task is done
+    backtest = PlaybookBacktest("playbook backtest", [trading_tactics_development_task],
+                                workers=args.backtest_workers, output_file="L6_backtest.md")
+
+    compactor = ContextCompactor(args.context_budget) if args.context_budget > 0 else None
+    financial_trading_crew.context_compactor = compactor
+
+    # Every task output is checkpointed as it completes; rerunning after a
+    # failure picks up after the last completed task.
+    checkpoint = RunCheckpoint(financial_trading_crew, macro_perspective_inputs, name="L6")
+    if args.fresh:
+        checkpoint.discard()
+    completed = checkpoint.completed()
+    if completed:
+        print(f"Resuming from {checkpoint.path}: {len(completed)} of "
+              f"{len(financial_trading_crew.tasks)} tasks already done")
+
+    ### this execution will take some time to run
+    with tracing(args.trace):
+        # Without --dag, one task at a time in the crew's order
+        result = run_dag(financial_trading_crew, inputs=macro_perspective_inputs,
+                         max_workers=args.workers if args.dag else 1,
+                         completed=completed, on_complete=checkpoint.record, stages=[backtest],
+                         context_builder=compactor.build if compactor else None)
+
+    print(result.raw)
+    print(result.report())
+    print(f"Playbook backtest written to {backtest.output_file}")
+    if compactor:
+        print(compactor.report())
+
+    # One entry per task, in the crew's order
+    records = checkpoint.records()
+    with open("L6_results.json", "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    with open("L6_results.md", "w", encoding="utf-8") as f:
+        f.write("\n\n".join(f"## {r['position'] + 1}. {r['label']}\n\n{r['raw']}" for r in records) + "\n")
+
+    print(f"Task outputs saved to L6_results.md and L6_results.json (run log: {checkpoint.path})")
+    if args.trace:
+        print(f"Trace written to {args.trace} (summarize with: python CrewTracing.py {args.trace})")
@@ -2,193 +2,305 @@
 import warnings
 warnings.filterwarnings('ignore')
 
+from CrewBootstrap import load_env, scrape_tool as lazy_scrape_tool, search_tool as lazy_search_tool
+load_env(model='gpt-4o-mini')
+
 from crewai import Agent, Task, Crew
-from pydantic import BaseModel, Field
-from crewai.tools import BaseTool
-from typing import List, Dict
 
-from crewai_tools import DirectoryReadTool, \
-                         FileReadTool
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from TaskScheduler import run_dag
+from CrewTracing import tracing
+from ProductStore import ProductStore
+from MaskingStage import MaskingStage, parse_policy, run_stages, seed_for
+from StreamingProducts import StreamingProductCollector
 
 
 #target_asin="B00NGVF4II"
 target_asin="B0B1GZMSCV"
 
-directory_read_tool = DirectoryReadTool(directory=f"./product_data/{target_asin}")
-file_read_tool = FileReadTool()
-file_read_tool_masked = FileReadTool(file_path=f"product_data/{target_asin}/masked.json")
-
-class SentimentAnalysisTool(BaseTool):
-    name: str = "Sentiment Analysis Tool"
-    description: str = ("Analyzes the sentiment of text "
-                        "to ensure positive and engaging communication.")
-
-    def _run(self, text: str) -> str:
-        # Your custom code tool goes here
-        return "positive"
-
-
+# Batch runs write one directory per ASIN under here, and mark it complete
+# once all of the crew's output files have been produced.
+PRODUCT_DATA_DIR = "product_data"
+OUTPUT_FILES = ["cohort_characteristics.json", "masked.json", "price_reasoning.md"]
+COMPLETE_MARKER = ".complete"
+# Every collected ProductDataList is also appended to this columnar store
+PRODUCT_STORE_DIR = "product_store"
 
-class ProductAttributes(BaseModel):
-    """Output from first task"""
-    products: List[str]
-    attributes: List[str]
-
-class ProductData(BaseModel):
-    """Individual product with its data"""
-    product_id: str
-    price: float
-    attributes: Dict[str, str]  # attribute_name: attribute_value
-
-class ProductDataList(BaseModel):
-    """Output from second task"""
-    products: List[ProductData]
+from ProductModels import ProductAttributes, ProductDataList
 import os
 
-import os
-from dotenv import load_dotenv
-load_dotenv()
-
-openai_api_key = os.getenv('OPENAI_API_KEY')
-os.environ["OPENAI_MODEL_NAME"] = 'gpt-4o-mini'
-os.environ["SERPER_API_KEY"] =os.getenv('SERPER_API_KEY')
-
-
-from crewai_tools import ScrapeWebsiteTool, SerperDevTool
-
-search_tool = SerperDevTool()
-scrape_tool = ScrapeWebsiteTool()
-
-shopper_agent = Agent(
-    role="Shopper",
-    goal="Based on a target ASIN id  and a set of cohort ASINs, "
-        "retrieve information and find a set of common product attributes. ",
-    backstory="You are meticulous, careful professional analyst shopper. ",
-    verbose=True,
-    allow_delegation=False,
-    output_pydantic=ProductAttributes,
-    tools = [scrape_tool, search_tool]
-)
-
-data_collector = Agent(
-    role='Data Collector',
-    goal='Collect detailed product information including prices and attribute values',
-    backstory='Meticulous researcher who gathers comprehensive product data',
-    verbose=True
-)
-
-
-data_masker = Agent(
-    role='Data Masker',
-    goal='Perform masking operations on product data.',
-    backstory='Fidelity in passthrough data with randomized masking as described in task.',
-    verbose=True
-)
-
-price_estimator = Agent(
-    role='Price Estimator',
-    goal='Determines if a specific price is competitive and compares versus other products.',
-    backstory='Rational and Evidence based estimation.',
-    verbose=True
-)
-
-
-
-# Task for Strategist Analyst Agent: Analyze Market Data
-task1 = Task(
-    description=(
-        "Retrieve the detailed product specifications for query asin {target_asin} "
-        " then search for a list of comparable products, and  using their ASIN strings save these and the target ASIN as a list of ASIN ids (products). "
-        " Finally using  the key product specifications for the target and cohort asins  find the set of 5 to 10 attributes whose values are likely to determine product price for this cohort and target asin. "
-        " Please include brand, and material, if available."
-    ),
-    expected_output="Find the list of 8 to 10 ASINs of comparable products (products) including the target ASIN and identify 5 to 10 product features that is common across the cohort (attributes). Do not add any comments.",
-    agent=shopper_agent,
-    output_json=ProductAttributes,
-    tools = [scrape_tool, search_tool],
-    output_file=f"product_data/{target_asin}/cohort_characteristics.json"
-)
-
-task2 = Task(
-    description="""
-    For each product identified in the previous task, create a detailed record with:
-    - product_id: A unique identifier for the product
-    - price: The current market price (in USD)
-    - attributes: A dictionary mapping each attribute name to its value for this product
-
-    Use the products list and attributes list from the previous task.
-    Ensure every product has values for all attributes identified.
-    """,
-    agent=data_collector,
-    expected_output='Complete product data with prices and attribute values for all products',
-    output_pydantic=ProductDataList,
-    context=[task1]  # This gives task2 access to task1's output
-)
-
-task3 = Task(
-description="""
-     Receive the ProductDataList json object from the previous task and pick a product at random then mask the price of that 
-    product (i.e., replace the price with an -1.0 value (to keep it consistent with the type)). 
-         """,
-    agent=data_masker,
-    expected_output='Masked product data with prices and attribute values for all products. Do not add any comments.',
-    output_pydantic=ProductDataList,
-    output_file=f"product_data/{target_asin}/masked.json",
-    context=[task2]  # This gives task2 access to task1's output
-
-
-
-)
-
-task4 = Task(
-description="""
-     Receives the set of products and from it reasons if the price of the query product {target_asin} is competitive.
-     To determine this, it uses the other products, their prices, and their features to explain if the price is competitive or
-     too high or too low and why.
-        """,
-    agent=price_estimator,
-    context=[task2],
-    output_file=f"product_data/{target_asin}/price_reasoning.md",
-    expected_output="For the product {target_asin} provide first a determination if the price is high, fair, or low. Then explain why using other products prices and features. Use markdown."
+# Built on first use; scraped pages are cached per TTL (see ScrapeCache.py)
+search_tool = lazy_search_tool()
+scrape_tool = lazy_scrape_tool()
 
-)
+from LLMCache import get_llm
+llm = get_llm()
 
 from crewai import Crew, Process
-from langchain_openai import ChatOpenAI
-
-# Define the crew with agents and tasks
-shopper_crew = Crew(
-
-    agents=[shopper_agent, data_collector, data_masker, price_estimator],
-
-    tasks=[task1, task2, task3, task4],
-
-    manager_llm=ChatOpenAI(model="gpt-4o-mini",
-                           temperature=0.7),
-
-    process=Process.sequential,
-    verbose=True
-)
-
-# Example data for kicking off the process
-shopping_inputs = {
-    'target_asin': target_asin
-}
-
-### this execution will take some time to run
-result = shopper_crew.kickoff(inputs=shopping_inputs)
-
 
+def asin_dir(asin, data_dir=PRODUCT_DATA_DIR):
+    return os.path.join(data_dir, asin)
+
+
+def build_shopper_crew(target_asin, data_dir=PRODUCT_DATA_DIR, stream_records=False, on_record=None):
+    """Builds the shopper crew with its output files under product_data/<asin>/
+
+    With stream_records=True, task2's completion is streamed and each product is
+    validated as it arrives (on_record is called for every valid one); only
+    malformed records are re-requested instead of failing the whole task.
+    """
+    output_dir = asin_dir(target_asin, data_dir)
+    collector_llm = get_llm(stream=True) if stream_records else llm
+    collector = StreamingProductCollector(collector_llm, on_record=on_record) if stream_records else None
+
+    shopper_agent = Agent(
+        role="Shopper",
+        llm=llm,
+        goal="Based on a target ASIN id  and a set of cohort ASINs, "
+            "retrieve information and find a set of common product attributes. ",
+        backstory="You are meticulous, careful professional analyst shopper. ",
+        verbose=True,
+        allow_delegation=False,
+        output_pydantic=ProductAttributes,
+        tools = [scrape_tool, search_tool]
+    )
+
+    data_collector = Agent(
+        role='Data Collector',
+        llm=collector_llm,
+        goal='Collect detailed product information including prices and attribute values',
+        backstory='Meticulous researcher who gathers comprehensive product data',
+        verbose=True
+    )
+
+
+    price_estimator = Agent(
+        role='Price Estimator',
+        llm=llm,
+        goal='Determines if a specific price is competitive and compares versus other products.',
+        backstory='Rational and Evidence based estimation.',
+        verbose=True
+    )
+
+
+
+    # Task for Strategist Analyst Agent: Analyze Market Data
+    task1 = Task(
+        description=(
+            "Retrieve the detailed product specifications for query asin {target_asin} "
+            " then search for a list of comparable products, and  using their ASIN strings save these and the target ASIN as a list of ASIN ids (products). "
+            " Finally using  the key product specifications for the target and cohort asins  find the set of 5 to 10 attributes whose values are likely to determine product price for this cohort and target asin. "
+            " Please include brand, and material, if available."
+        ),
+        expected_output="Find the list of 8 to 10 ASINs of comparable products (products) including the target ASIN and identify 5 to 10 product features that is common across the cohort (attributes). Do not add any comments.",
+        agent=shopper_agent,
+        output_json=ProductAttributes,
+        tools = [scrape_tool, search_tool],
+        output_file=os.path.join(output_dir, "cohort_characteristics.json")
+    )
+
+    task2 = Task(
+        description="""
+        For each product identified in the previous task, create a detailed record with:
+        - product_id: A unique identifier for the product
+        - price: The current market price (in USD)
+        - attributes: A dictionary mapping each attribute name to its value for this product
+
+        Use the products list and attributes list from the previous task.
+        Ensure every product has values for all attributes identified.
+        """,
+        agent=data_collector,
+        expected_output='Complete product data with prices and attribute values for all products',
+        output_pydantic=None if collector else ProductDataList,
+        callback=collector,  # validates the streamed records and sets output.pydantic
+        context=[task1]  # This gives task2 access to task1's output
+    )
 
-print("Task 1 Output:")
-print(f"Products: {task1.output.pydantic.products}")
-print(f"Attributes: {task1.output.pydantic.attributes}")
+    # task3 (price masking) runs in-process without an LLM, see build_masking_stage()
 
-print("\nTask 2 Output:")
-for product in task2.output.pydantic.products:
-    print(f"\nProduct: {product.product_id}")
-    print(f"Price: ${product.price}")
-    print(f"Attributes: {product.attributes}")
+    task4 = Task(
+    description="""
+         Receives the set of products and from it reasons if the price of the query product {target_asin} is competitive.
+         To determine this, it uses the other products, their prices, and their features to explain if the price is competitive or
+         too high or too low and why.
+            """,
+        agent=price_estimator,
+        context=[task2],
+        output_file=os.path.join(output_dir, "price_reasoning.md"),
+        expected_output="For the product {target_asin} provide first a determination if the price is high, fair, or low. Then explain why using other products prices and features. Use markdown."
+
+    )
+
+    # Define the crew with agents and tasks
+    shopper_crew = Crew(
+
+        agents=[shopper_agent, data_collector, price_estimator],
+
+        tasks=[task1, task2, task4],
+
+        manager_llm=get_llm(temperature=0.7),
+
+        process=Process.sequential,
+        verbose=True
+    )
+    return shopper_crew
+
+
+def build_masking_stage(shopper_crew, target_asin, data_dir=PRODUCT_DATA_DIR, policy="single", seed=None):
+    """Masks prices of task2's products in-process and writes masked.json.
+
+    The seed defaults to one derived from the ASIN, so reruns are reproducible.
+    """
+    return MaskingStage(
+        shopper_crew.tasks[1],
+        policy=parse_policy(policy),
+        seed=seed_for(target_asin) if seed is None else seed,
+        output_file=os.path.join(asin_dir(target_asin, data_dir), "masked.json"),
+    )
+
+
+def is_complete(asin, data_dir=PRODUCT_DATA_DIR):
+    """An ASIN is complete once its marker exists and every output file is non-empty"""
+    output_dir = asin_dir(asin, data_dir)
+    if not os.path.exists(os.path.join(output_dir, COMPLETE_MARKER)):
+        return False
+    for name in OUTPUT_FILES:
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return False
+    return True
+
+
+def run_asin(asin, data_dir=PRODUCT_DATA_DIR, dag=False, store=None, mask_policy="single", mask_seed=None,
+             stream_records=False):
+    """Runs the shopper pipeline for a single ASIN and marks its directory complete.
+
+    With dag=True, masking and price reasoning (which both only depend on task2)
+    run concurrently. The collected products are appended to store (a
+    ProductStore) when given.
+    """
+    os.makedirs(asin_dir(asin, data_dir), exist_ok=True)
+    on_record = lambda product: print(f"[{asin}] {product.product_id}: ${product.price}")
+    shopper_crew = build_shopper_crew(asin, data_dir, stream_records, on_record)
+    masking = build_masking_stage(shopper_crew, asin, data_dir, mask_policy, mask_seed)
+    collector = shopper_crew.tasks[1].callback
+    try:
+        if dag:
+            result = run_dag(shopper_crew, inputs={'target_asin': asin}, stages=[masking])
+        else:
+            result = shopper_crew.kickoff(inputs={'target_asin': asin})
+            run_stages([masking])
+    finally:
+        # A failed task never reaches its callback, which would detach the stream parser
+        if isinstance(collector, StreamingProductCollector):
+            collector.close()
+    products = shopper_crew.tasks[1].output.pydantic
+    if products is None or not products.products:
+        # Leave the ASIN incomplete (and out of the store) so the next batch collects it again
+        print(f"[{asin}] no products collected; not marking it complete")
+        return shopper_crew, result
+    if store is not None:
+        store.append(asin, products)
+    with open(os.path.join(asin_dir(asin, data_dir), COMPLETE_MARKER), 'w', encoding='utf-8') as f:
+        f.write(asin)
+    return shopper_crew, result
+
+
+def load_asins(path):
+    """Reads one ASIN per line, ignoring blank lines and # comments"""
+    asins = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                asins.append(line)
+    return asins
+
+
+def run_batch(asins, max_workers=4, data_dir=PRODUCT_DATA_DIR, dag=False, store=None, **run_options):
+    """Runs the shopper pipeline for many ASINs on a bounded worker pool.
+
+    ASINs whose product_data/<asin>/ directory is already complete are skipped.
+    Returns a dict of asin -> "done", "skipped" or "failed: <error>". Extra
+    keyword arguments (mask_policy, mask_seed, stream_records) are passed on to run_asin.
+    """
+    status = {}
+    pending = []
+    for asin in dict.fromkeys(asins):
+        if is_complete(asin, data_dir):
+            status[asin] = "skipped"
+        else:
+            pending.append(asin)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_asin, asin, data_dir=data_dir, dag=dag, store=store, **run_options): asin for asin in pending}
+        for future in as_completed(futures):
+            asin = futures[future]
+            try:
+                future.result()
+                status[asin] = "done"
+            except Exception as e:
+                status[asin] = f"failed: {e}"
+            print(f"[{asin}] {status[asin]}")
+
+    return {asin: status[asin] for asin in dict.fromkeys(asins)}
+
+
+def print_outputs(shopper_crew):
+    task1, task2 = shopper_crew.tasks[0], shopper_crew.tasks[1]
+
+    print("Task 1 Output:")
+    print(f"Products: {task1.output.pydantic.products}")
+    print(f"Attributes: {task1.output.pydantic.attributes}")
+
+    print("\nTask 2 Output:")
+    for product in task2.output.pydantic.products:
+        print(f"\nProduct: {product.product_id}")
+        print(f"Price: ${product.price}")
+        print(f"Attributes: {product.attributes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Price competitiveness crew for one or many ASINs")
+    parser.add_argument("--asin", action="append", default=[], help="target ASIN (repeatable)")
+    parser.add_argument("--asin-file", help="file with one ASIN per line")
+    parser.add_argument("--workers", type=int, default=4, help="maximum number of concurrent crews")
+    parser.add_argument("--data-dir", default=PRODUCT_DATA_DIR)
+    parser.add_argument("--store", default=PRODUCT_STORE_DIR, help="columnar product store directory")
+    parser.add_argument("--mask-policy", default="single",
+                        help="single, k-of-n:<k> or attr:<name>=<value>")
+    parser.add_argument("--mask-seed", type=int, default=None,
+                        help="masking RNG seed (default: derived from the ASIN)")
+    parser.add_argument("--stream-records", action="store_true",
+                        help="validate task2 products as they stream in and only re-request bad ones")
+    parser.add_argument("--dag", action="store_true",
+                        help="run independent tasks of each crew concurrently")
+    parser.add_argument("--trace", help="write crew/task/LLM/tool spans to this file (.jsonl, or .otlp.json)")
+    args = parser.parse_args()
+
+    asins = list(args.asin)
+    store = ProductStore(args.store)
+    if args.asin_file:
+        asins += load_asins(args.asin_file)
+
+    with tracing(args.trace):
+        if len(asins) > 1 or args.asin_file:
+            summary = run_batch(asins, max_workers=args.workers, data_dir=args.data_dir, dag=args.dag, store=store,
+                                mask_policy=args.mask_policy, mask_seed=args.mask_seed,
+                                stream_records=args.stream_records)
+            done = sum(1 for s in summary.values() if s == "done")
+            skipped = sum(1 for s in summary.values() if s == "skipped")
+            print(f"\n{done} done, {skipped} skipped, {len(summary) - done - skipped} failed")
+        else:
+            ### this execution will take some time to run
+            shopper_crew, result = run_asin(asins[0] if asins else target_asin, args.data_dir, dag=args.dag, store=store,
+                                            mask_policy=args.mask_policy, mask_seed=args.mask_seed,
+                                            stream_records=args.stream_records)
+            print_outputs(shopper_crew)
+            if args.dag:
+                print(result.report())
 
 '''
 
@@ -203,4 +315,4 @@ with open(filename, 'w', encoding='utf-8') as f:
 
 print(f"Successfully saved markdown content to {filename}")
 
-'''
\ No newline at end of file
+'''
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from crewai import LLM
+
+from RateLimiter import shared_limiter
+
+# Shared on-disk cache for completions. Every crew points its agents at
+# get_llm() so reruns with unchanged agents, tasks and inputs are served from here.
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+DEFAULT_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+DEFAULT_MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+# Whether the last CachedLLM call on this thread was served from the cache
+_last_call = threading.local()
+# Tokens the provider reported for the call in progress on this thread
+_call_usage = threading.local()
+
+
+def last_call_cached(reset=False):
+    """True/False for the last cached-LLM call on this thread, None if there was none"""
+    cached = getattr(_last_call, "cached", None)
+    if reset:
+        _last_call.cached = None
+    return cached
+
+
+def cache_key(model, temperature, messages):
+    """Content address of a completion: model, temperature and the rendered messages"""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = json.dumps(
+        {"model": model, "temperature": temperature, "messages": messages},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite backed response cache with size- and age-based eviction"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response, model=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until under max_bytes"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                doomed = []
+                for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                    doomed.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+class CachedLLM(LLM):
+    """crewai LLM that serves repeated completions from an LLMResponseCache.
+
+    Calls that pass tools for native function calling are not cached, since
+    their result depends on executing those functions. Calls that reach the
+    provider go through the shared rate limits for "llm:<model>", also with
+    use_cache=False.
+    """
+
+    def __init__(self, *args, cache=None, use_cache=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.use_cache = use_cache
+        self.cache = (cache if cache is not None else shared_cache()) if use_cache else None
+
+    def call(self, messages, tools=None, *args, **kwargs):
+        if tools or not self.use_cache:
+            _last_call.cached = False
+            return self._upstream(messages, tools, *args, **kwargs)
+        key = cache_key(self.model, self.temperature, messages)
+        cached = self.cache.get(key)
+        _last_call.cached = cached is not None
+        if cached is not None:
+            if getattr(self, "stream", False):
+                import LLMStreaming
+                LLMStreaming.emit_cached(self, cached)
+            return cached
+        response = self._upstream(messages, tools, *args, **kwargs)
+        if isinstance(response, str) and response:
+            self.cache.put(key, response, model=self.model)
+        return response
+
+    def _upstream(self, messages, tools=None, *args, **kwargs):
+        # Estimate tokens up front (prompt plus completion budget), then settle
+        # with the usage the call actually reported
+        prompt = sum(len(str(m.get("content", "")) if isinstance(m, dict) else str(m)) for m in messages) \
+            if not isinstance(messages, str) else len(messages)
+        estimate = prompt // 4 + (getattr(self, "max_tokens", None) or 1000)
+
+        def call():
+            _call_usage.tokens = 0
+            return super(CachedLLM, self).call(messages, tools, *args, **kwargs)
+
+        def usage(response):
+            # This call's own usage (the LLM's totals also count other threads' calls)
+            total = getattr(_call_usage, "tokens", 0)
+            return total if total > 0 else prompt // 4 + len(str(response or "")) // 4
+
+        return shared_limiter().call(f"llm:{self.model}", call, tokens=estimate, usage=usage)
+
+    def _track_token_usage_internal(self, usage_data):
+        # crewai reports each response's usage here, on the thread that made the call
+        super()._track_token_usage_internal(usage_data)
+        if isinstance(usage_data, dict):
+            total = usage_data.get("total_tokens")
+        else:
+            total = getattr(usage_data, "total_tokens", None)
+        _call_usage.tokens = getattr(_call_usage, "tokens", 0) + (total or 0)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """Process-wide cache instance used by every crew"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMResponseCache()
+        return _shared_cache
+
+
+def get_llm(model=None, temperature=None, **kwargs):
+    """Cached LLM for agents; the model defaults to $OPENAI_MODEL_NAME.
+
+    Set LLM_CACHE_DISABLE=1 to bypass the cache entirely; calls still go
+    through the shared rate limits.
+    """
+    model = model or os.getenv("OPENAI_MODEL_NAME") or "gpt-4o-mini"
+    return CachedLLM(model=model, temperature=temperature, use_cache=not os.getenv("LLM_CACHE_DISABLE"), **kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the shared LLM response cache")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = shared_cache()
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+try:
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+except ImportError:
+    from crewai.utilities.events import crewai_event_bus
+    from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+
+# Routes token chunks from LLMs created with stream=True to callbacks registered
+# for that specific LLM instance. crewai emits every chunk on one global event
+# bus with the LLM as the source, so giving each consumer its own LLM object is
+# enough to keep concurrent crews apart.
+
+# id(llm) -> (weakref to llm, callbacks); the weakref tells a live LLM from a
+# new one that reuses the id of a collected one whose sinks were never removed
+_sinks = {}
+_lock = threading.Lock()
+_installed = False
+
+
+def _install():
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        _installed = True
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _on_chunk(source, event):
+        _dispatch(source, event.chunk)
+
+
+def _entry(llm):
+    # Caller holds _lock
+    entry = _sinks.get(id(llm))
+    return entry if entry is not None and entry[0]() is llm else None
+
+
+def _dispatch(llm, chunk):
+    with _lock:
+        entry = _entry(llm)
+        sinks = list(entry[1]) if entry else []
+    for sink in sinks:
+        sink(chunk)
+
+
+def add_sink(llm, callback):
+    """Calls callback(chunk) for every streamed chunk produced by llm"""
+    _install()
+    with _lock:
+        for key in [key for key, (ref, _) in _sinks.items() if ref() is None]:
+            del _sinks[key]
+        entry = _entry(llm)
+        if entry is None:
+            entry = _sinks[id(llm)] = (weakref.ref(llm), [])
+        entry[1].append(callback)
+
+
+def remove_sink(llm, callback):
+    with _lock:
+        entry = _entry(llm)
+        if entry is None:
+            return
+        if callback in entry[1]:
+            entry[1].remove(callback)
+        if not entry[1]:
+            del _sinks[id(llm)]
+
+
+@contextmanager
+def streaming_to(llm, callback):
+    add_sink(llm, callback)
+    try:
+        yield
+    finally:
+        remove_sink(llm, callback)
+
+
+def emit_cached(llm, text):
+    """Delivers a whole cached completion to llm's sinks as a single chunk"""
+    _dispatch(llm, text)
+
+
+class AnswerSink:
+    """Forwards the "Final Answer" part of an agent's streamed completions.
+
+    Agents answer in the ReAct format, so everything before the last
+    "Final Answer:" marker is reasoning. The answer is echoed to console and
+    written incrementally to path; finish() replaces the file with the task's
+    final output in one atomic write.
+    """
+
+    MARKER = "Final Answer:"
+
+    def __init__(self, path=None, console=None, header=None):
+        self.path = path
+        self.console = console
+        self.header = header
+        self.first_answer_at = None
+        self._buffer = ""
+        self._start = None
+        self._written = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __call__(self, chunk):
+        with self._lock:
+            self._buffer += chunk
+            marker = self._buffer.rfind(self.MARKER)
+            if marker < 0:
+                return
+            start = marker + len(self.MARKER)
+            if start != self._start:
+                # A new (retried) answer started: begin again
+                self._start = start
+                self._written = 0
+                if self._file:
+                    self._file.seek(0)
+                    self._file.truncate()
+                if self.console and self.header:
+                    self.console.write(f"\n\n{self.header}\n")
+            text = self._buffer[start:]
+            if self._written == 0:
+                text = text.lstrip()
+                if not text:
+                    return
+                self._buffer = self._buffer[:start] + text
+            delta = self._buffer[start + self._written:]
+            self._written += len(delta)
+            if self.first_answer_at is None:
+                self.first_answer_at = time.perf_counter()
+            if self.console:
+                self.console.write(delta)
+                self.console.flush()
+            if self.path:
+                if self._file is None:
+                    if os.path.dirname(self.path):
+                        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    self._file = open(self.path, "w", encoding="utf-8")
+                self._file.write(delta)
+                self._file.flush()
+
+    def finish(self, text=None):
+        """Closes the stream; text (the task's parsed output) becomes the file content"""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            if self.path and text is not None:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp, self.path)
+            if self.console:
+                self.console.write("\n")
+                self.console.flush()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import random
+from abc import ABC, abstractmethod
+
+from crewai.tasks.output_format import OutputFormat
+from crewai.tasks.task_output import TaskOutput
+
+from ProductModels import ProductDataList
+
+# Pipeline stages that run in-process instead of as an LLM task. A stage looks
+# enough like a crewai Task (context, agent, tools, output, execute_sync) to be
+# scheduled by TaskScheduler.run_dag next to the crew's own tasks, or it can be
+# run with run_stages() after a sequential kickoff.
+
+
+class LocalStage(ABC):
+    """Base class for non-LLM pipeline stages"""
+    agent = None
+    tools = ()
+    callback = None
+
+    def __init__(self, name, context, output_file=None):
+        self.name = name
+        self.description = name
+        self.context = list(context)
+        self.output_file = output_file
+        self.output = None
+
+    @abstractmethod
+    def run(self, context_outputs):
+        """Returns (raw, pydantic) for the outputs of the context tasks"""
+
+    def execute_sync(self, agent=None, context=None, tools=None):
+        raw, pydantic = self.run([task.output for task in self.context])
+        if self.output_file:
+            if os.path.dirname(self.output_file):
+                os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
+            with open(self.output_file, "w", encoding="utf-8") as f:
+                f.write(raw)
+        self.output = TaskOutput(
+            description=self.name,
+            name=self.name,
+            raw=raw,
+            pydantic=pydantic,
+            agent="local",
+            output_format=OutputFormat.PYDANTIC if pydantic is not None else OutputFormat.RAW,
+        )
+        return self.output
+
+
+def run_stages(stages):
+    """Runs stages in order, once the tasks they depend on have finished"""
+    return [stage.execute_sync() for stage in stages]
+
+
+class SingleMask:
+    """Masks one product picked at random"""
+
+    def select(self, products, rng):
+        return [rng.randrange(len(products))] if products else []
+
+
+class KOfNMask:
+    """Masks k products picked at random"""
+
+    def __init__(self, k):
+        self.k = k
+
+    def select(self, products, rng):
+        return sorted(rng.sample(range(len(products)), min(self.k, len(products))))
+
+
+class AttributeMask:
+    """Masks every product whose attribute matches a value (case-insensitive)"""
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def select(self, products, rng):
+        wanted = self.value.strip().lower()
+        return [i for i, product in enumerate(products)
+                if str(product.attributes.get(self.name, "")).strip().lower() == wanted]
+
+
+def parse_policy(text):
+    """'single', 'k-of-n:<k>' or 'attr:<name>=<value>'"""
+    if text == "single":
+        return SingleMask()
+    if text.startswith("k-of-n:"):
+        return KOfNMask(int(text.split(":", 1)[1]))
+    if text.startswith("attr:") and "=" in text:
+        name, value = text.split(":", 1)[1].split("=", 1)
+        return AttributeMask(name, value)
+    raise ValueError(f"Unknown masking policy: {text!r}")
+
+
+def seed_for(key):
+    """Stable seed derived from e.g. the target ASIN, so reruns mask the same products"""
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+
+
+class MaskingStage(LocalStage):
+    """Replaces the price of the selected products with mask_value"""
+
+    def __init__(self, source_task, policy=None, seed=0, output_file=None, mask_value=-1.0):
+        super().__init__("Mask product prices", [source_task], output_file)
+        self.policy = policy or SingleMask()
+        self.seed = seed
+        self.mask_value = mask_value
+
+    def run(self, context_outputs):
+        source = context_outputs[0]
+        if source.pydantic is not None:
+            products = ProductDataList.model_validate(source.pydantic.model_dump())
+        else:
+            products = ProductDataList.model_validate_json(source.raw)
+        rng = random.Random(self.seed)
+        for i in self.policy.select(products.products, rng):
+            products.products[i].price = self.mask_value
+        return products.model_dump_json(indent=2), products
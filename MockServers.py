@@ -0,0 +1,324 @@
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the OpenAI chat/embeddings API plus the Serper search and
+# scraped web pages, so crews can be run and measured without network access.
+# Latency is modelled as a fixed per-request delay plus completion tokens at a
+# fixed rate. Everything the crews send is counted in MockServer.stats.
+# With rpm_limit / tpm_limit set, chat and search requests over the limit get
+# a 429 with Retry-After, like a provider's rate limiter.
+
+_TOOL_NAME_RE = re.compile(r"^Tool Name: (.+)$", re.MULTILINE)
+_TOOL_ARGS_RE = re.compile(r"^Tool Arguments: (.+)$", re.MULTILINE)
+_ARG_NAME_RE = re.compile(r"['\"](\w+)['\"]\s*:\s*\{")
+
+_FILLER = ("the quick analysis shows steady growth across key markets while costs remain "
+           "contained and demand for new products continues to improve").split()
+
+
+def count_tokens(text):
+    """Rough token estimate, about four characters per token"""
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+
+def fake_from_schema(schema, defs=None, depth=0):
+    """Deterministic example value for a JSON schema (enough for pydantic outputs)"""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return fake_from_schema(defs[schema["$ref"].split("/")[-1]], defs, depth)
+    if "anyOf" in schema:
+        return fake_from_schema(schema["anyOf"][0], defs, depth)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        if "properties" in schema:
+            return {name: fake_from_schema(prop, defs, depth + 1) for name, prop in schema["properties"].items()}
+        extra = schema.get("additionalProperties")
+        if isinstance(extra, dict):
+            return {f"attribute_{i}": fake_from_schema(extra, defs, depth + 1) for i in range(3)}
+        return {}
+    if kind == "array":
+        count = 8 if depth <= 1 else 3
+        return [fake_from_schema(schema.get("items", {}), defs, depth + 1) for _ in range(count)]
+    if kind == "number":
+        return 19.99
+    if kind == "integer":
+        return 3
+    if kind == "boolean":
+        return True
+    return "value"
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.2, tokens_per_second=200.0, completion_tokens=300,
+                 tool_calls_per_task=1, embedding_dim=1536, rpm_limit=None, tpm_limit=None):
+        from RateLimiter import TokenBucket
+
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.tool_calls_per_task = tool_calls_per_task
+        self.embedding_dim = embedding_dim
+        self.rpm_limit = TokenBucket(rpm_limit) if rpm_limit else None
+        self.tpm_limit = TokenBucket(tpm_limit, burst=tpm_limit / 60.0 * 5) if tpm_limit else None
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self):
+        with self.lock:
+            self.stats = {
+                "chat_requests": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "embedding_requests": 0,
+                "embedding_inputs": 0,
+                "search_requests": 0,
+                "page_requests": 0,
+                "page_not_modified": 0,
+                "throttled": 0,
+            }
+
+    def count(self, **deltas):
+        with self.lock:
+            for name, value in deltas.items():
+                self.stats[name] = self.stats.get(name, 0) + value
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def admit(self, tokens=0):
+        """Seconds to wait before retrying if the request is over the limits, else None"""
+        if self.rpm_limit is not None and not self.rpm_limit.try_acquire(1):
+            return 60.0 / self.rpm_limit.per_minute
+        if self.tpm_limit is not None and tokens and not self.tpm_limit.try_acquire(tokens):
+            if self.rpm_limit is not None:
+                self.rpm_limit.credit(1)
+            return tokens * 60.0 / self.tpm_limit.per_minute
+        return None
+
+    def completion_delay(self, tokens):
+        return self.latency + tokens / self.tokens_per_second
+
+    # -- response content ------------------------------------------------
+
+    def chat_text(self, messages):
+        """ReAct style answer: a tool action until the quota is used, then a final answer"""
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        tools = _TOOL_NAME_RE.findall(prompt)
+        observations = prompt.count("Observation:")
+        if tools and observations < self.tool_calls_per_task:
+            name = tools[observations % len(tools)].strip()
+            args_lines = _TOOL_ARGS_RE.findall(prompt)
+            arg_names = _ARG_NAME_RE.findall(args_lines[observations % len(tools)]) if args_lines else []
+            action_input = {
+                arg: f"{self.url}/page/{observations}" if "url" in arg else "benchmark query"
+                for arg in arg_names
+            }
+            return (f"Thought: I should gather more information.\nAction: {name}\n"
+                    f"Action Input: {json.dumps(action_input)}")
+        return "Thought: I now can give a great answer\nFinal Answer: " + self.answer_body(prompt)
+
+    def answer_body(self, prompt):
+        if "product_id" in prompt:
+            products = [{"product_id": f"B0MOCK{i:04d}", "price": 10.0 + i,
+                         "attributes": {"brand": f"Brand {i % 3}", "material": "steel"}} for i in range(8)]
+            return json.dumps({"products": products})
+        if '"attributes"' in prompt or "attributes" in prompt and "products" in prompt:
+            return json.dumps({"products": [f"B0MOCK{i:04d}" for i in range(8)],
+                               "attributes": ["brand", "material", "size", "weight", "color"]})
+        words = [_FILLER[i % len(_FILLER)] for i in range(int(self.completion_tokens * 0.75))]
+        paragraphs = [" ".join(words[i:i + 60]).capitalize() + "." for i in range(0, len(words), 60)]
+        return "## Mock section\n\n" + "\n\n".join(paragraphs)
+
+    def embedding(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        values = [((digest[i % len(digest)] + i * 31) % 255) / 127.0 - 1.0 for i in range(self.embedding_dim)]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttled(self, retry_after):
+        self.server.count(throttled=1)
+        body = json.dumps({"error": {"message": "Rate limit reached, please try again later.",
+                                     "type": "requests", "code": "rate_limit_exceeded"}}).encode("utf-8")
+        self.send_response(429)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", f"{retry_after:.2f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/stats":
+            return self._json(server.stats)
+        if self.path.startswith("/page"):
+            if self.headers.get("If-None-Match") == '"mock"':
+                server.count(page_not_modified=1)
+                self.send_response(304)
+                self.send_header("ETag", '"mock"')
+                self.end_headers()
+                return
+            server.count(page_requests=1)
+            paragraphs = "".join(f"<p>{server.answer_body('')}</p>" for _ in range(3))
+            body = f"<html><head><title>Mock page</title></head><body>{paragraphs}</body></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", '"mock"')
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        if path == "/reset":
+            server.reset()
+            return self._json({"ok": True})
+        request = self._body()
+        if path.endswith("/chat/completions"):
+            return self._chat(request)
+        if path.endswith("/embeddings"):
+            inputs = request.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            server.count(embedding_requests=1, embedding_inputs=len(inputs))
+            time.sleep(server.latency / 4)
+            return self._json({
+                "object": "list",
+                "model": request.get("model", "mock-embedding"),
+                "data": [{"object": "embedding", "index": i, "embedding": server.embedding(str(t))}
+                         for i, t in enumerate(inputs)],
+                "usage": {"prompt_tokens": sum(count_tokens(str(t)) for t in inputs),
+                          "total_tokens": sum(count_tokens(str(t)) for t in inputs)},
+            })
+        if path.rstrip("/").endswith("/search"):
+            retry_after = server.admit()
+            if retry_after is not None:
+                return self._throttled(retry_after)
+            server.count(search_requests=1)
+            query = request.get("q", "")
+            return self._json({
+                "searchParameters": {"q": query},
+                "organic": [{"title": f"Result {i} for {query}", "link": f"{server.url}/page/{i}",
+                             "snippet": server.answer_body("")[:200], "position": i + 1} for i in range(5)],
+            })
+        self._json({"error": "not found"}, 404)
+
+    def _chat(self, request):
+        server = self.server
+        messages = request.get("messages", [])
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        retry_after = server.admit(prompt_tokens + server.completion_tokens)
+        if retry_after is not None:
+            return self._throttled(retry_after)
+        tool_calls = None
+        if request.get("tools"):
+            # Structured output through function calling (e.g. instructor)
+            function = request["tools"][0]["function"]
+            arguments = json.dumps(fake_from_schema(function.get("parameters", {})))
+            tool_calls = [{"id": "call_mock", "type": "function",
+                           "function": {"name": function["name"], "arguments": arguments}}]
+            text = None
+            completion_tokens = count_tokens(arguments)
+        else:
+            text = server.chat_text(messages)
+            completion_tokens = count_tokens(text)
+        server.count(chat_requests=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        model = request.get("model", "mock")
+
+        if request.get("stream") and text is not None:
+            return self._stream(model, text, usage)
+
+        time.sleep(server.completion_delay(completion_tokens))
+        message = {"role": "assistant", "content": text}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self._json({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if tool_calls else "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, model, text, usage):
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        time.sleep(server.latency)
+        pieces = re.findall(r"\S+\s*|\s+", text)
+        per_piece = usage["completion_tokens"] / max(len(pieces), 1) / server.tokens_per_second
+        for piece in pieces:
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(per_piece)
+        final = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock OpenAI/Serper/web server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--tool-calls", type=int, default=1)
+    parser.add_argument("--rpm-limit", type=float, default=None, help="answer 429 above this many requests per minute")
+    parser.add_argument("--tpm-limit", type=float, default=None, help="answer 429 above this many tokens per minute")
+    args = parser.parse_args()
+
+    server = MockServer(args.port, args.latency, args.tokens_per_second, args.completion_tokens, args.tool_calls,
+                        rpm_limit=args.rpm_limit, tpm_limit=args.tpm_limit)
+    print(f"Mock server on {server.url} (OPENAI_API_BASE={server.url}/v1)")
+    server.serve_forever()
@@ -0,0 +1,190 @@
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from TaskCache import TaskOutputCache, cached_output, task_key
+
+# Batch outreach with the L4 crew: one profiling -> outreach run per lead in a
+# CSV or JSONL file, a fixed number of crews in flight. Company profiles are
+# cached on disk by (lead_name, industry) for PROFILE_CACHE_TTL_HOURS, so
+# outreach to the next decision-maker at the same company starts from the
+# cached profile and only runs the outreach task.
+#
+#   python OutreachBatch.py leads.csv --workers 8 --output-dir outreach
+
+DEFAULT_CACHE_PATH = os.getenv("PROFILE_CACHE_PATH", ".cache/profile_cache.sqlite")
+DEFAULT_TTL = float(os.getenv("PROFILE_CACHE_TTL_HOURS", "72")) * 3600
+
+LEAD_FIELDS = ("lead_name", "industry", "key_decision_maker", "position", "milestone")
+_COMPANY_SUFFIXES = {"inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation", "co", "gmbh", "plc"}
+
+
+def normalize_company(name):
+    """Case, punctuation and legal suffixes (Inc, Ltd, ...) don't make a new company"""
+    words = re.sub(r"[^\w\s]+", " ", name.lower()).split()
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words = words[:-1]
+    return " ".join(words)
+
+
+def _slug(text, limit=40):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:limit] or "lead"
+
+
+class ProfileCache(TaskOutputCache):
+    """Lead profiles keyed by profiling prompt, model, company and industry"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        super().__init__(path, ttl)
+
+    @staticmethod
+    def key(profiling_task, lead):
+        return task_key(profiling_task, lead_name=normalize_company(lead["lead_name"]),
+                        industry=" ".join(lead["industry"].lower().split()))
+
+
+def read_leads(path):
+    """Leads from a CSV (with a header row) or JSONL file; unknown columns are kept"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json")):
+            leads = [json.loads(line) for line in f if line.strip()]
+        else:
+            leads = list(csv.DictReader(f))
+    return [{key.strip(): (value or "").strip() if isinstance(value, str) else value
+             for key, value in lead.items() if key} for lead in leads]
+
+
+def validate_lead(lead):
+    missing = [name for name in LEAD_FIELDS if not str(lead.get(name) or "").strip()]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    return {name: str(lead[name]) for name in LEAD_FIELDS}
+
+
+def _usage(token_usage):
+    return {name: getattr(token_usage, name, 0) or 0
+            for name in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+def run_lead(lead, path, profiles=None, verbose=False):
+    """Profiles (or reuses the profile of) the lead's company, writes the outreach
+    drafts to path and returns the run's summary"""
+    from crewai import Crew
+
+    import L4_tools_customer_outreach as L4
+    from TaskScheduler import run_dag
+
+    inputs = validate_lead(lead)
+    # Own LLMs per crew, so token usage is per lead
+    crew = L4.build_outreach_crew(own_llms=True, verbose=verbose)
+    profiling = crew.tasks[0]
+
+    def profile():
+        profiling_crew = Crew(agents=[profiling.agent], tasks=[profiling], verbose=verbose)
+        return profiling_crew.kickoff(inputs=inputs).tasks_output[0].raw
+
+    start = time.perf_counter()
+    if profiles is None:
+        raw, cached = profile(), False
+    else:
+        raw, cached = profiles.get(ProfileCache.key(profiling, inputs),
+                                   f"{inputs['lead_name']} ({inputs['industry']})", profile)
+    result = run_dag(crew, inputs=inputs, completed={0: cached_output(profiling, raw)})
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(result.raw)
+    os.replace(tmp, path)
+    return {"lead_name": inputs["lead_name"], "key_decision_maker": inputs["key_decision_maker"],
+            "path": path, "seconds": round(time.perf_counter() - start, 2), "profile_cached": cached,
+            **_usage(result.token_usage)}
+
+
+def output_path(output_dir, lead):
+    name = f"{_slug(str(lead.get('lead_name') or ''))}--{_slug(str(lead.get('key_decision_maker') or ''))}.md"
+    return os.path.join(output_dir, name)
+
+
+def run_campaign(leads, output_dir="outreach", workers=4, profiles=None, skip_existing=False, on_done=None):
+    """Runs every lead with at most workers crews at once.
+
+    profiles is a ProfileCache, or None to profile every lead afresh. Leads
+    whose drafts already exist are skipped with skip_existing (to resume a
+    campaign). Returns one summary per lead, in input order; on_done(summary)
+    is called as each finishes.
+    """
+
+    def run(lead):
+        path = output_path(output_dir, lead)
+        if skip_existing and os.path.exists(path):
+            summary = {"lead_name": lead.get("lead_name"), "key_decision_maker": lead.get("key_decision_maker"),
+                       "path": path, "skipped": True}
+        else:
+            start = time.perf_counter()
+            try:
+                summary = run_lead(lead, path, profiles)
+            except Exception as e:
+                summary = {"lead_name": lead.get("lead_name"), "key_decision_maker": lead.get("key_decision_maker"),
+                           "error": f"{type(e).__name__}: {e}", "seconds": round(time.perf_counter() - start, 2)}
+        if on_done:
+            on_done(summary)
+        return summary
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, leads))
+
+
+def campaign_report(summaries, wall_time=None):
+    done = [s for s in summaries if "error" not in s and not s.get("skipped")]
+    failed = [s for s in summaries if "error" in s]
+    tokens = sum(s["total_tokens"] for s in done)
+    cached = sum(s["profile_cached"] for s in done)
+    lines = [f"{len(done)} leads written, {len(summaries) - len(done) - len(failed)} skipped, {len(failed)} failed"
+             + (f" in {wall_time:.1f}s" if wall_time is not None else "")]
+    if done:
+        seconds = sorted(s["seconds"] for s in done)
+        lines.append(f"profiles reused for {cached} of {len(done)} leads; "
+                     f"{tokens} tokens ({tokens / len(done):.0f} per lead)")
+        lines.append(f"per lead: median {seconds[len(seconds) // 2]:.1f}s, max {seconds[-1]:.1f}s")
+    for s in failed[:20]:
+        lines.append(f"  failed: {s['lead_name']} / {s['key_decision_maker']}: {s['error']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the L4 outreach crew for every lead in a CSV or JSONL file")
+    parser.add_argument("leads", help=f"CSV or JSONL with {', '.join(LEAD_FIELDS)}")
+    parser.add_argument("--output-dir", default="outreach")
+    parser.add_argument("--workers", type=int, default=4, help="leads in flight at once")
+    parser.add_argument("--no-profile-cache", action="store_true", help="profile every lead afresh")
+    parser.add_argument("--skip-existing", action="store_true", help="skip leads whose drafts are already written")
+    args = parser.parse_args()
+
+    leads = read_leads(args.leads)
+    profiles = None if args.no_profile_cache else ProfileCache()
+    os.makedirs(args.output_dir, exist_ok=True)
+    results_path = os.path.join(args.output_dir, "campaign_results.jsonl")
+    results_lock = threading.Lock()
+
+    with open(results_path, "a", encoding="utf-8") as results:
+        def on_done(summary):
+            # One line per lead as it finishes, so progress survives an interruption
+            with results_lock:
+                results.write(json.dumps(summary) + "\n")
+                results.flush()
+            sys.stderr.write(f"{'skipped' if summary.get('skipped') else 'error' if 'error' in summary else 'done'}: "
+                             f"{summary['lead_name']} / {summary['key_decision_maker']}\n")
+
+        start = time.perf_counter()
+        summaries = run_campaign(leads, args.output_dir, args.workers, profiles, args.skip_existing, on_done)
+    print(campaign_report(summaries, time.perf_counter() - start))
+    print(f"Results in {results_path}")
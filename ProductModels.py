@@ -0,0 +1,21 @@
+from typing import List, Dict
+
+from pydantic import BaseModel
+
+
+class ProductAttributes(BaseModel):
+    """Output from first task"""
+    products: List[str]
+    attributes: List[str]
+
+
+class ProductData(BaseModel):
+    """Individual product with its data"""
+    product_id: str
+    price: float
+    attributes: Dict[str, str]  # attribute_name: attribute_value
+
+
+class ProductDataList(BaseModel):
+    """Output from second task"""
+    products: List[ProductData]
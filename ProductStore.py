@@ -0,0 +1,228 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from ProductModels import ProductData, ProductDataList
+
+# Columnar store of every ProductData record collected by the shopper crew.
+# Each column is a flat binary file that is only ever appended to and is read
+# back through np.memmap, so lookups and cohort scans don't parse any JSON.
+#
+#   row columns:        asin (S16), batch (int64), product_id (int32 code), price (float64)
+#   attribute columns:  attr_row (int64), attr_key (int32 code), attr_value (int32 code)
+#
+# Strings other than the ASIN are dictionary encoded in strings.json. Re-running an
+# ASIN appends a new batch; reads only see the latest batch of each ASIN.
+
+ASIN_DTYPE = np.dtype("S16")
+ROW_COLUMNS = {
+    "asin": ASIN_DTYPE,
+    "batch": np.dtype("<i8"),
+    "product_id": np.dtype("<i4"),
+    "price": np.dtype("<f8"),
+}
+ATTRIBUTE_COLUMNS = {
+    "attr_row": np.dtype("<i8"),
+    "attr_key": np.dtype("<i4"),
+    "attr_value": np.dtype("<i4"),
+}
+
+
+class ProductStore:
+    def __init__(self, path="product_store"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._strings = {"product_id": [], "attr_key": [], "attr_value": []}
+        strings_path = os.path.join(path, "strings.json")
+        if os.path.exists(strings_path):
+            with open(strings_path, encoding="utf-8") as f:
+                self._strings.update(json.load(f))
+        self._codes = {name: {s: i for i, s in enumerate(values)} for name, values in self._strings.items()}
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def column(self, name):
+        """Read-only memory map of a column"""
+        dtype = ROW_COLUMNS.get(name) or ATTRIBUTE_COLUMNS[name]
+        path = self._file(name)
+        count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+        if name in ROW_COLUMNS:
+            count = min(count, self._row_count())
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+    def _row_count(self):
+        # A torn append leaves some columns longer than others; ignore the tail
+        counts = []
+        for name, dtype in ROW_COLUMNS.items():
+            path = self._file(name)
+            counts.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        return min(counts)
+
+    def __len__(self):
+        return self._row_count()
+
+    def _encode(self, kind, value):
+        codes = self._codes[kind]
+        if value not in codes:
+            codes[value] = len(self._strings[kind])
+            self._strings[kind].append(value)
+        return codes[value]
+
+    def append(self, asin, products):
+        """Appends a ProductDataList (or list of ProductData) as a new batch for asin"""
+        if isinstance(products, ProductDataList):
+            products = products.products
+        encoded_asin = asin.encode("ascii")
+        if len(encoded_asin) > ASIN_DTYPE.itemsize:
+            raise ValueError(f"ASIN too long for the store: {asin!r}")
+
+        with self._lock:
+            start = self._row_count()
+            self._truncate(start)
+            batch = int(self.column("batch").max()) + 1 if start else 0
+            rows = {
+                "asin": np.full(len(products), encoded_asin, dtype=ASIN_DTYPE),
+                "batch": np.full(len(products), batch, dtype=ROW_COLUMNS["batch"]),
+                "product_id": np.array([self._encode("product_id", p.product_id) for p in products],
+                                       dtype=ROW_COLUMNS["product_id"]),
+                "price": np.array([p.price for p in products], dtype=ROW_COLUMNS["price"]),
+            }
+            attr_row, attr_key, attr_value = [], [], []
+            for offset, product in enumerate(products):
+                for key, value in product.attributes.items():
+                    attr_row.append(start + offset)
+                    attr_key.append(self._encode("attr_key", key))
+                    attr_value.append(self._encode("attr_value", str(value)))
+            attributes = {
+                "attr_row": np.array(attr_row, dtype=ATTRIBUTE_COLUMNS["attr_row"]),
+                "attr_key": np.array(attr_key, dtype=ATTRIBUTE_COLUMNS["attr_key"]),
+                "attr_value": np.array(attr_value, dtype=ATTRIBUTE_COLUMNS["attr_value"]),
+            }
+
+            self._save_strings()
+            for name, values in {**attributes, **rows}.items():
+                with open(self._file(name), "ab") as f:
+                    f.write(values.tobytes())
+            return batch
+
+    def _truncate(self, rows):
+        # Drop the tail of an interrupted append so all columns line up again
+        for name, dtype in ROW_COLUMNS.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * dtype.itemsize:
+                os.truncate(path, rows * dtype.itemsize)
+        attr_rows = self.column("attr_row")
+        keep = int(np.searchsorted(attr_rows, rows, side="left"))
+        if keep < len(attr_rows):
+            del attr_rows
+            for name, dtype in ATTRIBUTE_COLUMNS.items():
+                os.truncate(self._file(name), keep * dtype.itemsize)
+
+    def _save_strings(self):
+        tmp = os.path.join(self.path, "strings.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._strings, f)
+        os.replace(tmp, os.path.join(self.path, "strings.json"))
+
+    def live_rows(self):
+        """Boolean mask of rows belonging to the latest batch of their ASIN"""
+        asins = self.column("asin")
+        batches = self.column("batch")
+        if not len(asins):
+            return np.zeros(0, dtype=bool)
+        _, inverse = np.unique(asins, return_inverse=True)
+        latest = np.full(inverse.max() + 1, -1, dtype=batches.dtype)
+        np.maximum.at(latest, inverse, batches)
+        return batches == latest[inverse]
+
+    def lookup(self, asin):
+        """All products of the latest batch for asin, as a ProductDataList"""
+        asins = self.column("asin")
+        rows = np.flatnonzero(asins == asin.encode("ascii"))
+        if len(rows):
+            batches = self.column("batch")[rows]
+            rows = rows[batches == batches.max()]
+        return self.load(rows)
+
+    def scan(self, asins=None, min_price=None, max_price=None, attribute=None, include_masked=False):
+        """Row indices over the latest batches, filtered by cohort, price range
+        and an (attribute, value) pair. Masked prices (-1.0) are skipped unless
+        include_masked is set."""
+        mask = self.live_rows()
+        if not len(mask):
+            return np.empty(0, dtype=np.int64)
+        if asins is not None:
+            wanted = np.array([a.encode("ascii") for a in asins], dtype=ASIN_DTYPE)
+            mask &= np.isin(self.column("asin"), wanted)
+        prices = self.column("price")
+        if not include_masked:
+            mask &= prices >= 0
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        if attribute is not None:
+            key, value = attribute
+            key_code = self._codes["attr_key"].get(key)
+            value_code = self._codes["attr_value"].get(str(value))
+            if key_code is None or value_code is None:
+                return np.empty(0, dtype=np.int64)
+            hits = (self.column("attr_key") == key_code) & (self.column("attr_value") == value_code)
+            matching = np.zeros(len(mask), dtype=bool)
+            matching[self.column("attr_row")[hits]] = True
+            mask &= matching
+        return np.flatnonzero(mask)
+
+    def load(self, rows):
+        """Builds a ProductDataList for the given row indices.
+
+        Records come straight from the columns with model_construct, skipping
+        pydantic validation and any JSON round trip.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        product_ids = self.column("product_id")[rows]
+        prices = self.column("price")[rows]
+        attr_rows = self.column("attr_row")
+        attr_keys = self.column("attr_key")
+        attr_values = self.column("attr_value")
+        starts = np.searchsorted(attr_rows, rows, side="left")
+        ends = np.searchsorted(attr_rows, rows, side="right")
+
+        names = self._strings
+        products = []
+        for code, price, start, end in zip(product_ids, prices, starts, ends):
+            attributes = {
+                names["attr_key"][k]: names["attr_value"][v]
+                for k, v in zip(attr_keys[start:end], attr_values[start:end])
+            }
+            products.append(ProductData.model_construct(
+                product_id=names["product_id"][code], price=float(price), attributes=attributes
+            ))
+        return ProductDataList.model_construct(products=products)
+
+    def cohort_prices(self, asins=None):
+        """(asin, price) arrays over the latest batches, ready for cross-cohort analysis"""
+        rows = self.scan(asins)
+        return self.column("asin")[rows].astype(str), np.asarray(self.column("price")[rows])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the columnar product store")
+    parser.add_argument("asin", nargs="?")
+    parser.add_argument("--path", default="product_store")
+    args = parser.parse_args()
+
+    store = ProductStore(args.path)
+    if args.asin:
+        print(store.lookup(args.asin).model_dump_json(indent=2))
+    else:
+        asins, prices = store.cohort_prices()
+        print(f"{len(store)} rows, {len(set(asins))} ASINs, median price {np.median(prices) if len(prices) else 0:.2f}")
@@ -0,0 +1,372 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# Process-wide limits for calls to rate limited services: LLM models
+# ("llm:<model>") and tools ("tool:<name>"). Each key gets
+#
+#   - token buckets for requests and tokens per minute, when limits are known
+#     (RATE_LIMITS='{"llm:gpt-4o-mini": {"rpm": 500, "tpm": 200000}}'),
+#   - an AIMD controller for the number of calls in flight and the request
+#     rate: both creep up while calls succeed, and are cut back on 429s (and
+#     concurrency also when latency climbs well above its floor),
+#   - retries of throttled calls with jittered exponential backoff that
+#     honours Retry-After.
+#
+# Without configured limits a key is unthrottled until its first 429; from
+# then on its rate adapts around the throughput the provider accepted.
+#
+#   python RateLimiter.py --mock-rpm 600 --clients 32 --seconds 30   # against a throttling MockServer
+
+DEFAULT_CONCURRENCY = int(os.getenv("RATE_LIMIT_CONCURRENCY", "8"))
+MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "64"))
+DEFAULT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "6"))
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 per second up to burst.
+
+    An amount larger than burst is let through once the bucket is full and
+    leaves it in debt, so large requests (tokens) are slowed, not starved.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.per_minute = float(per_minute)
+        self.burst = float(burst) if burst is not None else max(self.per_minute / 60.0, 1.0)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def acquire(self, amount=1.0):
+        """Blocks until amount can be taken; returns the seconds waited"""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                needed = min(amount, self.burst)
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return time.monotonic() - start
+                wait = (needed - self.tokens) * 60.0 / self.per_minute
+            # Short sleeps, so a rate raised meanwhile takes effect
+            time.sleep(min(wait, 0.1))
+
+    def try_acquire(self, amount=1.0):
+        """Takes amount only if it is available now"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    def credit(self, amount):
+        """Returns (or, if negative, charges) tokens after the fact"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.burst, self.tokens + amount)
+
+    def set_rate(self, per_minute):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.per_minute = float(per_minute)
+            self.burst = max(self.per_minute / 60.0, 1.0)
+            self.tokens = min(self.tokens, self.burst)
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on calls in flight.
+
+    Each success raises the limit by increase / limit (about +increase per
+    round of calls); a throttled call, or a latency above latency_tolerance
+    times the lowest seen, multiplies it by decrease, at most once per
+    cooldown so one burst of failures counts once.
+    """
+
+    def __init__(self, initial=DEFAULT_CONCURRENCY, minimum=1, maximum=MAX_CONCURRENCY,
+                 increase=1.0, decrease=0.7, latency_tolerance=2.5, cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.min_latency = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            congested = throttled
+            if latency is not None and not throttled:
+                if self.min_latency is None or latency < self.min_latency:
+                    self.min_latency = latency
+                congested = latency > self.min_latency * self.latency_tolerance + 0.05
+            if congested:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            elif self.in_flight + 1 >= int(self.limit):
+                # Only grow while the limit is what holds calls back
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+
+def throttle_info(error):
+    """(throttled, retry_after seconds or None) for an exception from an API or HTTP client"""
+    response = getattr(error, "response", None)
+    status = (getattr(error, "status_code", None) or getattr(error, "code", None)
+              or getattr(response, "status_code", None))
+    throttled = status == 429 or "RateLimit" in type(error).__name__
+    if not throttled:
+        return False, None
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("Retry-After") or headers.get("retry-after") or 0) or None
+    except (TypeError, ValueError, AttributeError):
+        retry_after = None
+    return True, retry_after
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than retry_after"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+class LimitedResource:
+    """Limits and adaptive state for one key"""
+
+    def __init__(self, key, rpm=None, tpm=None, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES):
+        self.key = key
+        self.max_rpm = rpm
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm, burst=tpm / 60.0 * 5) if tpm else None
+        self.controller = AIMDController(initial=concurrency)
+        self.retries = retries
+        self.stats = {"calls": 0, "throttled": 0, "retries": 0, "failed": 0, "waited": 0.0}
+        self.decrease = 0.85
+        self._step = max((rpm or 0) * 0.02, 0.1)
+        self._last_cut = 0.0
+        self._last_increase = time.monotonic()
+        self._successes = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def rpm(self):
+        return self.requests.per_minute if self.requests else None
+
+    def _observed_rpm(self, now, window=10.0):
+        while self._successes and now - self._successes[0] > window:
+            self._successes.popleft()
+        if not self._successes:
+            return 0.0
+        return len(self._successes) * 60.0 / max(now - self._successes[0], 1.0)
+
+    def _on_success(self, now):
+        with self._lock:
+            self._successes.append(now)
+            if self.requests is None:
+                return
+            # Additive increase: a fixed step per second, 2% of the rate at the last cut
+            ceiling = self.max_rpm or float("inf")
+            elapsed = now - self._last_increase
+            self._last_increase = now
+            if self.requests.per_minute < ceiling:
+                step = self._step * min(elapsed, 1.0)
+                self.requests.set_rate(min(ceiling, self.requests.per_minute + step))
+
+    def _on_throttle(self, now):
+        with self._lock:
+            self.stats["throttled"] += 1
+            if now - self._last_cut < 1.0:
+                return
+            self._last_cut = now
+            observed = self._observed_rpm(now)
+            if self.requests is None:
+                # First 429 without a configured limit: start from what got through
+                rate = max(observed, 1.0) * self.decrease
+                self.requests = TokenBucket(rate)
+            else:
+                rate = max(1.0, min(self.requests.per_minute, observed or self.requests.per_minute) * self.decrease)
+                self.requests.set_rate(rate)
+            self._step = max(rate * 0.02, 0.1)
+            self._last_increase = now
+
+    def _wait(self, tokens):
+        waited = self.requests.acquire(1) if self.requests else 0.0
+        if self.tokens is not None and tokens:
+            waited += self.tokens.acquire(tokens)
+        if waited:
+            with self._lock:
+                self.stats["waited"] += waited
+
+    def call(self, fn, *args, tokens=0, usage=None, **kwargs):
+        """fn(*args, **kwargs) within the limits, retrying throttled calls.
+
+        tokens is the estimated token cost; usage(result), when given,
+        returns the actual cost so the token bucket can be corrected.
+        """
+        for attempt in range(self.retries + 1):
+            self._wait(tokens)
+            self.controller.acquire()
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled, retry_after = throttle_info(e)
+                self.controller.release(throttled=throttled)
+                if not throttled:
+                    with self._lock:
+                        self.stats["failed"] += 1
+                    raise
+                self._on_throttle(time.monotonic())
+                if attempt == self.retries:
+                    with self._lock:
+                        self.stats["failed"] += 1
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(backoff_delay(attempt, retry_after=retry_after))
+                continue
+            now = time.monotonic()
+            self.controller.release(latency=now - start)
+            self._on_success(now)
+            with self._lock:
+                self.stats["calls"] += 1
+            if usage is not None and self.tokens is not None:
+                actual = usage(result)
+                if actual is not None:
+                    self.tokens.credit(tokens - actual)
+            return result
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, rpm=round(self.rpm, 1) if self.rpm else None,
+                        observed_rpm=round(self._observed_rpm(time.monotonic()), 1),
+                        concurrency=round(self.controller.limit, 2), in_flight=self.controller.in_flight)
+
+
+class RateLimiter:
+    """Registry of LimitedResource by key, created on first use"""
+
+    def __init__(self, limits=None):
+        self.limits = dict(limits or {})
+        self._resources = {}
+        self._lock = threading.Lock()
+
+    def configure(self, key, rpm=None, tpm=None, concurrency=DEFAULT_CONCURRENCY):
+        with self._lock:
+            self.limits[key] = {"rpm": rpm, "tpm": tpm, "concurrency": concurrency}
+            self._resources[key] = LimitedResource(key, rpm, tpm, concurrency)
+            return self._resources[key]
+
+    def resource(self, key):
+        with self._lock:
+            if key not in self._resources:
+                # "llm:gpt-4o-mini" falls back to limits for "llm:*"
+                config = self.limits.get(key) or self.limits.get(key.split(":", 1)[0] + ":*") or {}
+                self._resources[key] = LimitedResource(key, **config)
+            return self._resources[key]
+
+    def call(self, key, fn, *args, **kwargs):
+        if os.getenv("RATE_LIMIT_DISABLE"):
+            kwargs.pop("tokens", None)
+            kwargs.pop("usage", None)
+            return fn(*args, **kwargs)
+        return self.resource(key).call(fn, *args, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            resources = list(self._resources.values())
+        return {r.key: r.snapshot() for r in resources}
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter():
+    """Process-wide limiter; limits come from $RATE_LIMITS (JSON of key -> {rpm, tpm, concurrency})"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter(json.loads(os.getenv("RATE_LIMITS") or "{}"))
+        return _shared
+
+
+def _mock_client(url):
+    import urllib.request
+
+    body = json.dumps({"model": "mock", "messages": [{"role": "user", "content": "ping"}]}).encode("utf-8")
+
+    def call():
+        request = urllib.request.Request(f"{url}/v1/chat/completions", data=body,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+
+    return call
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from MockServers import MockServer
+
+    parser = argparse.ArgumentParser(description="Drive a throttling MockServer through the limiter")
+    parser.add_argument("--mock-rpm", type=float, default=600, help="requests per minute the mock accepts")
+    parser.add_argument("--rpm", type=float, default=None, help="limit configured on the client side")
+    parser.add_argument("--clients", type=int, default=32, help="threads calling as fast as they can")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = MockServer(latency=args.latency, tokens_per_second=1e6, completion_tokens=20,
+                        rpm_limit=args.mock_rpm).start()
+    limiter = RateLimiter()
+    resource = limiter.configure("llm:mock", rpm=args.rpm)
+    call = _mock_client(server.url)
+    stop = time.monotonic() + args.seconds
+
+    def client():
+        while time.monotonic() < stop:
+            try:
+                limiter.call("llm:mock", call)
+            except Exception:
+                pass
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    print(f"{'t':>4} {'ok/min':>8} {'429s':>6} {'rpm limit':>10} {'concurrency':>12}")
+    last = dict(server.stats)
+    for second in range(5, int(args.seconds) + 1, 5):
+        time.sleep(5)
+        stats = dict(server.stats)
+        ok = stats["chat_requests"] - last["chat_requests"]
+        throttled = stats.get("throttled", 0) - last.get("throttled", 0)
+        snapshot = resource.snapshot()
+        print(f"{second:4d} {ok * 12:8.0f} {throttled:6d} {snapshot['rpm'] or '-':>10} {snapshot['concurrency']:12.2f}")
+        last = stats
+    for thread in threads:
+        thread.join()
+    server.stop()
+    print(json.dumps(limiter.stats(), indent=1))
@@ -0,0 +1,441 @@
+import csv
+import json
+import math
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+from typing import List, Optional
+
+import numpy as np
+from crewai.tools import BaseTool
+
+# Value at risk, expected shortfall (CVaR) and drawdown for portfolios of the
+# instruments in a local price history. Every scenario (a set of weights and a
+# volatility multiplier) and horizon is computed in the same NumPy operations;
+# Monte Carlo paths are simulated in fixed-size chunks with one SeedSequence
+# child per chunk, so results depend on the seed only, not on how many worker
+# processes shared the chunks.
+#
+# Price histories are CSV or Parquet: either wide (a date column and one column
+# per instrument), long (date, symbol, close), or a directory of such files.
+#
+#   python RiskEngine.py data/prices --weights '{"UST10Y": 0.6, "EURUSD": -0.4}' --horizons 1 10 21
+
+DEFAULT_DATA_PATH = os.getenv("RISK_DATA_PATH", "data/prices")
+DEFAULT_CONFIDENCE = (0.95, 0.99)
+DEFAULT_HORIZONS = (1, 10)
+DEFAULT_PATHS = 20000
+# Floats per simulated chunk (paths x days x instruments); fixed so chunking
+# does not depend on the number of workers
+_CHUNK_FLOATS = 2_000_000
+
+_DATE_COLUMNS = ("date", "time", "timestamp", "datetime")
+_SYMBOL_COLUMNS = ("symbol", "ticker", "instrument", "series")
+_PRICE_COLUMNS = ("close", "adj_close", "adj close", "price", "value", "level")
+
+
+class RiskInputError(ValueError):
+    pass
+
+
+@dataclass
+class PriceHistory:
+    dates: np.ndarray
+    symbols: List[str]
+    prices: np.ndarray
+
+    def resolve(self, symbol):
+        """Column index of symbol, matched case-insensitively"""
+        wanted = symbol.strip().lower()
+        for i, name in enumerate(self.symbols):
+            if name.lower() == wanted:
+                return i
+        raise RiskInputError(f"Unknown instrument {symbol!r}; available: {', '.join(self.symbols)}")
+
+    def log_returns(self):
+        return np.diff(np.log(self.prices), axis=0)
+
+
+def _read_rows(path):
+    """(header, rows) of a CSV or Parquet file, all values as strings"""
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise RiskInputError("Reading Parquet price histories needs pandas and pyarrow") from e
+        frame = pd.read_parquet(path)
+        if frame.index.name and frame.index.name.lower() in _DATE_COLUMNS:
+            frame = frame.reset_index()
+        return [str(c) for c in frame.columns], frame.astype(str).values.tolist()
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return header, [row for row in reader if row]
+
+
+def _parse_series(path, positive=True):
+    """{symbol: {date: price}} from one file"""
+    header, rows = _read_rows(path)
+    lowered = [h.strip().lower() for h in header]
+    date_col = next((i for i, h in enumerate(lowered) if h in _DATE_COLUMNS), 0)
+    symbol_col = next((i for i, h in enumerate(lowered) if h in _SYMBOL_COLUMNS), None)
+    series = {}
+    if symbol_col is not None:
+        price_col = next((i for i, h in enumerate(lowered) if h in _PRICE_COLUMNS), None)
+        if price_col is None:
+            raise RiskInputError(f"{path}: long format needs a close/price column")
+        for row in rows:
+            value = _number(row[price_col], positive)
+            if value is not None:
+                series.setdefault(row[symbol_col].strip(), {})[_date(row[date_col], path)] = value
+        return series
+    price_cols = [i for i in range(len(header)) if i != date_col]
+    if len(price_cols) == 1 and lowered[price_cols[0]] in _PRICE_COLUMNS:
+        # date,close file per instrument: the file name is the symbol
+        names = {price_cols[0]: os.path.splitext(os.path.basename(path))[0]}
+    else:
+        names = {i: header[i].strip() for i in price_cols}
+    for row in rows:
+        for i, name in names.items():
+            value = _number(row[i], positive) if i < len(row) else None
+            if value is not None:
+                series.setdefault(name, {})[_date(row[date_col], path)] = value
+    return series
+
+
+_ISO_DATE = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:[T ](\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?))?$")
+
+
+def _date(text, path):
+    """np.datetime64 of an ISO date or datetime; anything else (01/02/2020 is
+    ambiguous) is rejected rather than sorted as a string"""
+    match = _ISO_DATE.match(text.strip())
+    if not match:
+        raise RiskInputError(f"{path}: dates must be ISO formatted (YYYY-MM-DD), got {text.strip()!r}")
+    day, clock = match.groups()
+    if clock is None or not clock.strip("0:."):
+        return np.datetime64(day, "D")
+    return np.datetime64(f"{day}T{clock}")
+
+
+def _number(text, positive=True):
+    try:
+        value = float(text)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and (value > 0 or not positive) else None
+
+
+def _price_files(path):
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.endswith((".csv", ".parquet")))
+    return [path] if os.path.exists(path) else []
+
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def load_prices(path=DEFAULT_DATA_PATH, positive=True):
+    """PriceHistory aligned on the union of dates, forward filled.
+
+    Dates before every instrument has a price are dropped. Results are cached
+    until one of the files changes. positive=False keeps zero and negative
+    values, for factor series such as rates or spreads.
+    """
+    files = _price_files(path)
+    if not files:
+        raise RiskInputError(f"No CSV or Parquet price history found at {path}")
+    stamp = tuple((f, os.path.getmtime(f)) for f in files)
+    with _histories_lock:
+        cached = _histories.get((path, positive))
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    series = {}
+    for f in files:
+        series.update(_parse_series(f, positive))
+    symbols = sorted(series)
+    dates = np.array(sorted({d for values in series.values() for d in values}))
+    prices = np.full((len(dates), len(symbols)), np.nan)
+    position = {d: i for i, d in enumerate(dates)}
+    for j, symbol in enumerate(symbols):
+        for d, value in series[symbol].items():
+            prices[position[d], j] = value
+    # Forward fill each column with the index of its last observation
+    filled = np.where(np.isnan(prices), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    prices = prices[filled, np.arange(len(symbols))]
+    complete = ~np.isnan(prices).any(axis=1)
+    history = PriceHistory(dates[complete], symbols, prices[complete])
+    if len(history.dates) < 3:
+        raise RiskInputError(f"Not enough overlapping history at {path} ({len(history.dates)} dates)")
+    with _histories_lock:
+        _histories[(path, positive)] = (stamp, history)
+    return history
+
+
+# -- statistics ---------------------------------------------------------------
+
+def _tail(pnl, confidence):
+    """VaR and CVaR (as positive losses) along axis 0 for each confidence level.
+
+    VaR is the k-th worst outcome and CVaR the mean of the k worst, with
+    k = ceil(n * (1 - confidence)).
+    """
+    ordered = np.sort(pnl, axis=0)
+    n = ordered.shape[0]
+    k = np.maximum(np.ceil(n * (1 - np.asarray(confidence))).astype(int), 1)
+    cumulative = np.cumsum(ordered, axis=0)
+    shape = (-1,) + (1,) * (pnl.ndim - 1)
+    return -ordered[k - 1], -cumulative[k - 1] / k.reshape(shape)
+
+
+def _scale(returns, vol_scale, axis=0):
+    """Stretches returns around their mean by each scenario's vol_scale (last axis)"""
+    mean = returns.mean(axis=axis, keepdims=True)
+    return mean + vol_scale * (returns - mean)
+
+
+def _max_drawdown(growth):
+    """Max drawdown along axis -2 of cumulative returns (..., days, scenarios) from a start value of 1"""
+    value = 1.0 + growth
+    peak = np.maximum.accumulate(np.maximum(value, 1.0), axis=-2)
+    return (1.0 - value / peak).max(axis=-2)
+
+
+def _simulate_chunk(seed, n, mu, chol, horizons, weights, vol_scale):
+    """Horizon returns (n, horizons, scenarios) and max drawdowns (n, scenarios)
+    of n simulated buy-and-hold paths"""
+    rng = np.random.default_rng(seed)
+    days = max(horizons)
+    shocks = rng.standard_normal((n, days, len(mu))) @ chol.T
+    cumulative = np.cumsum(shocks + mu, axis=1)
+    growth = _scale(np.expm1(cumulative) @ weights.T, vol_scale)
+    return growth[:, np.asarray(horizons) - 1, :], _max_drawdown(growth)
+
+
+class RiskEngine:
+    """Risk figures for scenario portfolios over one PriceHistory"""
+
+    def __init__(self, history):
+        self.history = history
+        self.log_returns = history.log_returns()
+        self._cumulative = np.vstack([np.zeros((1, len(history.symbols))), np.cumsum(self.log_returns, axis=0)])
+
+    def weights(self, scenarios):
+        """(scenarios, instruments) weight matrix and per-scenario vol_scale"""
+        matrix = np.zeros((len(scenarios), len(self.history.symbols)))
+        for s, scenario in enumerate(scenarios):
+            for symbol, weight in scenario["weights"].items():
+                matrix[s, self.history.resolve(symbol)] += float(weight)
+        vol_scale = np.array([float(s.get("vol_scale", 1.0)) for s in scenarios])
+        return matrix, vol_scale
+
+    def horizon_returns(self, horizon, weights, vol_scale):
+        """Overlapping buy-and-hold portfolio returns over horizon days, (windows, scenarios)"""
+        if horizon >= len(self._cumulative):
+            raise RiskInputError(f"Horizon of {horizon} days is longer than the history")
+        asset = np.expm1(self._cumulative[horizon:] - self._cumulative[:-horizon])
+        return _scale(asset @ weights.T, vol_scale)
+
+    def historical(self, weights, vol_scale, horizons, confidence):
+        var = np.empty((len(confidence), len(horizons), len(weights)))
+        cvar = np.empty_like(var)
+        for h, horizon in enumerate(horizons):
+            var[:, h], cvar[:, h] = _tail(self.horizon_returns(horizon, weights, vol_scale), confidence)
+        return var, cvar
+
+    def parametric(self, weights, vol_scale, horizons, confidence):
+        """Normal VaR/CVaR from the mean and covariance of daily returns"""
+        daily = np.expm1(self.log_returns) @ weights.T
+        mu = daily.mean(axis=0)
+        sigma = daily.std(axis=0, ddof=1) * vol_scale
+        h = np.asarray(horizons, dtype=float)[:, None]
+        mu_h, sigma_h = mu * h, sigma * np.sqrt(h)
+        tail = 1 - np.asarray(confidence)[:, None, None]
+        z = np.array([NormalDist().inv_cdf(t) for t in tail.ravel()]).reshape(tail.shape)
+        density = np.exp(-z ** 2 / 2) / math.sqrt(2 * math.pi)
+        return -(mu_h + z * sigma_h), -(mu_h - sigma_h * density / tail)
+
+    def monte_carlo(self, weights, vol_scale, horizons, confidence, paths=DEFAULT_PATHS, seed=0, workers=None):
+        """VaR/CVaR and drawdown quantiles from correlated normal daily log returns"""
+        mu = self.log_returns.mean(axis=0)
+        cov = np.atleast_2d(np.cov(self.log_returns, rowvar=False))
+        try:
+            chol = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            chol = np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-12 * np.trace(cov))
+        chunk = max(256, _CHUNK_FLOATS // (max(horizons) * len(mu)))
+        sizes = [min(chunk, paths - start) for start in range(0, paths, chunk)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        args = [(s, n, mu, chol, tuple(horizons), weights, vol_scale) for s, n in zip(seeds, sizes)]
+        if workers and workers > 1 and len(args) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+                parts = list(pool.map(_simulate_chunk, *zip(*args)))
+        else:
+            parts = [_simulate_chunk(*a) for a in args]
+        returns = np.concatenate([p[0] for p in parts])
+        drawdowns = np.concatenate([p[1] for p in parts])
+        var, cvar = _tail(returns, confidence)
+        return var, cvar, drawdowns
+
+    def drawdown(self, weights, vol_scale):
+        """Historical max drawdown of each scenario, rebalanced daily, with peak and trough dates"""
+        daily = _scale(np.expm1(self.log_returns) @ weights.T, vol_scale)
+        # Portfolio value on every date of the history, starting at 1
+        value = np.vstack([np.ones((1, weights.shape[0])), np.cumprod(1.0 + daily, axis=0)])
+        drawdown = 1.0 - value / np.maximum.accumulate(value, axis=0)
+        troughs = drawdown.argmax(axis=0)
+        results = []
+        for s, trough in enumerate(troughs):
+            peak = int(np.argmax(value[:trough + 1, s]))
+            results.append({
+                "max_drawdown": float(drawdown[trough, s]),
+                "peak": str(self.history.dates[peak]),
+                "trough": str(self.history.dates[trough]),
+            })
+        return results
+
+    def analyze(self, scenarios, horizons=DEFAULT_HORIZONS, confidence=DEFAULT_CONFIDENCE,
+                methods=("historical", "parametric", "monte_carlo"), paths=DEFAULT_PATHS, seed=0,
+                workers=None, notional=None):
+        """Nested report: scenario -> method -> horizon -> confidence -> {var, cvar}"""
+        horizons = sorted({int(h) for h in horizons})
+        confidence = [float(c) for c in confidence]
+        if not scenarios:
+            raise RiskInputError("No scenarios given")
+        if horizons[0] < 1 or not all(0.5 < c < 1 for c in confidence):
+            raise RiskInputError("Horizons must be positive days and confidence levels between 0.5 and 1")
+        unknown = set(methods) - {"historical", "parametric", "monte_carlo"}
+        if unknown:
+            raise RiskInputError(f"Unknown methods: {', '.join(sorted(unknown))}")
+        weights, vol_scale = self.weights(scenarios)
+
+        tables = {}
+        if "historical" in methods:
+            tables["historical"] = self.historical(weights, vol_scale, horizons, confidence)
+        if "parametric" in methods:
+            tables["parametric"] = self.parametric(weights, vol_scale, horizons, confidence)
+        simulated_drawdowns = None
+        if "monte_carlo" in methods:
+            var, cvar, simulated_drawdowns = self.monte_carlo(weights, vol_scale, horizons, confidence,
+                                                              paths, seed, workers)
+            tables["monte_carlo"] = (var, cvar)
+        drawdowns = self.drawdown(weights, vol_scale)
+
+        def figure(value):
+            entry = round(float(value), 6)
+            return {"fraction": entry, "amount": round(float(value) * notional, 2)} if notional else entry
+
+        report = {
+            "data": {"instruments": self.history.symbols, "start": str(self.history.dates[0]),
+                     "end": str(self.history.dates[-1]), "observations": int(len(self.history.dates))},
+            "notes": "Losses are positive fractions of portfolio value"
+                     + (f" (amounts on a notional of {notional:g})" if notional else "")
+                     + "; VaR/CVaR horizons are in trading days.",
+            "scenarios": {},
+        }
+        for s, scenario in enumerate(scenarios):
+            name = scenario.get("name") or f"scenario {s + 1}"
+            entry = {"weights": scenario["weights"], "vol_scale": float(vol_scale[s])}
+            for method, (var, cvar) in tables.items():
+                entry[method] = {
+                    f"{horizon}d": {f"{c:.1%}".replace(".0%", "%"): {"var": figure(var[i, h, s]),
+                                                                     "cvar": figure(cvar[i, h, s])}
+                                    for i, c in enumerate(confidence)}
+                    for h, horizon in enumerate(horizons)
+                }
+            entry["drawdown"] = dict(drawdowns[s], max_drawdown=figure(drawdowns[s]["max_drawdown"]))
+            if simulated_drawdowns is not None:
+                column = simulated_drawdowns[:, s]
+                entry["drawdown"][f"simulated_{max(horizons)}d"] = {
+                    "median": figure(np.median(column)), "p95": figure(np.quantile(column, 0.95))}
+            report["scenarios"][name] = entry
+        return report
+
+
+def analyze_request(request, data_path=DEFAULT_DATA_PATH, workers=None):
+    """Runs a JSON/dict request (see RiskEngineTool) against the history at data_path"""
+    if isinstance(request, str):
+        try:
+            request = json.loads(request)
+        except json.JSONDecodeError as e:
+            raise RiskInputError(f"Request is not valid JSON: {e}") from e
+    if not isinstance(request, dict):
+        raise RiskInputError("Request must be a JSON object")
+    # The history location is the tool's setting, never the caller's
+    history = load_prices(data_path)
+    scenarios = request.get("scenarios")
+    if not scenarios:
+        weights = request.get("weights")
+        if not weights:
+            instruments = request.get("instruments") or history.symbols
+            weights = {symbol: 1.0 / len(instruments) for symbol in instruments}
+        scenarios = [{"name": "portfolio", "weights": weights, "vol_scale": request.get("vol_scale", 1.0)}]
+    for scenario in scenarios:
+        if not isinstance(scenario, dict) or not isinstance(scenario.get("weights"), dict):
+            raise RiskInputError("Each scenario needs a weights object, e.g. {\"UST10Y\": 0.5}")
+    return RiskEngine(history).analyze(
+        scenarios,
+        horizons=request.get("horizons", DEFAULT_HORIZONS),
+        confidence=request.get("confidence", DEFAULT_CONFIDENCE),
+        methods=request.get("methods", ("historical", "parametric", "monte_carlo")),
+        paths=int(request.get("paths", DEFAULT_PATHS)),
+        seed=int(request.get("seed", 0)),
+        workers=workers,
+        notional=request.get("notional"),
+    )
+
+
+class RiskEngineTool(BaseTool):
+    name: str = "Risk engine"
+    description: str = (
+        "Computes value at risk, expected shortfall (CVaR) and max drawdown from local price "
+        "history, using historical, parametric (normal) and Monte Carlo methods. Pass JSON: "
+        "{\"scenarios\": [{\"name\": \"rates up\", \"weights\": {\"UST10Y\": -0.5, \"USDJPY\": 0.5}, "
+        "\"vol_scale\": 1.5}], \"horizons\": [1, 10, 21], \"confidence\": [0.95, 0.99], "
+        "\"notional\": 1000000}. Weights are fractions of capital (negative for shorts); "
+        "vol_scale stresses volatility. Returns JSON with losses as positive fractions. "
+        "An unknown instrument returns the list of available ones."
+    )
+    data_path: str = DEFAULT_DATA_PATH
+    workers: Optional[int] = None
+
+    def _run(self, request: str) -> str:
+        try:
+            return json.dumps(analyze_request(request, self.data_path, self.workers), indent=1)
+        except (RiskInputError, OSError, KeyError, TypeError, ValueError) as e:
+            return f"Could not run the risk engine: {e}"
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="VaR, CVaR and drawdown for a portfolio of local price series")
+    parser.add_argument("data_path", nargs="?", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--weights", help='JSON object, e.g. {"UST10Y": 0.6, "EURUSD": -0.4} (default: equal)')
+    parser.add_argument("--scenarios", help="JSON list of {name, weights, vol_scale}")
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(DEFAULT_HORIZONS))
+    parser.add_argument("--confidence", type=float, nargs="+", default=list(DEFAULT_CONFIDENCE))
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes for the Monte Carlo paths")
+    parser.add_argument("--notional", type=float, default=None)
+    args = parser.parse_args()
+
+    request = {"horizons": args.horizons, "confidence": args.confidence, "paths": args.paths,
+               "seed": args.seed, "notional": args.notional}
+    if args.scenarios:
+        request["scenarios"] = json.loads(args.scenarios)
+    elif args.weights:
+        request["weights"] = json.loads(args.weights)
+    start = time.perf_counter()
+    report = analyze_request(request, args.data_path, args.workers)
+    print(json.dumps(report, indent=1))
+    print(f"{(time.perf_counter() - start) * 1000:.1f} ms")
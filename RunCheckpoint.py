@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from crewai.tasks.task_output import TaskOutput
+
+from TaskScheduler import task_label
+
+# Per-task checkpoints for long crews. Every task output is written to a JSONL
+# run log as soon as the task finishes; a rerun with the same inputs and task
+# definitions finds the log and resumes after the tasks already in it:
+#
+#   cp = RunCheckpoint(crew, inputs, name="L6")
+#   result = run_dag(crew, inputs, completed=cp.completed(), on_complete=cp.record)
+
+
+def task_template(task, field):
+    # crewai interpolates inputs in place and keeps the template in _original_*
+    return getattr(task, f"_original_{field}", None) or getattr(task, field, None)
+
+
+def task_definition(task):
+    """What a task does, independent of the inputs: prompt templates, agent, model, context, output file"""
+    context = task.context if isinstance(getattr(task, "context", None), list) else None
+    agent = getattr(task, "agent", None)
+    return {
+        "description": task_template(task, "description"),
+        "expected_output": task_template(task, "expected_output"),
+        "agent": getattr(agent, "role", None),
+        "model": getattr(getattr(agent, "llm", None), "model", None),
+        "context": None if context is None else [task_template(t, "description") for t in context],
+        "output_file": task_template(task, "output_file"),
+    }
+
+
+def run_key(tasks, inputs):
+    """Hash of the inputs and of every task's definition, in order"""
+    definition = [task_definition(task) for task in tasks]
+    payload = json.dumps({"inputs": inputs, "tasks": definition}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunCheckpoint:
+    """JSONL log of the task outputs of one run, keyed by run_key.
+
+    The first line describes the run; each further line is one completed
+    task. The whole file is rewritten through a temporary file and
+    os.replace, so an interrupted run never leaves a truncated log behind.
+    """
+
+    def __init__(self, crew, inputs, directory=".cache/runs", name="run"):
+        self.key = run_key(crew.tasks, inputs)
+        self.labels = [task_label(task) for task in crew.tasks]
+        self.path = os.path.join(directory, f"{name}-{self.key[:16]}.jsonl")
+        self._lock = threading.Lock()
+        self._records = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        records = {}
+        with open(self.path, encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("key") != self.key:
+                return {}
+            for line in f:
+                record = json.loads(line)
+                records[record["position"]] = record
+        return records
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        header = {"key": self.key, "tasks": self.labels}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+            for position in sorted(self._records):
+                f.write(json.dumps(self._records[position], ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def record(self, position, task, output):
+        """TaskScheduler.run_dag on_complete callback"""
+        with self._lock:
+            self._records[position] = {
+                "position": position,
+                "label": self.labels[position] if position < len(self.labels) else task_label(task),
+                "agent": getattr(output, "agent", None),
+                "description": getattr(output, "description", None),
+                "summary": getattr(output, "summary", None),
+                "raw": output.raw,
+                "json": getattr(output, "json_dict", None),
+                "completed_at": time.time(),
+            }
+            self._write()
+
+    def completed(self):
+        """Outputs of the tasks already in the log, by position, for run_dag(completed=...)"""
+        with self._lock:
+            return {
+                position: TaskOutput(
+                    description=record["description"] or record["label"],
+                    summary=record["summary"],
+                    raw=record["raw"],
+                    json_dict=record["json"],
+                    agent=record["agent"] or "",
+                )
+                for position, record in self._records.items()
+            }
+
+    def records(self):
+        with self._lock:
+            return [self._records[position] for position in sorted(self._records)]
+
+    def discard(self):
+        with self._lock:
+            self._records = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the tasks recorded in a run log")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        done = {record["position"]: record for record in map(json.loads, f)}
+    print(f"run {header['key'][:16]}: {len(done)}/{len(header['tasks'])} tasks completed")
+    for position, label in enumerate(header["tasks"]):
+        record = done.get(position)
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["completed_at"])) if record else "pending"
+        print(f"  [{position}] {when:19}  {label}")
@@ -0,0 +1,275 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+from crewai_tools import ScrapeWebsiteTool
+
+from RateLimiter import shared_limiter
+
+# Pages scraped by the agents are kept here, zlib compressed, for SCRAPE_CACHE_TTL
+# seconds. After that they are revalidated with If-None-Match / If-Modified-Since.
+DEFAULT_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", ".cache/scrape_cache.sqlite")
+DEFAULT_TTL = float(os.getenv("SCRAPE_CACHE_TTL", str(6 * 3600)))
+
+# Whether the last fetch on this thread was served without a full download
+_last_fetch = threading.local()
+
+
+def last_fetch_cached(reset=False):
+    """True/False for the last fetch on this thread, None if there was none"""
+    cached = getattr(_last_fetch, "cached", None)
+    if reset:
+        _last_fetch.cached = None
+    return cached
+
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+def request_url(url):
+    """The URL as the agent gave it, minus stray quotes and brackets copied out of prompts"""
+    url = url.strip().strip("\"'[]<>")
+    return url if "://" in url else "https://" + url
+
+
+def normalize_url(url):
+    """Canonical form used as the cache key (never fetched itself).
+
+    Lowercases scheme and host, drops default ports, fragments and trailing
+    slashes, and sorts the query string.
+    """
+    parts = urlsplit(request_url(url))
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def extract_text(html):
+    """Same text extraction as crewai_tools' ScrapeWebsiteTool"""
+    parsed = BeautifulSoup(html, "html.parser")
+    text = parsed.get_text(" ")
+    text = re.sub("[ \t]+", " ", text)
+    text = re.sub("\\s+\n\\s+", "\n", text)
+    return text
+
+
+class ScrapeCache:
+    """TTL cache of extracted page text keyed by normalized URL.
+
+    Concurrent fetches of the same URL share a single request.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, timeout=15, session=None):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched REAL NOT NULL,"
+            " source_url TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "source_url" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN source_url TEXT")
+        self._conn.commit()
+
+    def _load(self, url):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT body, etag, last_modified, fetched FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _store(self, url, text, etag, last_modified, source_url):
+        body = zlib.compress(text.encode("utf-8"), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, etag, last_modified, fetched, source_url)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, time.time(), source_url),
+            )
+            self._conn.commit()
+
+    def _touch(self, url):
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def fetch(self, url):
+        """Returns the extracted text of url, fetching at most once per TTL"""
+        key = normalize_url(url)
+        row = self._load(key)
+        _last_fetch.cached = True
+        if row is not None and time.time() - row[3] < self.ttl:
+            self._count("hits")
+            return zlib.decompress(row[0]).decode("utf-8")
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            # Another leader may have just stored a fresh copy
+            row = self._load(key)
+            if row is not None and time.time() - row[3] < self.ttl:
+                self._count("hits")
+                text = zlib.decompress(row[0]).decode("utf-8")
+            else:
+                text = self._refresh(key, request_url(url), row)
+            future.set_result(text)
+            return text
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _refresh(self, key, url, row):
+        # key is only the cache key; the request goes to the URL as given, since
+        # query order or a trailing slash can matter to the server
+        headers = dict(HEADERS)
+        if row is not None:
+            if row[1]:
+                headers["If-None-Match"] = row[1]
+            if row[2]:
+                headers["If-Modified-Since"] = row[2]
+
+        def fetch():
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 429:
+                response.raise_for_status()
+            return response
+
+        response = shared_limiter().call("tool:scrape", fetch)
+        if response.status_code == 304 and row is not None:
+            self._count("revalidated")
+            self._touch(key)
+            return zlib.decompress(row[0]).decode("utf-8")
+
+        self._count("misses")
+        _last_fetch.cached = False
+        response.raise_for_status()
+        response.encoding = response.apparent_encoding
+        text = extract_text(response.text)
+        self._store(key, text, response.headers.get("ETag"), response.headers.get("Last-Modified"), url)
+        return text
+
+    def invalidate(self, url):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (normalize_url(url),))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM pages"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "entries": entries,
+            "compressed_bytes": size,
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_scrape_cache():
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ScrapeCache()
+        return _shared_cache
+
+
+class CachedScrapeWebsiteTool(ScrapeWebsiteTool):
+    """ScrapeWebsiteTool whose fetches go through a shared ScrapeCache"""
+
+    cache: Optional[Any] = None
+
+    def _run(self, **kwargs: Any) -> Any:
+        website_url = kwargs.get("website_url", self.website_url)
+        cache = self.cache if self.cache is not None else shared_scrape_cache()
+        return cache.fetch(website_url)
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    from MockServers import MockServer
+
+    parser = argparse.ArgumentParser(description="Check fetch dedup and revalidation against a MockServer")
+    parser.add_argument("--clients", type=int, default=16, help="threads fetching the same page at once")
+    parser.add_argument("--ttl", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = MockServer(latency=0.1).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ScrapeCache(os.path.join(tmp, "scrape.sqlite"), ttl=args.ttl)
+        url = f"{server.url}/page/1"
+        barrier = threading.Barrier(args.clients)
+
+        def client():
+            barrier.wait()
+            return cache.fetch(url)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client())) for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == args.clients and len(set(results)) == 1, results
+        assert server.stats["page_requests"] == 1, server.stats
+
+        time.sleep(args.ttl + 0.1)
+        assert cache.fetch(url) == results[0]
+        assert server.stats["page_requests"] == 1, server.stats
+        assert server.stats["page_not_modified"] == 1, server.stats
+        assert cache.revalidated == 1, cache.stats()
+        print(cache.stats())
+        cache._conn.close()
+    server.stop()
@@ -0,0 +1,133 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+# Small in-memory BM25 index over text passages. Shared by the instruction
+# search tool and the docs retrieval tool.
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "will", "with", "you", "your", "we", "our", "they", "their",
+}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_text(text, max_words=150, overlap=30):
+    """Splits text into passages of about max_words, keeping paragraphs together"""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks = []
+    current = []
+    for paragraph in paragraphs:
+        words = paragraph.split()
+        if len(words) > max_words:
+            if current:
+                chunks.append(" ".join(current))
+                current = []
+            step = max(max_words - overlap, 1)
+            for start in range(0, len(words), step):
+                chunks.append(" ".join(words[start:start + max_words]))
+                if start + max_words >= len(words):
+                    break
+            continue
+        if current and len(current) + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current = []
+        current.extend(words)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring; passages are grouped by document"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages = {}
+        self.documents = defaultdict(list)
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.total_length = 0
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.passages)
+
+    def add_document(self, doc_id, passages):
+        """Indexes passages (text or (text, metadata) pairs) under doc_id, replacing any old ones"""
+        self.remove_document(doc_id)
+        for position, passage in enumerate(passages):
+            text, meta = passage if isinstance(passage, tuple) else (passage, {})
+            pid = self._next_id
+            self._next_id += 1
+            terms = Counter(tokenize(text))
+            self.passages[pid] = {"doc": doc_id, "position": position, "text": text, "meta": meta}
+            self.documents[doc_id].append(pid)
+            self.lengths[pid] = sum(terms.values())
+            self.total_length += self.lengths[pid]
+            for term, count in terms.items():
+                self.postings[term][pid] = count
+
+    def remove_document(self, doc_id):
+        for pid in self.documents.pop(doc_id, []):
+            passage = self.passages.pop(pid)
+            self.total_length -= self.lengths.pop(pid)
+            for term in set(tokenize(passage["text"])):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(pid, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def search(self, query, k=5):
+        """Returns up to k (score, passage) pairs, best first"""
+        if not self.passages:
+            return []
+        n = len(self.passages)
+        average = self.total_length / n or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pid, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[pid] / average)
+                scores[pid] += idf * tf * (self.k1 + 1) / norm
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score, self.passages[pid]) for pid, score in best]
+
+    def to_dict(self):
+        """Passages plus the built postings and lengths, so loading needs no re-tokenizing"""
+        return {
+            "passages": [[pid, p["doc"], p["position"], p["text"], p["meta"]] for pid, p in self.passages.items()],
+            "postings": {term: [[pid, tf] for pid, tf in postings.items()] for term, postings in self.postings.items()},
+            "lengths": [[pid, length] for pid, length in self.lengths.items()],
+            "next_id": self._next_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        index = cls(**kwargs)
+        if "postings" not in data:
+            # Older files kept only the passage text
+            for doc_id, passages in data.get("documents", {}).items():
+                index.add_document(doc_id, [(text, meta) for text, meta in passages])
+            return index
+        for pid, doc_id, position, text, meta in data["passages"]:
+            index.passages[pid] = {"doc": doc_id, "position": position, "text": text, "meta": meta}
+            index.documents[doc_id].append(pid)
+        for documents in index.documents.values():
+            documents.sort(key=lambda pid: index.passages[pid]["position"])
+        for term, postings in data["postings"].items():
+            index.postings[term] = {pid: tf for pid, tf in postings}
+        index.lengths = {pid: length for pid, length in data["lengths"]}
+        index.total_length = sum(index.lengths.values())
+        index._next_id = data.get("next_id", max(index.passages, default=-1) + 1)
+        return index
@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from crewai.tools import BaseTool
+
+# Offline lexicon sentiment scorer (VADER style valences in [-4, 4]). A fuller
+# lexicon in VADER's "word<TAB>score..." format can be supplied with
+# SENTIMENT_LEXICON=/path/to/vader_lexicon.txt; it is loaded once per process.
+
+_BASE_LEXICON = {
+    "amazing": 2.8, "appreciate": 2.0, "appreciated": 2.1, "awesome": 3.1, "benefit": 1.5,
+    "best": 3.2, "better": 1.9, "brilliant": 2.8, "celebrate": 2.7, "clear": 1.2,
+    "collaborate": 1.4, "congratulations": 2.9, "convenient": 1.7, "delighted": 3.0, "easy": 1.9,
+    "effective": 2.1, "efficient": 1.8, "engaging": 1.6, "enjoy": 2.2, "excellent": 2.7,
+    "excited": 2.3, "exciting": 2.2, "fantastic": 2.6, "fast": 1.0, "glad": 2.0,
+    "good": 1.9, "great": 3.1, "grow": 1.2, "growth": 1.6, "happy": 2.7,
+    "helpful": 1.8, "impressive": 2.3, "improve": 1.9, "improved": 2.1, "innovative": 1.8,
+    "inspiring": 2.2, "interested": 1.7, "love": 3.2, "nice": 1.8, "opportunity": 1.6,
+    "outstanding": 3.0, "perfect": 2.7, "pleased": 2.4, "positive": 2.6, "recommend": 1.5,
+    "reliable": 1.9, "remarkable": 2.4, "robust": 1.5, "smooth": 1.4, "solid": 1.3,
+    "strong": 1.7, "succeed": 2.2, "success": 2.7, "successful": 2.8, "support": 1.7,
+    "thank": 1.5, "thanks": 1.9, "thrilled": 3.1, "valuable": 2.1, "welcome": 2.0,
+    "win": 2.8, "wonderful": 2.7, "worth": 1.5,
+    "angry": -2.3, "annoyed": -1.6, "annoying": -1.8, "awful": -2.0, "bad": -2.5,
+    "broken": -1.8, "bug": -1.2, "complaint": -1.5, "concern": -1.0, "confusing": -1.3,
+    "costly": -1.3, "delay": -1.3, "delayed": -1.4, "difficult": -1.5, "disappointed": -1.9,
+    "disappointing": -2.2, "expensive": -1.2, "fail": -2.5, "failed": -2.3, "failure": -2.3,
+    "frustrated": -2.1, "frustrating": -1.9, "hate": -2.7, "horrible": -2.5, "issue": -1.0,
+    "lack": -1.3, "late": -1.0, "lose": -1.7, "loss": -1.3, "mediocre": -1.0,
+    "mistake": -1.4, "negative": -2.7, "poor": -2.1, "problem": -1.7, "risk": -1.1,
+    "sad": -2.1, "slow": -1.2, "sorry": -0.3, "spam": -1.5, "struggle": -1.8,
+    "terrible": -2.1, "unfortunately": -1.6, "unhappy": -1.8, "urgent": -0.6, "useless": -1.8,
+    "waste": -1.8, "weak": -1.9, "worse": -2.1, "worst": -3.1, "wrong": -2.1,
+}
+_NEGATIONS = {"not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "cannot",
+              "can't", "don't", "doesn't", "didn't", "isn't", "wasn't", "won't", "wouldn't",
+              "shouldn't", "aren't", "haven't", "hasn't", "without"}
+_BOOSTERS = {"very": 0.293, "really": 0.293, "extremely": 0.293, "incredibly": 0.293,
+             "truly": 0.293, "so": 0.293, "highly": 0.293, "absolutely": 0.293,
+             "slightly": -0.293, "somewhat": -0.293, "barely": -0.293}
+_NEGATION_SCALAR = -0.74
+_NEGATION_WINDOW = 3
+_ALPHA = 15.0
+
+_TOKEN_RE = re.compile(r"[a-z][a-z']*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+
+
+def label_for(score):
+    if score >= 0.05:
+        return "positive"
+    if score <= -0.05:
+        return "negative"
+    return "neutral"
+
+
+class SentimentScorer:
+    """Scores batches of texts in one vectorized pass and memoizes repeated texts"""
+
+    def __init__(self, lexicon=None, cache_size=10000):
+        self.lexicon = dict(_BASE_LEXICON if lexicon is None else lexicon)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        lexicon = dict(_BASE_LEXICON)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) >= 2:
+                    try:
+                        lexicon[fields[0].lower()] = float(fields[1])
+                    except ValueError:
+                        continue
+        return cls(lexicon, **kwargs)
+
+    def score(self, texts):
+        """Compound scores in [-1, 1], one per text"""
+        scores = [None] * len(texts)
+        todo = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    scores[i] = self._cache[text]
+                else:
+                    todo.append(i)
+
+        if todo:
+            computed = self._score_uncached([texts[i] for i in todo])
+            with self._lock:
+                for i, value in zip(todo, computed):
+                    scores[i] = value
+                    self._cache[texts[i]] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def _score_uncached(self, texts):
+        tokens = []
+        owners = []
+        for i, text in enumerate(texts):
+            found = _TOKEN_RE.findall(text.lower())
+            tokens.extend(found)
+            owners.extend([i] * len(found))
+        if not tokens:
+            return [0.0] * len(texts)
+
+        owners = np.asarray(owners)
+        vocabulary, inverse = np.unique(np.asarray(tokens), return_inverse=True)
+        valence = np.array([self.lexicon.get(t, 0.0) for t in vocabulary])[inverse]
+        is_negation = np.array([t in _NEGATIONS or t.endswith("n't") for t in vocabulary])[inverse]
+        boost = np.array([_BOOSTERS.get(t, 0.0) for t in vocabulary])[inverse]
+
+        # Negations within the previous few tokens of the same text flip and
+        # dampen a word; a booster right before it scales it up or down.
+        negated = np.zeros(len(tokens), dtype=bool)
+        for k in range(1, _NEGATION_WINDOW + 1):
+            negated[k:] |= is_negation[:-k] & (owners[k:] == owners[:-k])
+        valence = np.where(negated, valence * _NEGATION_SCALAR, valence)
+        previous_boost = np.zeros(len(tokens))
+        previous_boost[1:] = np.where(owners[1:] == owners[:-1], boost[:-1], 0.0)
+        valence = valence + np.sign(valence) * previous_boost
+
+        totals = np.bincount(owners, weights=valence, minlength=len(texts))
+        compound = totals / np.sqrt(totals * totals + _ALPHA)
+        return [round(float(c), 4) for c in compound]
+
+    def analyze(self, text):
+        """Per-sentence scores plus their mean as an aggregate"""
+        return self.analyze_batch([text])[0]
+
+    def analyze_batch(self, texts):
+        """analyze() for many texts, with all their sentences scored in one pass"""
+        split = [split_sentences(t) or [t] for t in texts]
+        flat = self.score([s for sentences in split for s in sentences])
+        results = []
+        position = 0
+        for sentences in split:
+            scores = flat[position:position + len(sentences)]
+            position += len(sentences)
+            overall = float(np.mean(scores))
+            results.append({
+                "label": label_for(overall),
+                "score": round(overall, 4),
+                "sentences": [
+                    {"text": s, "score": v, "label": label_for(v)} for s, v in zip(sentences, scores)
+                ],
+            })
+        return results
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer():
+    """Process-wide scorer, loaded on first use"""
+    global _scorer
+    with _scorer_lock:
+        if _scorer is None:
+            path = os.getenv("SENTIMENT_LEXICON")
+            _scorer = SentimentScorer.from_file(path) if path else SentimentScorer()
+        return _scorer
+
+
+class SentimentAnalysisTool(BaseTool):
+    name: str = "Sentiment Analysis Tool"
+    description: str = ("Analyzes the sentiment of text "
+                        "to ensure positive and engaging communication. "
+                        "Returns an overall label and score plus a score for every sentence. "
+                        "Several drafts can be scored at once by separating them with a line "
+                        "containing only ---.")
+
+    def _run(self, text: str) -> str:
+        drafts = [d.strip() for d in re.split(r"\n\s*---+\s*\n", text) if d.strip()]
+        if len(drafts) > 1:
+            return json.dumps(get_scorer().analyze_batch(drafts), indent=1)
+        return json.dumps(get_scorer().analyze(text), indent=1)
@@ -0,0 +1,198 @@
+import json
+import re
+import sys
+import threading
+
+from pydantic import ValidationError
+
+import LLMStreaming
+from LLMCache import get_llm
+from ProductModels import ProductData, ProductDataList
+
+# Incremental parsing of a streamed {"products": [...]} completion. Each
+# ProductData element is validated as soon as its closing brace arrives, valid
+# records are handed to consumers right away, and only the malformed ones are
+# sent back to the LLM for repair.
+
+_ARRAY_START = re.compile(r'"products"\s*:\s*\[')
+
+
+class ProductStreamParser:
+    def __init__(self, on_record=None):
+        self.on_record = on_record
+        self.records = []
+        self.errors = []
+        self._seen = set()
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._start = None
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def feed(self, chunk):
+        """Consumes a chunk of streamed text; returns records completed by it"""
+        with self._lock:
+            self._buffer += chunk
+            completed = []
+            while self._pos < len(self._buffer):
+                if not self._in_array:
+                    match = _ARRAY_START.search(self._buffer, self._pos)
+                    if match is None:
+                        # Keep enough of the tail to match a marker split across chunks
+                        self._pos = max(self._pos, len(self._buffer) - 16)
+                        break
+                    self._in_array = True
+                    self._index = 0
+                    self._pos = match.end()
+                    continue
+                record = self._step(self._buffer[self._pos])
+                self._pos += 1
+                if record is not None:
+                    completed.append(record)
+        for record in completed:
+            if self.on_record:
+                self.on_record(record)
+        return completed
+
+    def _step(self, char):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+            return None
+        if char == '"' and self._depth > 0:
+            self._in_string = True
+        elif char == "{":
+            if self._depth == 0:
+                self._start = self._pos
+            self._depth += 1
+        elif char == "}" and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                return self._complete(self._buffer[self._start:self._pos + 1])
+        elif char == "]" and self._depth == 0:
+            self._in_array = False
+        return None
+
+    def _complete(self, text):
+        index = self._index
+        self._index += 1
+        try:
+            record = ProductData.model_validate_json(text)
+        except (ValidationError, ValueError) as e:
+            self.errors.append({"index": index, "text": text, "error": str(e)})
+            return None
+        # A retried completion repeats records that were already delivered
+        if record.product_id in self._seen:
+            return None
+        self._seen.add(record.product_id)
+        self.records.append(record)
+        return record
+
+
+def parse_product_list(text):
+    """ProductDataList from a whole completion: {"products": [...]} or a bare list,
+    possibly inside a code fence or prose. Raises ValueError if there is none."""
+    decoder = json.JSONDecoder()
+    for start in (i for i, char in enumerate(text) if char in "[{"):
+        try:
+            value, _ = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, list):
+            value = {"products": value}
+        try:
+            return ProductDataList.model_validate(value)
+        except ValidationError as e:
+            raise ValueError(f"Completion is not a product list: {e}") from e
+    raise ValueError(f"Completion has no JSON product list: {text[:200]!r}")
+
+
+def repair_records(errors, llm=None, max_rounds=2):
+    """Asks the LLM to fix only the malformed records; returns (fixed, still_bad)"""
+    llm = llm or get_llm()
+    fixed = []
+    for _ in range(max_rounds):
+        if not errors:
+            break
+        bad = "\n".join(
+            f"Record {i + 1}: {e['text']}\nError: {e['error']}" for i, e in enumerate(errors)
+        )
+        messages = [
+            {"role": "system", "content": "You repair malformed JSON records. Reply with JSON only."},
+            {"role": "user", "content": (
+                "Each record must match this JSON schema:\n"
+                f"{json.dumps(ProductData.model_json_schema())}\n\n"
+                f"Fix these {len(errors)} records, keeping their values where possible:\n{bad}\n\n"
+                'Reply as {"products": [...]} with the fixed records in the same order.'
+            )},
+        ]
+        parser = ProductStreamParser()
+        parser.feed(llm.call(messages))
+        fixed.extend(parser.records)
+        errors = parser.errors
+    return fixed, errors
+
+
+class StreamingProductCollector:
+    """Collects ProductData records from an LLM's stream while its task runs.
+
+    Attach it as the task's callback: when the task finishes, malformed records
+    are repaired and the task output is replaced with the validated
+    ProductDataList, before any downstream task or stage reads it. Records
+    that could not be repaired are reported on stderr and kept in unrepaired.
+    If the task fails before its callback runs, close() detaches the parser
+    (LLMStreaming drops it anyway once the LLM is collected).
+    """
+
+    def __init__(self, llm, on_record=None, repair_llm=None, max_repair_rounds=2):
+        self.llm = llm
+        self.parser = ProductStreamParser(on_record=on_record)
+        self.repair_llm = repair_llm
+        self.max_repair_rounds = max_repair_rounds
+        self.unrepaired = []
+        LLMStreaming.add_sink(llm, self.parser.feed)
+
+    def close(self):
+        LLMStreaming.remove_sink(self.llm, self.parser.feed)
+
+    def finalize(self, raw=None):
+        """Validated ProductDataList; raises ValueError if the completion held no product list"""
+        self.close()
+        if not self.parser.records and not self.parser.errors and raw:
+            # Nothing was streamed (e.g. a cache hit without a sink): parse the final text
+            self.parser.feed(raw)
+        if not self.parser.records and not self.parser.errors:
+            # No {"products": [ ... ]} at all: validate the whole answer (a bare
+            # list is fine), failing the task like output_pydantic would
+            for record in parse_product_list(raw or "").products:
+                self._deliver(record)
+            return ProductDataList(products=self.parser.records)
+        fixed, self.unrepaired = repair_records(
+            self.parser.errors, self.repair_llm, self.max_repair_rounds
+        )
+        for error in self.unrepaired:
+            sys.stderr.write(f"Dropped a product record that could not be repaired: {error['error']}\n"
+                             f"  {error['text'][:200]}\n")
+        for record in fixed:
+            self._deliver(record)
+        return ProductDataList(products=self.parser.records)
+
+    def _deliver(self, record):
+        if record.product_id not in self.parser._seen:
+            self.parser._seen.add(record.product_id)
+            self.parser.records.append(record)
+            if self.parser.on_record:
+                self.parser.on_record(record)
+
+    def __call__(self, output):
+        products = self.finalize(output.raw)
+        output.pydantic = products
+        output.raw = products.model_dump_json(indent=2)
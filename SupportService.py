@@ -0,0 +1,271 @@
+import asyncio
+import json
+import sys
+import time
+
+# Long-running front end for the L3 support crew. A pool of crews is built
+# once at startup and each inquiry borrows one for an async kickoff, so the
+# number of concurrent kickoffs is capped by the pool size. Requests that
+# cannot start right away wait in a bounded queue; beyond that the HTTP server
+# answers 429 and the stdin reader simply stops reading until there is room.
+#
+#   python SupportService.py --http 8080 --concurrency 4 --max-pending 32
+#   curl -d '{"customer": "Zinnia", "person": "Juan", "inquiry": "..."}' localhost:8080/inquiries
+#
+#   python SupportService.py --stdin < inquiries.jsonl > answers.jsonl
+
+REQUIRED_FIELDS = ("customer", "person", "inquiry")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class SupportService:
+    def __init__(self, crew_factory, concurrency=4, max_pending=32, timeout=None):
+        self.crew_factory = crew_factory
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.running = 0
+        self.stats = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0, "seconds": 0.0,
+                      "replace_failed": 0}
+        self._crews = None
+        # Strong references to background tasks, which the loop only holds weakly
+        self._background = set()
+
+    async def start(self):
+        """Builds the crew pool off the event loop"""
+        self._crews = asyncio.Queue()
+        crews = await asyncio.gather(*(asyncio.to_thread(self.crew_factory) for _ in range(self.concurrency)))
+        for crew in crews:
+            self._crews.put_nowait(crew)
+        return self
+
+    async def _replace_crew(self):
+        self._crews.put_nowait(await asyncio.to_thread(self.crew_factory))
+
+    def _replaced(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["replace_failed"] += 1
+            error = task.exception()
+            sys.stderr.write(f"Could not replace a timed-out crew, pool is down one: {type(error).__name__}: {error}\n")
+
+    def validate(self, request):
+        if not isinstance(request, dict):
+            raise BadRequest("expected a JSON object")
+        missing = [name for name in REQUIRED_FIELDS if not str(request.get(name) or "").strip()]
+        if missing:
+            raise BadRequest(f"missing fields: {', '.join(missing)}")
+        return {name: str(request[name]) for name in REQUIRED_FIELDS}
+
+    async def handle(self, request):
+        """Runs one inquiry and returns the response dict; raises Overloaded when full"""
+        inputs = self.validate(request)
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise Overloaded(f"{self.pending} inquiries already waiting")
+        self.stats["accepted"] += 1
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            crew = await self._crews.get()
+        finally:
+            self.pending -= 1
+        self.running += 1
+        try:
+            kickoff = crew.kickoff_async(inputs=inputs)
+            result = await (asyncio.wait_for(kickoff, self.timeout) if self.timeout else kickoff)
+        except asyncio.TimeoutError:
+            self.stats["failed"] += 1
+            # The kickoff keeps running in its worker thread, so that crew can't be reused
+            task = asyncio.create_task(self._replace_crew())
+            self._background.add(task)
+            task.add_done_callback(self._replaced)
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            self._crews.put_nowait(crew)
+            raise
+        else:
+            self._crews.put_nowait(crew)
+        finally:
+            self.running -= 1
+        seconds = time.perf_counter() - start
+        self.stats["completed"] += 1
+        self.stats["seconds"] += seconds
+        usage = getattr(result, "token_usage", None)
+        return {
+            "answer": result.raw,
+            "seconds": round(seconds, 3),
+            "token_usage": usage.model_dump() if hasattr(usage, "model_dump") else usage,
+        }
+
+    def health(self):
+        return dict(self.stats, pending=self.pending, running=self.running,
+                    concurrency=self.concurrency, max_pending=self.max_pending)
+
+
+# -- stdin JSONL --------------------------------------------------------------
+
+async def serve_stdin(service, reader=None, writer=None):
+    """One JSON request per input line, one JSON response per output line.
+
+    Responses are written as they complete and echo the request's "id".
+    Reading pauses while max_pending inquiries are waiting for a crew.
+    """
+    loop = asyncio.get_running_loop()
+    reader = reader or sys.stdin
+    writer = writer or sys.stdout
+    room = asyncio.Semaphore(service.concurrency + service.max_pending)
+    tasks = set()
+
+    def emit(response):
+        writer.write(json.dumps(response) + "\n")
+        writer.flush()
+
+    async def run(line_number, line):
+        try:
+            request = json.loads(line)
+            request_id = request.get("id", line_number) if isinstance(request, dict) else line_number
+            try:
+                emit({"id": request_id, **await service.handle(request)})
+            except BadRequest as e:
+                emit({"id": request_id, "error": str(e), "status": 400})
+            except Overloaded as e:
+                emit({"id": request_id, "error": str(e), "status": 429})
+            except Exception as e:
+                emit({"id": request_id, "error": f"{type(e).__name__}: {e}", "status": 500})
+        except json.JSONDecodeError as e:
+            emit({"id": line_number, "error": f"invalid JSON: {e}", "status": 400})
+        finally:
+            room.release()
+
+    line_number = 0
+    while True:
+        await room.acquire()
+        line = await loop.run_in_executor(None, reader.readline)
+        if not line:
+            room.release()
+            break
+        line_number += 1
+        if not line.strip():
+            room.release()
+            continue
+        task = asyncio.create_task(run(line_number, line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+# -- HTTP ---------------------------------------------------------------------
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+            429: "Too Many Requests", 500: "Internal Server Error", 504: "Gateway Timeout"}
+MAX_BODY = 1024 * 1024
+
+
+async def _send(writer, status, payload, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", "Content-Type: application/json",
+            f"Content-Length: {len(body)}", "Connection: keep-alive", *headers]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise BadRequest("body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path.split("?", 1)[0], headers, body
+
+
+async def serve_http(service, host="127.0.0.1", port=8080):
+    """POST /inquiries with {customer, person, inquiry}; GET /health for counters"""
+
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (BadRequest, ValueError) as e:
+                    await _send(writer, 400, {"error": str(e)})
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if method == "GET" and path == "/health":
+                    await _send(writer, 200, service.health())
+                elif method == "POST" and path == "/inquiries":
+                    try:
+                        response = await service.handle(json.loads(body or b"{}"))
+                        await _send(writer, 200, response)
+                    except (BadRequest, json.JSONDecodeError) as e:
+                        await _send(writer, 400, {"error": str(e)})
+                    except Overloaded as e:
+                        await _send(writer, 429, {"error": str(e)}, ["Retry-After: 5"])
+                    except asyncio.TimeoutError:
+                        await _send(writer, 504, {"error": "inquiry timed out"})
+                    except Exception as e:
+                        await _send(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+                else:
+                    await _send(writer, 404, {"error": "not found"})
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connection, host, port)
+    sys.stderr.write(f"Support service on http://{host}:{port} "
+                     f"({service.concurrency} crews, {service.max_pending} pending max)\n")
+    async with server:
+        await server.serve_forever()
+
+
+async def main(args):
+    from L3_Customer_Support import build_support_crew, prefetch_docs
+
+    # Docs are fetched and indexed before the first inquiry arrives
+    await asyncio.to_thread(prefetch_docs)
+    service = await SupportService(build_support_crew, args.concurrency, args.max_pending, args.timeout).start()
+    if args.stdin:
+        await serve_stdin(service)
+        sys.stderr.write(json.dumps(service.health()) + "\n")
+    else:
+        await serve_http(service, args.host, args.http)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the L3 support crew over HTTP or stdin JSONL")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--http", type=int, default=8080, metavar="PORT")
+    mode.add_argument("--stdin", action="store_true", help="read JSONL requests from stdin")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--concurrency", type=int, default=4, help="warm crews, i.e. concurrent kickoffs")
+    parser.add_argument("--max-pending", type=int, default=32, help="inquiries allowed to wait for a crew")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per inquiry")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from RunCheckpoint import task_definition
+
+# On-disk cache for the output of an expensive task that many runs share, such
+# as a content plan per topic or a lead profile per company. Callers decide
+# what makes two runs equivalent (task_key), and a run resumes from the cached
+# output with TaskScheduler.run_dag(completed={position: cached_output(...)}).
+
+
+def task_key(task, **parts):
+    """Hash of the task's definition (RunCheckpoint.task_definition) plus parts (normalized inputs)"""
+    payload = json.dumps({**task_definition(task), "parts": parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached_output(task, raw):
+    """TaskOutput standing in for task's output, for run_dag(completed=...)"""
+    from crewai.tasks.task_output import TaskOutput
+
+    return TaskOutput(description=task.description, raw=raw, agent=task.agent.role)
+
+
+class TaskOutputCache:
+    """Raw task outputs by key, valid for ttl seconds.
+
+    Concurrent requests for the same key wait for a single run of make().
+    Subclasses may keep their rows in their own table (key, label, raw and
+    created columns, under the names in COLUMNS).
+    """
+
+    TABLE = "outputs"
+    COLUMNS = ("key", "label", "raw", "created")
+
+    def __init__(self, path, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        key, label, raw, created = self.COLUMNS
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+            f" {key} TEXT PRIMARY KEY,"
+            f" {label} TEXT NOT NULL,"
+            f" {raw} TEXT NOT NULL,"
+            f" {created} REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _load(self, key):
+        _, _, raw, created = self.COLUMNS
+        with self._lock:
+            row = self._conn.execute(f"SELECT {raw}, {created} FROM {self.TABLE} WHERE {self.COLUMNS[0]} = ?",
+                                     (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def get(self, key, label, make):
+        """(raw output, cached) for key; make() runs once per missing or expired key"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            raw = self._load(key)
+            cached = raw is not None
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+                raw = make()
+                with self._lock:
+                    self._conn.execute(f"INSERT OR REPLACE INTO {self.TABLE} ({', '.join(self.COLUMNS)})"
+                                       " VALUES (?, ?, ?, ?)", (key, label, raw, time.time()))
+                    self._conn.commit()
+            future.set_result(raw)
+            return raw, cached
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE} WHERE {self.COLUMNS[0]} = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.TABLE}")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, expired = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({self.COLUMNS[3]} < ?), 0) FROM {self.TABLE}", (time.time() - self.ttl,)
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "expired": expired}
@@ -0,0 +1,210 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from crewai.utilities.formatter import aggregate_raw_outputs_from_task_outputs
+
+from CrewTracing import crew_span
+
+# Runs a sequential crew as a DAG built from the tasks' declared `context`.
+# A task without an explicit context keeps sequential semantics and depends on
+# every task listed before it; a task with a context only waits for those tasks,
+# so independent branches run concurrently.
+
+
+def task_label(task):
+    """Short human readable name for a task"""
+    if getattr(task, "name", None):
+        return task.name
+    description = " ".join(task.description.split())
+    if len(description) > 60:
+        description = description[:57] + "..."
+    role = task.agent.role if task.agent else "?"
+    return f"{role}: {description}"
+
+
+def _explicit_context(task):
+    # crewai uses None (older) or a NOT_SPECIFIED sentinel (newer) for "no context"
+    return task.context if isinstance(task.context, list) else None
+
+
+def build_dag(tasks):
+    """Returns, for each position in tasks, the set of positions it depends on.
+
+    Tasks can appear more than once (e.g. a repeated editor task), so nodes are
+    positions in the list and a context entry resolves to the latest earlier
+    occurrence of that task.
+    """
+    deps = []
+    for i, task in enumerate(tasks):
+        context = _explicit_context(task)
+        if context is None:
+            deps.append(set(range(i)))
+            continue
+        wanted = set()
+        for ctx in context:
+            j = _latest_occurrence(tasks, ctx, i)
+            if j is None:
+                raise ValueError(f"Task {i} ({task_label(task)}) has a context task that does not run before it")
+            wanted.add(j)
+        deps.append(wanted)
+    return deps
+
+
+def _latest_occurrence(tasks, task, before):
+    for j in range(before - 1, -1, -1):
+        if tasks[j] is task:
+            return j
+    return None
+
+
+def critical_path(deps, durations):
+    """Longest chain of dependent nodes by duration; returns (path, seconds)"""
+    finish = {}
+    previous = {}
+    for i in range(len(deps)):
+        before = max(deps[i], key=lambda d: finish[d], default=None)
+        previous[i] = before
+        finish[i] = durations.get(i, 0.0) + (finish[before] if before is not None else 0.0)
+    if not finish:
+        return [], 0.0
+    node = max(finish, key=lambda i: finish[i])
+    total = finish[node]
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    return path[::-1], total
+
+
+@dataclass
+class DagResult:
+    """Outputs of a DAG run, in the crew's declared task order"""
+    tasks_output: List[Any]
+    labels: List[str]
+    durations: Dict[int, float]
+    wall_time: float
+    critical_path: List[int]
+    critical_path_time: float
+    token_usage: Any = None
+    skipped: List[int] = field(default_factory=list)
+    result_index: Optional[int] = None
+
+    @property
+    def raw(self):
+        """Output of the run's result: the crew's last task, or the result stage"""
+        if not self.tasks_output:
+            return ""
+        index = self.result_index if self.result_index is not None else len(self.tasks_output) - 1
+        return self.tasks_output[index].raw
+
+    def __str__(self):
+        return self.raw
+
+    def report(self):
+        lines = [f"Wall time: {self.wall_time:.1f}s, critical path: {self.critical_path_time:.1f}s"]
+        for i in self.critical_path:
+            note = " (resumed)" if i in self.skipped else ""
+            lines.append(f"  [{i}] {self.durations.get(i, 0.0):7.1f}s  {self.labels[i]}{note}")
+        return "\n".join(lines)
+
+
+def _execute(task, context):
+    start = time.perf_counter()
+    output = task.execute_sync(agent=task.agent, context=context, tools=task.tools)
+    return output, time.perf_counter() - start
+
+
+def _collect(done, running, tasks, outputs, durations, on_complete):
+    """Records the finished futures in position order; returns the first failure, if any"""
+    failure = None
+    for future in sorted(done, key=lambda f: running[f]):
+        i = running.pop(future)
+        try:
+            outputs[i], durations[i] = future.result()
+        except Exception as e:
+            failure = failure or e
+            continue
+        if on_complete:
+            on_complete(i, tasks[i], outputs[i])
+    return failure
+
+
+def run_dag(crew, inputs=None, max_workers=None, completed=None, on_complete=None, stages=(),
+            context_builder=None, result_stage=None):
+    """Executes crew.tasks concurrently where their context dependencies allow.
+
+    completed maps task positions to outputs that are already known (they are
+    not re-run), and on_complete(position, task, output) is called as each task
+    finishes, including tasks that finish after another one failed. The same Task object is never run twice at the same time.
+    stages are in-process steps (see MaskingStage.LocalStage) scheduled after
+    crew.tasks, alongside any tasks they don't depend on. The run's result
+    (DagResult.raw) is the crew's last task, or result_stage when one of the
+    stages produces it (e.g. a join of sections written concurrently).
+    context_builder(task, outputs) turns the outputs a task depends on into its
+    context string (see ContextCompaction); by default they are concatenated.
+    """
+    tasks = list(crew.tasks) + list(stages)
+    deps = build_dag(tasks)
+    if inputs:
+        crew._interpolate_inputs(inputs)
+    for agent in crew.agents:
+        agent.crew = crew
+        if crew.step_callback and not agent.step_callback:
+            agent.step_callback = crew.step_callback
+
+    outputs = dict(completed or {})
+    durations = {i: 0.0 for i in outputs}
+    for i, output in outputs.items():
+        # Stages read their context from task.output, as after a real run
+        if i < len(tasks) and getattr(tasks[i], "output", None) is None:
+            tasks[i].output = output
+    pending = set(range(len(tasks))) - set(outputs)
+    running = {}
+    start = time.perf_counter()
+
+    with crew_span(crew, mode="dag"), ThreadPoolExecutor(max_workers=max_workers or max(len(tasks), 1)) as pool:
+        while pending or running:
+            for i in sorted(pending):
+                if not deps[i] <= outputs.keys():
+                    continue
+                if any(tasks[j] is tasks[i] for j in running.values()):
+                    continue
+                if _explicit_context(tasks[i]) is None:
+                    context_outputs = [outputs[j] for j in range(i)]
+                else:
+                    context_outputs = [outputs[_latest_occurrence(tasks, ctx, i)] for ctx in tasks[i].context]
+                if context_builder:
+                    context = context_builder(tasks[i], context_outputs)
+                else:
+                    context = aggregate_raw_outputs_from_task_outputs(context_outputs)
+                pending.discard(i)
+                running[pool.submit(_execute, tasks[i], context)] = i
+
+            if not running:
+                raise RuntimeError(f"Unschedulable tasks: {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            failure = _collect(done, running, tasks, outputs, durations, on_complete)
+            if failure is not None:
+                # The pool waits for the tasks already running anyway; record
+                # the ones that succeed (e.g. in a checkpoint) before failing
+                _collect(wait(running).done, running, tasks, outputs, durations, on_complete)
+                raise failure
+
+    path, path_time = critical_path(deps, durations)
+    try:
+        token_usage = crew.calculate_usage_metrics()
+    except Exception:
+        token_usage = None
+    return DagResult(
+        tasks_output=[outputs[i] for i in range(len(tasks))],
+        labels=[task_label(task) for task in tasks],
+        durations=durations,
+        wall_time=time.perf_counter() - start,
+        critical_path=path,
+        critical_path_time=path_time,
+        token_usage=token_usage,
+        skipped=sorted((completed or {}).keys()),
+        result_index=len(crew.tasks) - 1 if result_stage is None else _latest_occurrence(tasks, result_stage, len(tasks)),
+    )
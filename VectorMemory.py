@@ -0,0 +1,508 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import sys
+import time
+
+import numpy as np
+
+# Bounded local backend for crew memory (memory=True). Vectors live in one
+# contiguous float32 matrix searched brute force, or through an IVF index once
+# the store is large. Identical content is embedded once (embeddings are cached
+# by content hash) and stored once. The store never grows past max_items /
+# max_bytes: the least recently used rows are evicted first.
+#
+# MEMORY_EMBEDDER=hashing switches to a deterministic local embedder so crews
+# run without an embeddings API.
+
+DEFAULT_STORE_DIR = os.getenv("MEMORY_STORE_DIR", ".cache/memory")
+DEFAULT_MAX_ITEMS = int(os.getenv("MEMORY_MAX_ITEMS", "50000"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("MEMORY_MAX_MB", "256")) * 1024 * 1024)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def content_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: signed feature hashing of words and word pairs"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """OpenAI-compatible embeddings endpoint, one request per batch of texts"""
+
+    def __init__(self, model="text-embedding-3-small", batch_size=128):
+        self.model = model
+        self.name = model
+        self.batch_size = batch_size
+        self._client = None
+
+    def embed(self, texts):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(base_url=os.getenv("OPENAI_API_BASE") or None)
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self._client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            rows.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return _normalize(np.asarray(rows, dtype=np.float32))
+
+
+def default_embedder():
+    if os.getenv("MEMORY_EMBEDDER", "openai") == "hashing":
+        return HashingEmbedder()
+    return OpenAIEmbedder(os.getenv("MEMORY_EMBEDDING_MODEL", "text-embedding-3-small"))
+
+
+class EmbeddingCache:
+    """SQLite cache of embeddings keyed by embedder and content hash"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=200000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._puts = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        self._conn.commit()
+
+    def embed(self, embedder, texts):
+        """Embeddings for texts, calling embedder only for (distinct) uncached ones"""
+        keys = [f"{embedder.name}:{content_key(t)}" for t in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                marks = ",".join("?" * len(batch))
+                for key, blob in self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", batch):
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                hits = list(found)
+                for start in range(0, len(hits), 500):
+                    batch = hits[start:start + 500]
+                    self._conn.execute(f"UPDATE embeddings SET accessed = ? WHERE key IN ({','.join('?' * len(batch))})",
+                                       [time.time(), *batch])
+                self._conn.commit()
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = embedder.embed(list(missing.values()))
+            now = time.time()
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, accessed) VALUES (?, ?, ?)",
+                    [(key, vector.astype(np.float32).tobytes(), now) for key, vector in zip(missing, vectors)],
+                )
+                self._conn.commit()
+            found.update(zip(missing, vectors))
+            self._puts += len(missing)
+            if self._puts >= 1000:
+                self._puts = 0
+                self.evict()
+        return np.stack([found[key] for key in keys]).astype(np.float32)
+
+    def evict(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY accessed LIMIT ?)", (count - self.max_entries,))
+                self._conn.commit()
+
+
+class VectorStore:
+    """Fixed-budget vector store over a contiguous NumPy matrix.
+
+    index is "flat" (exact), "ivf" (inverted file over k-means centroids,
+    probing the nprobe closest lists) or "auto" (IVF from ivf_threshold rows).
+    With a path, the store is loaded from and saved to that directory.
+    """
+
+    def __init__(self, embedder=None, path=None, max_items=DEFAULT_MAX_ITEMS, max_bytes=DEFAULT_MAX_BYTES,
+                 index="auto", ivf_threshold=5000, nprobe=8, embedding_cache=None, save_interval=30.0):
+        self.embedder = embedder or default_embedder()
+        self.path = path
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.index = index
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.embedding_cache = embedding_cache if embedding_cache is not None else shared_embedding_cache()
+        self.save_interval = save_interval
+        self.count = 0
+        self.evicted = 0
+        self._vectors = None
+        self._accessed = np.zeros(0, dtype=np.float64)
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._records = []
+        self._rows = {}
+        self._text_bytes = 0
+        self._centroids = None
+        self._trained_at = 0
+        self._dirty = False
+        self._saved = time.time()
+        self._lock = threading.RLock()
+        if path and os.path.exists(os.path.join(path, "vectors.npy")):
+            self._load()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        dim = self._vectors.shape[1] if self._vectors is not None else 0
+        return self.count * dim * 4 + self._text_bytes
+
+    def _embed(self, texts):
+        return self.embedding_cache.embed(self.embedder, texts)
+
+    def _reserve(self, dim, rows):
+        if self._vectors is None:
+            self._vectors = np.zeros((max(rows, 64), dim), dtype=np.float32)
+            self._accessed = np.zeros(len(self._vectors), dtype=np.float64)
+            self._lists = np.zeros(len(self._vectors), dtype=np.int32)
+            return
+        if self._vectors.shape[1] != dim:
+            raise ValueError(f"Embedding size changed from {self._vectors.shape[1]} to {dim}; reset the store")
+        if rows <= len(self._vectors):
+            return
+        capacity = max(rows, 2 * len(self._vectors))
+        for name in ("_vectors", "_accessed", "_lists"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, texts, metadatas=None):
+        """Adds texts (embedded in one batch); identical texts are stored once"""
+        if isinstance(texts, str):
+            texts, metadatas = [texts], [metadatas or {}]
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            now = time.time()
+            fresh = {}
+            for text, metadata in zip(texts, metadatas):
+                key = content_key(text)
+                row = self._rows.get(key)
+                if row is not None:
+                    self._records[row]["metadata"].update(metadata or {})
+                    self._accessed[row] = now
+                elif key not in fresh:
+                    fresh[key] = (key, text, metadata or {})
+            fresh = list(fresh.values())
+            if fresh:
+                vectors = self._embed([text for _, text, _ in fresh])
+                self._reserve(vectors.shape[1], self.count + len(fresh))
+                start = self.count
+                self._vectors[start:start + len(fresh)] = vectors
+                self._accessed[start:start + len(fresh)] = now
+                if self._centroids is not None:
+                    self._lists[start:start + len(fresh)] = np.argmax(vectors @ self._centroids.T, axis=1)
+                for offset, (key, text, metadata) in enumerate(fresh):
+                    self._records.append({"key": key, "text": text, "metadata": metadata})
+                    self._rows[key] = start + offset
+                    self._text_bytes += len(text.encode("utf-8"))
+                self.count += len(fresh)
+                self._evict()
+            self._dirty = True
+            self._maybe_save()
+
+    def _evict(self):
+        excess = self.count - self.max_items
+        if self.nbytes > self.max_bytes and self.count:
+            per_row = self.nbytes / self.count
+            excess = max(excess, int(np.ceil((self.nbytes - self.max_bytes) / per_row)))
+        if excess <= 0:
+            return
+        victims = np.argsort(self._accessed[:self.count], kind="stable")[:excess]
+        for row in sorted(victims.tolist(), reverse=True):
+            self._remove_row(row)
+        self.evicted += len(victims)
+
+    def _remove_row(self, row):
+        last = self.count - 1
+        record = self._records[row]
+        del self._rows[record["key"]]
+        self._text_bytes -= len(record["text"].encode("utf-8"))
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._accessed[row] = self._accessed[last]
+            self._lists[row] = self._lists[last]
+            self._records[row] = self._records[last]
+            self._rows[self._records[row]["key"]] = row
+        self._records.pop()
+        self.count -= 1
+
+    def _use_ivf(self):
+        if self.index == "flat":
+            return False
+        return self.index == "ivf" or self.count >= self.ivf_threshold
+
+    def train(self, iterations=10, seed=0):
+        """(Re)builds the IVF centroids with k-means on a sample of the rows"""
+        with self._lock:
+            if not self.count:
+                return
+            vectors = self._vectors[:self.count]
+            nlist = max(1, int(np.sqrt(self.count)))
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(self.count, min(self.count, nlist * 64), replace=False)]
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sample)
+                empty = np.bincount(assign, minlength=nlist) == 0
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+            self._centroids = centroids
+            for start in range(0, self.count, 8192):
+                block = vectors[start:start + 8192]
+                self._lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            self._trained_at = self.count
+
+    def search(self, query, k=3, score_threshold=None, where=None):
+        """Returns up to k {"text", "metadata", "score"} dicts, best first"""
+        query_vector = self._embed([query])[0]
+        with self._lock:
+            if not self.count:
+                return []
+            if self._use_ivf():
+                if self._centroids is None or self.count > 2 * self._trained_at:
+                    self.train()
+                probe = np.argsort(-(self._centroids @ query_vector))[:self.nprobe]
+                rows = np.flatnonzero(np.isin(self._lists[:self.count], probe))
+                scores = self._vectors[rows] @ query_vector
+            else:
+                rows = None
+                scores = self._vectors[:self.count] @ query_vector
+            if not len(scores):
+                return []
+            if where:
+                # Filters are checked best-first, so rank everything
+                order = np.argsort(-scores, kind="stable")
+            else:
+                top = min(k, len(scores))
+                order = np.argpartition(-scores, top - 1)[:top]
+                order = order[np.argsort(-scores[order], kind="stable")]
+            results = []
+            now = time.time()
+            for i in order.tolist():
+                score = float(scores[i])
+                if score_threshold is not None and score < score_threshold:
+                    break
+                row = int(rows[i]) if rows is not None else i
+                record = self._records[row]
+                if where and any(record["metadata"].get(name) != value for name, value in where.items()):
+                    continue
+                self._accessed[row] = now
+                # Recency drives eviction, so reads are saved too
+                self._dirty = True
+                results.append({"id": record["key"], "text": record["text"],
+                                "metadata": record["metadata"], "score": score})
+                if len(results) == k:
+                    break
+            return results
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self._vectors = None
+            self._records = []
+            self._rows = {}
+            self._text_bytes = 0
+            self._centroids = None
+            self._trained_at = 0
+            self._dirty = True
+            self.save()
+
+    def stats(self):
+        return {
+            "items": self.count,
+            "bytes": self.nbytes,
+            "evicted": self.evicted,
+            "index": "ivf" if self._use_ivf() else "flat",
+            "embedding_cache_hits": self.embedding_cache.hits,
+            "embedding_cache_misses": self.embedding_cache.misses,
+        }
+
+    # -- persistence -----------------------------------------------------
+
+    def _maybe_save(self):
+        if self.path and time.time() - self._saved >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Writes the store to path atomically (temp files + os.replace)"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            vectors = self._vectors[:self.count] if self._vectors is not None else np.zeros((0, 0), np.float32)
+            with open(os.path.join(self.path, "vectors.npy.tmp"), "wb") as f:
+                np.save(f, vectors)
+            with open(os.path.join(self.path, "records.json.tmp"), "w", encoding="utf-8") as f:
+                json.dump({"embedder": self.embedder.name, "records": self._records,
+                           "accessed": self._accessed[:self.count].tolist()}, f)
+            os.replace(os.path.join(self.path, "vectors.npy.tmp"), os.path.join(self.path, "vectors.npy"))
+            os.replace(os.path.join(self.path, "records.json.tmp"), os.path.join(self.path, "records.json"))
+            self._dirty = False
+            self._saved = time.time()
+
+    def _load(self):
+        with open(os.path.join(self.path, "records.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        vectors = np.load(os.path.join(self.path, "vectors.npy"))
+        if data.get("embedder") != self.embedder.name or len(vectors) != len(data["records"]):
+            return
+        if len(vectors):
+            self._reserve(vectors.shape[1], len(vectors))
+            self._vectors[:len(vectors)] = vectors
+            self._accessed[:len(vectors)] = data["accessed"]
+        self._records = data["records"]
+        self._rows = {record["key"]: row for row, record in enumerate(self._records)}
+        self._text_bytes = sum(len(record["text"].encode("utf-8")) for record in self._records)
+        self.count = len(self._records)
+        self._saved = time.time()
+        self._evict()
+
+
+class VectorMemoryStorage:
+    """crewai memory storage (save/search/reset) backed by a VectorStore"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def save(self, value, metadata=None):
+        self.store.add([value if isinstance(value, str) else json.dumps(value, default=str)], [dict(metadata or {})])
+
+    def search(self, query, limit=3, filter=None, score_threshold=0.35):
+        return [
+            {"id": r["id"], "context": r["text"], "memory": r["text"], "metadata": r["metadata"], "score": r["score"]}
+            for r in self.store.search(query, k=limit, score_threshold=score_threshold, where=filter)
+        ]
+
+    def reset(self):
+        self.store.reset()
+
+
+_shared_cache = None
+_stores = {}
+_shared_lock = threading.Lock()
+
+
+def shared_embedding_cache():
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+def shared_store(name):
+    """Process-wide store persisted under MEMORY_STORE_DIR/<name>"""
+    with _shared_lock:
+        if name not in _stores:
+            store = VectorStore(path=os.path.join(DEFAULT_STORE_DIR, name))
+            atexit.register(store.save)
+            _stores[name] = store
+        return _stores[name]
+
+
+def crew_memory(name):
+    """Crew keyword arguments backing short-term and entity memory with the shared stores of name.
+
+    crewai versions without ShortTermMemory/EntityMemory (its memory is unified
+    since 1.x) get plain memory=True, as the crews had before.
+    """
+    try:
+        from crewai.memory import EntityMemory, ShortTermMemory
+    except ImportError:
+        # stderr rather than warnings.warn: the crew scripts filter all warnings
+        sys.stderr.write("Warning: this crewai has no ShortTermMemory/EntityMemory; using its default "
+                         "memory instead of the local vector stores\n")
+        return {"memory": True}
+
+    return {
+        "memory": True,
+        "short_term_memory": ShortTermMemory(storage=VectorMemoryStorage(shared_store(f"{name}/short_term"))),
+        "entity_memory": EntityMemory(storage=VectorMemoryStorage(shared_store(f"{name}/entities"))),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect, reset or benchmark a local memory store")
+    parser.add_argument("name", help="store name under MEMORY_STORE_DIR, e.g. support/short_term")
+    parser.add_argument("--reset", action="store_true")
+    parser.add_argument("--search", help="print the best matches for this query")
+    parser.add_argument("--bench", type=int, metavar="N", help="time searches over N synthetic rows (hashing embedder)")
+    args = parser.parse_args()
+
+    if args.bench:
+        store = VectorStore(HashingEmbedder(), max_items=args.bench, embedding_cache=EmbeddingCache(":memory:"))
+        rng = np.random.default_rng(0)
+        words = [f"w{i}" for i in range(5000)]
+        store.add([" ".join(rng.choice(words, 30)) for _ in range(args.bench)])
+        for index in ("flat", "ivf"):
+            store.index = index
+            store.search("warmup")
+            start = time.perf_counter()
+            for i in range(100):
+                store.search(" ".join(rng.choice(words, 8)), k=5)
+            print(f"{index}: {(time.perf_counter() - start) * 10:.2f} ms per search over {len(store)} rows")
+    else:
+        store = shared_store(args.name)
+        if args.reset:
+            store.reset()
+        if args.search:
+            for result in store.search(args.search, k=5):
+                print(f"{result['score']:.3f}  {result['text'][:120]}")
+        print(json.dumps(store.stats(), indent=2))
@@ -1,13 +1,7 @@
-import os
-from crewai import Agent, Task, Crew
-from instructor.cli.batch import results
-
-from dotenv import load_dotenv
-load_dotenv()
+from CrewBootstrap import load_env
+load_env()
 
-
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["OPENAI_MODEL_NAME"] =  os.getenv("OPENAI_MODEL_NAME")
+from crewai import Agent, Task, Crew
 
 info_agent=Agent(
     role="Information Agent",
@@ -1,13 +1,8 @@
-import os
-from crewai import Crew, Agent, Task, Process
-from dotenv import load_dotenv
-from CalculatorTool import calculate
-
-load_dotenv()
+from CrewBootstrap import load_env
+load_env()
 
-
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["OPENAI_MODEL_NAME"] =  os.getenv("OPENAI_MODEL_NAME")
+from crewai import Crew, Agent, Task, Process
+from CalculatorTool import calculate, calculate_batch
 
 print("Welcome to Math Whiz")
 math_input = input("What is your math equation: ")
@@ -19,7 +14,7 @@ math_agent = Agent(
     goal="You are able to evaluate any math expression",
     backstory="YOU ARE A MATH WHIZ.",
     verbose=True,
-    tools=[calculate]
+    tools=[calculate, calculate_batch]
 )
 
 writer = Agent(